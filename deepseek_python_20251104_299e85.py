@@ -1,5 +1,5 @@
 import streamlit as st
-import requests
+from http_client import get_client, latency_summary
 import json
 from PIL import Image
 import io
@@ -81,7 +81,7 @@ def search_met_collection(query):
             'hasImages': True  # 只返回有图片的结果
         }
         
-        response = requests.get(url, params=params)
+        response = get_client().get(url, params=params)
         if response.status_code == 200:
             data = response.json()
             return data
@@ -96,7 +96,7 @@ def get_object_details(object_id):
     """获取特定藏品的详细信息"""
     try:
         url = f"https://collectionapi.metmuseum.org/public/collection/v1/objects/{object_id}"
-        response = requests.get(url)
+        response = get_client().get(url)
         if response.status_code == 200:
             return response.json()
         else:
@@ -154,6 +154,10 @@ with st.sidebar:
     - Not all objects have images available
     """)
 
+    # 共享 HTTP 客户端的各主机请求延迟
+    for line in latency_summary():
+        st.caption(line)
+
 # 页脚
 st.markdown("---")
 st.markdown("Data provided by the Metropolitan Museum of Art API")
\ No newline at end of file
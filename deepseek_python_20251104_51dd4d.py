@@ -1,7 +1,13 @@
 import streamlit as st
-import requests
+from http_client import get_client, latency_summary
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
+from weather_cache import WeatherCache
+from weather_gazetteer import Gazetteer
+from weather_refresh import WeatherRefresher
+from weather_store import FORECAST_DAYS, ForecastStore
+from weather_fetch import comparison_table, fetch_all_weather
+from weather_textchart import text_bar_chart, time_labels
 
 # 设置页面配置
 st.set_page_config(
@@ -68,11 +74,29 @@ if 'selected_city' not in st.session_state:
     st.session_state.selected_city = "Seoul"
 if 'current_weather' not in st.session_state:
     st.session_state.current_weather = None
-if 'hourly_forecast' not in st.session_state:
-    st.session_state.hourly_forecast = None
+if 'forecast' not in st.session_state:
+    st.session_state.forecast = None
+if 'selected_coords' not in st.session_state:
+    st.session_state.selected_coords = None
+if 'city_comparison' not in st.session_state:
+    st.session_state.city_comparison = None
+
+@st.cache_resource
+def get_gazetteer():
+    """所有会话共享的离线地名索引；设置 WEATHER_GAZETTEER_DB 时持久化到 SQLite"""
+    return Gazetteer()
+
+
+gazetteer = get_gazetteer()
+
 
 def get_city_coordinates(city_name):
-    """通过城市名获取坐标"""
+    """通过城市名获取坐标；先查本地地名索引，未命中才请求地理编码并写回索引"""
+    return gazetteer.resolve(city_name, geocode_city)
+
+
+def geocode_city(city_name):
+    """请求地理编码接口"""
     try:
         url = "https://geocoding-api.open-meteo.com/v1/search"
         params = {
@@ -81,7 +105,7 @@ def get_city_coordinates(city_name):
             'language': 'en',
             'format': 'json'
         }
-        response = requests.get(url, params=params)
+        response = get_client().get(url, params=params)
         if response.status_code == 200:
             data = response.json()
             if data.get('results'):
@@ -97,30 +121,38 @@ def get_city_coordinates(city_name):
         st.error(f"Error getting city coordinates: {e}")
         return None
 
+@st.cache_resource
+def get_weather_cache():
+    """所有会话共享的天气缓存；设置 WEATHER_CACHE_DB 时同时写入 SQLite"""
+    return WeatherCache()
+
+
+weather_cache = get_weather_cache()
+
+
 def get_weather_data(lat, lon):
-    """获取天气数据"""
+    """获取天气数据；过期时立即返回上次的数据并由后台刷新，从未查询过的位置才同步请求
+
+    同步请求与后台刷新走同一条 fetch_all_weather 路径（请求参数见 weather_fetch）。
+    """
     try:
-        # 当前天气API
-        current_url = "https://api.open-meteo.com/v1/forecast"
-        params = {
-            'latitude': lat,
-            'longitude': lon,
-            'current': 'temperature_2m,relative_humidity_2m,apparent_temperature,weather_code,wind_speed_10m,wind_direction_10m',
-            'hourly': 'temperature_2m,relative_humidity_2m,weather_code,wind_speed_10m',
-            'timezone': 'auto',
-            'forecast_days': 1
-        }
-        
-        response = requests.get(current_url, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            return data
-        else:
-            st.error("Failed to get weather data")
-            return None
+        data = refresher.get(lat, lon)
     except Exception as e:
         st.error(f"Error getting weather data: {e}")
         return None
+    if data is None:
+        st.error("Failed to get weather data")
+    return data
+
+
+@st.cache_resource
+def get_refresher():
+    """所有会话共享的后台刷新器：热门城市与最近查询的位置在每次模型更新后批量刷新"""
+    return WeatherRefresher(weather_cache, POPULAR_CITIES, FORECAST_DAYS).start()
+
+
+refresher = get_refresher()
+
 
 def get_weather_description(weather_code):
     """根据天气代码返回描述"""
@@ -150,20 +182,6 @@ def get_wind_direction(degrees):
     index = round(degrees / 22.5) % 16
     return directions[index]
 
-def create_simple_chart(temperatures, times):
-    """创建简单的文本图表"""
-    max_temp = max(temperatures)
-    min_temp = min(temperatures)
-    
-    chart_lines = []
-    for i, (temp, time_str) in enumerate(zip(temperatures, times)):
-        # 创建简单的条形图
-        bar_length = int((temp - min_temp) / (max_temp - min_temp) * 20) if max_temp != min_temp else 10
-        bar = "█" * bar_length
-        chart_lines.append(f"{time_str}: {bar} {temp:.1f}°C")
-    
-    return "\n".join(chart_lines)
-
 # 主应用标题
 st.markdown('<div class="main-header">🌤️ Open-Meteo Interactive Weather</div>', unsafe_allow_html=True)
 
@@ -181,15 +199,28 @@ with col1:
         key="city_search"
     )
     
-    if st.button("Search City", use_container_width=True) and city_name:
+    search_clicked = st.button("Search City", use_container_width=True)
+
+    # 本地地名索引的前缀 / 模糊联想，点选后直接使用其坐标
+    picked_city = None
+    suggestions = gazetteer.suggest(city_name, limit=4) if city_name else []
+    if suggestions:
+        st.caption("Suggestions")
+        for col, place in zip(st.columns(len(suggestions)), suggestions):
+            if col.button(place['name'], key=f"suggest_{place['id']}", help=place['country'],
+                          use_container_width=True):
+                picked_city = place
+
+    if (search_clicked and city_name) or picked_city:
         with st.spinner(f"Searching for {city_name}..."):
-            city_data = get_city_coordinates(city_name)
+            city_data = picked_city or get_city_coordinates(city_name)
             if city_data:
                 st.session_state.selected_city = city_data['name']
                 weather_data = get_weather_data(city_data['lat'], city_data['lon'])
                 if weather_data:
                     st.session_state.current_weather = weather_data['current']
-                    st.session_state.hourly_forecast = weather_data['hourly']
+                    st.session_state.forecast = ForecastStore.from_payload(weather_data)
+                    st.session_state.selected_coords = (city_data['lat'], city_data['lon'])
                     st.success(f"Successfully got weather data for {city_data['name']}, {city_data['country']}")
     
     st.markdown("---")
@@ -218,7 +249,8 @@ with col1:
             if weather_data:
                 st.session_state.selected_city = f"Custom Location ({latitude}, {longitude})"
                 st.session_state.current_weather = weather_data['current']
-                st.session_state.hourly_forecast = weather_data['hourly']
+                st.session_state.forecast = ForecastStore.from_payload(weather_data)
+                st.session_state.selected_coords = (latitude, longitude)
                 st.success("Successfully got weather data for coordinates")
     
     st.markdown("---")
@@ -232,9 +264,23 @@ with col1:
                 if weather_data:
                     st.session_state.selected_city = city
                     st.session_state.current_weather = weather_data['current']
-                    st.session_state.hourly_forecast = weather_data['hourly']
+                    st.session_state.forecast = ForecastStore.from_payload(weather_data)
+                    st.session_state.selected_coords = (info['lat'], info['lon'])
                     st.success(f"Successfully got weather data for {city}")
 
+    # 一次请求取回全部热门城市（逗号分隔的坐标列表），失败时退回并发逐个请求
+    if st.button("Compare All Cities 📊", use_container_width=True):
+        with st.spinner(f"Getting weather data for {len(POPULAR_CITIES)} cities..."):
+            try:
+                results = fetch_all_weather(POPULAR_CITIES, FORECAST_DAYS)
+                for city, data in results.items():
+                    if data:
+                        weather_cache.put(POPULAR_CITIES[city]['lat'], POPULAR_CITIES[city]['lon'], data,
+                                          variant=FORECAST_DAYS)
+                st.session_state.city_comparison = comparison_table(results, POPULAR_CITIES, get_weather_description)
+            except Exception as e:
+                st.error(f"Error getting weather data: {e}")
+
 with col2:
     # 显示当前位置信息
     st.markdown(f"### Selected Location: {st.session_state.selected_city}")
@@ -247,6 +293,14 @@ with col2:
     
     st.markdown("---")
     
+    # 后台刷新已取回更新的数据时直接换上（不发请求）；按观测时间比较，只换上比当前显示更新的数据
+    if st.session_state.selected_coords:
+        latest = refresher.latest(*st.session_state.selected_coords)
+        shown = (st.session_state.current_weather or {}).get('time') or ''
+        if latest and (latest.get('current') or {}).get('time', '') > shown:
+            st.session_state.current_weather = latest['current']
+            st.session_state.forecast = ForecastStore.from_payload(latest)
+    
     # 显示当前天气
     if st.session_state.current_weather:
         current = st.session_state.current_weather
@@ -285,53 +339,88 @@ with col2:
         st.markdown("## Hourly Forecast")
         st.info("Please check the Models page for all simulated properties")
         
-        if st.session_state.hourly_forecast:
-            # 创建小时预报数据框
-            hours = st.session_state.hourly_forecast['time'][:24]
-            temperatures = st.session_state.hourly_forecast['temperature_2m'][:24]
-            humidity = st.session_state.hourly_forecast['relative_humidity_2m'][:24]
-            wind_speed = st.session_state.hourly_forecast['wind_speed_10m'][:24]
-            
-            # 简化时间显示
-            time_labels = []
-            for hour in hours:
-                try:
-                    # 解析时间字符串
-                    time_obj = datetime.fromisoformat(hour.replace('Z', '+00:00'))
-                    time_labels.append(time_obj.strftime('%H:%M'))
-                except:
-                    time_labels.append(hour)
+        forecast = st.session_state.forecast
+        if forecast is not None and len(forecast):
+            # 从当前小时起的窗口，直接取自列式存储（不复制、不逐行转换）
+            available = len(forecast) - forecast.index_at()
+            hours_shown = st.select_slider(
+                "Hours to show",
+                options=[h for h in (12, 24, 48, 72, 120, 168, 240, 384) if h < available] + [available],
+                value=min(12, available),
+            )
+            df_forecast = forecast.frame(hours=hours_shown)
+            multi_day = hours_shown > 24
             
-            # 显示简单的文本图表
+            # 显示简单的文本图表：标签查表、条形长度一次数组运算得到
             st.markdown("### Temperature Trend")
-            chart_text = create_simple_chart(temperatures, time_labels[:12])  # 只显示前12小时
+            chart_text = text_bar_chart(df_forecast['temperature_2m'].to_numpy(),
+                                        time_labels(df_forecast.index.to_numpy(), with_day=multi_day))
             st.text(chart_text)
             
-            # 创建详细数据表格
+            # 创建详细数据表格：数值保持 float32，只在显示层格式化
             st.markdown("### Detailed Forecast Data")
-            forecast_data = {
-                'Time': time_labels[:12],
-                'Temp (°C)': [f"{temp:.1f}" for temp in temperatures[:12]],
-                'Humidity (%)': [f"{hum:.0f}" for hum in humidity[:12]],
-                'Wind (km/h)': [f"{wind:.1f}" for wind in wind_speed[:12]]
-            }
-            
-            df_forecast = pd.DataFrame(forecast_data)
-            st.dataframe(df_forecast, use_container_width=True, hide_index=True)
+            st.dataframe(
+                df_forecast.drop(columns='weather_code').reset_index(),
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    'time': st.column_config.DatetimeColumn('Time', format='ddd HH:mm' if multi_day else 'HH:mm'),
+                    'temperature_2m': st.column_config.NumberColumn('Temp (°C)', format='%.1f'),
+                    'relative_humidity_2m': st.column_config.NumberColumn('Humidity (%)', format='%.0f'),
+                    'wind_speed_10m': st.column_config.NumberColumn('Wind (km/h)', format='%.1f'),
+                },
+            )
             
             # 显示统计信息
             st.markdown("### Statistics")
+            temp_stats = forecast.stats('temperature_2m', hours=24)
             col_stat1, col_stat2, col_stat3 = st.columns(3)
             with col_stat1:
-                st.metric("Max Temperature", f"{max(temperatures):.1f}°C")
+                st.metric("Max Temperature", f"{temp_stats['max']:.1f}°C")
             with col_stat2:
-                st.metric("Min Temperature", f"{min(temperatures):.1f}°C")
+                st.metric("Min Temperature", f"{temp_stats['min']:.1f}°C")
             with col_stat3:
-                st.metric("Average", f"{sum(temperatures)/len(temperatures):.1f}°C")
+                st.metric("Average", f"{temp_stats['mean']:.1f}°C")
+            
+            # 逐日汇总
+            st.markdown(f"### {FORECAST_DAYS}-Day Outlook")
+            st.dataframe(
+                forecast.daily().reset_index(),
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    'date': st.column_config.DateColumn('Date', format='ddd MM-DD'),
+                    'temperature_2m_min': st.column_config.NumberColumn('Min (°C)', format='%.1f'),
+                    'temperature_2m_max': st.column_config.NumberColumn('Max (°C)', format='%.1f'),
+                    'temperature_2m_mean': st.column_config.NumberColumn('Mean (°C)', format='%.1f'),
+                    'relative_humidity_2m_min': None,
+                    'relative_humidity_2m_max': None,
+                    'relative_humidity_2m_mean': st.column_config.NumberColumn('Humidity (%)', format='%.0f'),
+                    'wind_speed_10m_min': None,
+                    'wind_speed_10m_max': st.column_config.NumberColumn('Max wind (km/h)', format='%.1f'),
+                    'wind_speed_10m_mean': None,
+                },
+            )
     
     else:
         st.info("👆 Please select or search for a location to view weather information")
 
+    # 热门城市对比表
+    if st.session_state.city_comparison is not None:
+        st.markdown("---")
+        st.markdown("## City Comparison")
+        st.dataframe(
+            st.session_state.city_comparison,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Temp (°C)": st.column_config.NumberColumn(format="%.1f"),
+                "Feels like (°C)": st.column_config.NumberColumn(format="%.1f"),
+                "Humidity (%)": st.column_config.NumberColumn(format="%.0f"),
+                "Wind (km/h)": st.column_config.NumberColumn(format="%.1f"),
+            },
+        )
+
 # 侧边栏信息
 with st.sidebar:
     st.markdown("## ℹ️ About")
@@ -342,8 +431,9 @@ with st.sidebar:
     - 🔍 Search by city name
     - 📍 Input coordinates
     - 🏙️ Quick access to popular cities
+    - 📊 Side-by-side comparison of all popular cities
     - 🌡️ Current weather conditions
-    - 📊 24-hour weather forecast
+    - 📊 24-hour weather forecast and multi-day outlook
     
     ### Data Source:
     [Open-Meteo Weather API](https://open-meteo.com/)
@@ -353,10 +443,27 @@ with st.sidebar:
     st.markdown("""
     - Click popular city buttons for quick access
     - Enter any city name (in English)
-    - Hourly forecast shows next 24 hours
+    - Hourly forecast starts at the current hour; pick how many hours to show
     - All temperatures in Celsius
     """)
 
+    cache_stats = weather_cache.stats()
+    st.caption(f"Weather cache: {cache_stats['hits'] + cache_stats['disk_hits']} hits / "
+               f"{cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%}), "
+               f"{cache_stats['memory_items']} locations cached")
+    geo_stats = gazetteer.stats()
+    st.caption(f"Gazetteer: {geo_stats['places']} places, {geo_stats['hits']} local hits / "
+               f"{geo_stats['misses']} geocoder calls")
+    refresh_stats = refresher.stats()
+    st.caption(f"Background refresh: queue {refresh_stats['queue_depth']}, {refresh_stats['refreshed']} refreshed "
+               f"({refresh_stats['failures']} failed), {refresh_stats['avg_refresh_ms']:.0f} ms per batch, "
+               f"{refresh_stats['served_stale']} stale reads served")
+    st.caption(f"Staleness: oldest {refresh_stats['max_age_s'] / 60:.0f} min, "
+               f"{refresh_stats['stale_locations']} locations past update, next refresh "
+               f"{datetime.fromtimestamp(refresh_stats['next_refresh']):%H:%M}")
+    for line in latency_summary():
+        st.caption(line)
+
 # 页脚
 st.markdown("---")
 st.markdown("🌤️ Data provided by: Open-Meteo Weather API | 🚀 Built with Streamlit")
\ No newline at end of file
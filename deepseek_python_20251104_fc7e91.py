@@ -1,10 +1,17 @@
 import streamlit as st
-import requests
+from http_client import get_client, latency_summary
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import pytz
+import json
+from weather_archive import CLIMATOLOGY_YEARS, WeatherArchive, last_complete_years, location_key
+from weather_cache import WeatherCache
+from weather_downsample import DownsampleCache, point_budget, window_bounds
+from weather_gazetteer import Gazetteer
+from weather_refresh import WeatherRefresher
+from weather_store import FORECAST_DAYS, ForecastStore
 
 # 设置页面配置
 st.set_page_config(
@@ -63,11 +70,36 @@ if 'selected_city' not in st.session_state:
     st.session_state.selected_city = "Seoul"
 if 'current_weather' not in st.session_state:
     st.session_state.current_weather = None
-if 'hourly_forecast' not in st.session_state:
-    st.session_state.hourly_forecast = None
+if 'forecast' not in st.session_state:
+    st.session_state.forecast = None
+if 'selected_coords' not in st.session_state:
+    st.session_state.selected_coords = None
+
+# 折线图的点数预算按主栏宽度估算：每个像素列至多一个点
+CHART_WIDTH_PX = 900
+
+@st.cache_resource
+def get_weather_archive():
+    """本地历史数据归档（Parquet，按位置 / 月份分区），目录由 WEATHER_ARCHIVE_DIR 指定"""
+    return WeatherArchive()
+
+
+@st.cache_resource
+def get_gazetteer():
+    """所有会话共享的离线地名索引；设置 WEATHER_GAZETTEER_DB 时持久化到 SQLite"""
+    return Gazetteer()
+
+
+gazetteer = get_gazetteer()
+
 
 def get_city_coordinates(city_name):
-    """通过城市名获取坐标"""
+    """通过城市名获取坐标；先查本地地名索引，未命中才请求地理编码并写回索引"""
+    return gazetteer.resolve(city_name, geocode_city)
+
+
+def geocode_city(city_name):
+    """请求地理编码接口"""
     try:
         url = "https://geocoding-api.open-meteo.com/v1/search"
         params = {
@@ -76,7 +108,7 @@ def get_city_coordinates(city_name):
             'language': 'en',
             'format': 'json'
         }
-        response = requests.get(url, params=params)
+        response = get_client().get(url, params=params)
         if response.status_code == 200:
             data = response.json()
             if data.get('results'):
@@ -92,30 +124,77 @@ def get_city_coordinates(city_name):
         st.error(f"获取城市坐标时出错: {e}")
         return None
 
+@st.cache_resource
+def get_downsample_cache():
+    """所有会话共享的降采样结果缓存（按序列与窗口）"""
+    return DownsampleCache()
+
+
+downsample_cache = get_downsample_cache()
+
+
+def set_zoom_window(name):
+    """框选即缩放：把框选的时间范围记为窗口，下次渲染只对该窗口重新降采样"""
+    event = st.session_state.get(f"{name}_chart_{st.session_state.get(f'{name}_window')}")
+    boxes = event.selection.box if event else []
+    if boxes and boxes[0].get('x'):
+        x0, x1 = sorted(pd.Timestamp(x) for x in boxes[0]['x'][:2])
+        st.session_state[f"{name}_window"] = (x0.floor('h').isoformat(), x1.ceil('h').isoformat())
+
+
+def zoomable_line_chart(name, series_key, load, title, color, method='lttb', height=300):
+    """按图表像素宽度降采样后绘制折线；框选区域放大，按钮恢复全范围"""
+    window = st.session_state.get(f"{name}_window")
+    start, end = window or (None, None)
+    budget = point_budget(CHART_WIDTH_PX)
+    times, values = downsample_cache.get(series_key, load, start, end, budget, method)
+    fig = go.Figure(go.Scatter(x=times, y=values, mode='lines', name='Temperature',
+                               line=dict(color=color, width=1.5)))
+    fig.update_layout(title=title, xaxis_title="Time", yaxis_title="Temperature (°C)", height=height,
+                      dragmode='select')
+    st.plotly_chart(fig, use_container_width=True, key=f"{name}_chart_{window}",
+                    on_select=lambda: set_zoom_window(name), selection_mode='box')
+    caption = f"显示 {len(values)} 个点（{method.upper()}，预算 {budget}）"
+    if window:
+        caption += f"，窗口 {start[:16]} – {end[:16]}"
+    st.caption(caption + "；框选区域可放大")
+    if window and st.button("恢复全范围", key=f"{name}_reset"):
+        st.session_state[f"{name}_window"] = None
+        st.rerun()
+
+
+@st.cache_resource
+def get_weather_cache():
+    """所有会话共享的天气缓存；设置 WEATHER_CACHE_DB 时同时写入 SQLite"""
+    return WeatherCache()
+
+
+weather_cache = get_weather_cache()
+
+
 def get_weather_data(lat, lon):
-    """获取天气数据"""
+    """获取天气数据；过期时立即返回上次的数据并由后台刷新，从未查询过的位置才同步请求
+
+    同步请求与后台刷新走同一条 fetch_all_weather 路径（请求参数见 weather_fetch）。
+    """
     try:
-        # 当前天气API
-        current_url = "https://api.open-meteo.com/v1/forecast"
-        params = {
-            'latitude': lat,
-            'longitude': lon,
-            'current': 'temperature_2m,relative_humidity_2m,apparent_temperature,weather_code,wind_speed_10m,wind_direction_10m',
-            'hourly': 'temperature_2m,relative_humidity_2m,weather_code,wind_speed_10m',
-            'timezone': 'auto',
-            'forecast_days': 1
-        }
-        
-        response = requests.get(current_url, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            return data
-        else:
-            st.error("获取天气数据失败")
-            return None
+        data = refresher.get(lat, lon)
     except Exception as e:
         st.error(f"获取天气数据时出错: {e}")
         return None
+    if data is None:
+        st.error("获取天气数据失败")
+    return data
+
+
+@st.cache_resource
+def get_refresher():
+    """所有会话共享的后台刷新器：热门城市与最近查询的位置在每次模型更新后批量刷新"""
+    return WeatherRefresher(weather_cache, POPULAR_CITIES, FORECAST_DAYS).start()
+
+
+refresher = get_refresher()
+
 
 def get_weather_description(weather_code):
     """根据天气代码返回描述"""
@@ -162,15 +241,28 @@ with col1:
         key="city_search"
     )
     
-    if st.button("Search City", use_container_width=True) and city_name:
+    search_clicked = st.button("Search City", use_container_width=True)
+
+    # 本地地名索引的前缀 / 模糊联想，点选后直接使用其坐标
+    picked_city = None
+    suggestions = gazetteer.suggest(city_name, limit=4) if city_name else []
+    if suggestions:
+        st.caption("联想")
+        for col, place in zip(st.columns(len(suggestions)), suggestions):
+            if col.button(place['name'], key=f"suggest_{place['id']}", help=place['country'],
+                          use_container_width=True):
+                picked_city = place
+
+    if (search_clicked and city_name) or picked_city:
         with st.spinner(f"搜索 {city_name}..."):
-            city_data = get_city_coordinates(city_name)
+            city_data = picked_city or get_city_coordinates(city_name)
             if city_data:
                 st.session_state.selected_city = city_data['name']
                 weather_data = get_weather_data(city_data['lat'], city_data['lon'])
                 if weather_data:
                     st.session_state.current_weather = weather_data['current']
-                    st.session_state.hourly_forecast = weather_data['hourly']
+                    st.session_state.forecast = ForecastStore.from_payload(weather_data)
+                    st.session_state.selected_coords = (city_data['lat'], city_data['lon'])
                     st.success(f"成功获取 {city_data['name']}, {city_data['country']} 的天气数据")
     
     st.markdown("---")
@@ -199,7 +291,8 @@ with col1:
             if weather_data:
                 st.session_state.selected_city = f"Custom Location ({latitude}, {longitude})"
                 st.session_state.current_weather = weather_data['current']
-                st.session_state.hourly_forecast = weather_data['hourly']
+                st.session_state.forecast = ForecastStore.from_payload(weather_data)
+                st.session_state.selected_coords = (latitude, longitude)
                 st.success("成功获取坐标位置的天气数据")
     
     st.markdown("---")
@@ -213,7 +306,8 @@ with col1:
                 if weather_data:
                     st.session_state.selected_city = city
                     st.session_state.current_weather = weather_data['current']
-                    st.session_state.hourly_forecast = weather_data['hourly']
+                    st.session_state.forecast = ForecastStore.from_payload(weather_data)
+                    st.session_state.selected_coords = (info['lat'], info['lon'])
                     st.success(f"成功获取 {city} 的天气数据")
 
 with col2:
@@ -228,6 +322,14 @@ with col2:
     
     st.markdown("---")
     
+    # 后台刷新已取回更新的数据时直接换上（不发请求）；按观测时间比较，只换上比当前显示更新的数据
+    if st.session_state.selected_coords:
+        latest = refresher.latest(*st.session_state.selected_coords)
+        shown = (st.session_state.current_weather or {}).get('time') or ''
+        if latest and (latest.get('current') or {}).get('time', '') > shown:
+            st.session_state.current_weather = latest['current']
+            st.session_state.forecast = ForecastStore.from_payload(latest)
+    
     # 显示当前天气
     if st.session_state.current_weather:
         current = st.session_state.current_weather
@@ -266,24 +368,16 @@ with col2:
         st.markdown("## Hourly Forecast")
         st.info("请在 Models 页面查看所有模拟的属性")
         
-        if st.session_state.hourly_forecast:
-            # 创建小时预报数据框
-            hours = st.session_state.hourly_forecast['time'][:24]
-            temperatures = st.session_state.hourly_forecast['temperature_2m'][:24]
-            humidity = st.session_state.hourly_forecast['relative_humidity_2m'][:24]
-            
-            # 转换为本地时间
-            try:
-                current_time = datetime.now()
-                time_labels = [f"{(current_time + timedelta(hours=i)).strftime('%H:%M')}" for i in range(24)]
-            except:
-                time_labels = [f"{i}:00" for i in range(24)]
+        forecast = st.session_state.forecast
+        if forecast is not None and len(forecast):
+            # 从当前小时起 24 小时的窗口，直接取自列式存储（时间为位置本地时间）
+            df_forecast = forecast.frame(hours=24)
             
             # 创建温度图表
             fig_temp = go.Figure()
             fig_temp.add_trace(go.Scatter(
-                x=time_labels,
-                y=temperatures,
+                x=df_forecast.index,
+                y=df_forecast['temperature_2m'],
                 mode='lines+markers',
                 name='Temperature',
                 line=dict(color='red', width=3),
@@ -300,16 +394,140 @@ with col2:
             
             st.plotly_chart(fig_temp, use_container_width=True)
             
-            # 创建湿度和风速数据框
-            forecast_data = {
-                'Time': time_labels,
-                'Temperature (°C)': temperatures,
-                'Humidity (%)': humidity[:24],
-                'Wind Speed (km/h)': st.session_state.hourly_forecast['wind_speed_10m'][:24]
-            }
+            # 创建湿度和风速数据框：数值保持 float32，只在显示层格式化
+            st.dataframe(
+                df_forecast.drop(columns='weather_code').reset_index(),
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    'time': st.column_config.DatetimeColumn('Time', format='HH:mm'),
+                    'temperature_2m': st.column_config.NumberColumn('Temperature (°C)', format='%.1f'),
+                    'relative_humidity_2m': st.column_config.NumberColumn('Humidity (%)', format='%.0f'),
+                    'wind_speed_10m': st.column_config.NumberColumn('Wind Speed (km/h)', format='%.1f'),
+                },
+            )
+            
+            # 逐日最高 / 最低 / 平均气温
+            daily = forecast.daily()
+            fig_daily = go.Figure()
+            fig_daily.add_trace(go.Scatter(
+                x=daily.index, y=daily['temperature_2m_max'], mode='lines', name='Max',
+                line=dict(color='red', width=1)
+            ))
+            fig_daily.add_trace(go.Scatter(
+                x=daily.index, y=daily['temperature_2m_min'], mode='lines', name='Min',
+                line=dict(color='royalblue', width=1), fill='tonexty', fillcolor='rgba(255, 75, 75, 0.15)'
+            ))
+            fig_daily.add_trace(go.Scatter(
+                x=daily.index, y=daily['temperature_2m_mean'], mode='lines+markers', name='Mean',
+                line=dict(color='black', width=2, dash='dot')
+            ))
+            fig_daily.update_layout(
+                title=f"{FORECAST_DAYS}-Day Temperature Range (°C)",
+                xaxis_title="Date",
+                yaxis_title="Temperature (°C)",
+                height=300,
+            )
+            st.plotly_chart(fig_daily, use_container_width=True)
+            
+            # 整个预报期的逐小时温度（最长 16 天 / 384 点），超出像素预算时降采样
+            def load_forecast(start, end):
+                i, j = window_bounds(forecast.times, start, end)
+                return forecast.times[i:j], forecast.column('temperature_2m')[i:j]
+            
+            zoomable_line_chart(
+                'forecast',
+                # current 时间随每次取回变化，后台刷新或重新查询后旧的降采样结果不再命中
+                ('forecast', st.session_state.selected_coords, forecast.current.get('time'), str(forecast.times[0]),
+                 len(forecast)),
+                load_forecast,
+                f"{FORECAST_DAYS}-Day Hourly Temperature (°C)",
+                'red',
+            )
+        
+        # 历史气候：从本地 Parquet 归档计算，不再逐日请求 archive 接口
+        if st.session_state.selected_coords:
+            st.markdown("---")
+            st.markdown("## Historical Climate")
+            archive = get_weather_archive()
+            hist_lat, hist_lon = st.session_state.selected_coords
+            archive_key = location_key(hist_lat, hist_lon)
+            hist_col1, hist_col2 = st.columns(2)
+            with hist_col1:
+                if st.button(f"下载近 {CLIMATOLOGY_YEARS} 年逐小时数据", use_container_width=True):
+                    with st.spinner("下载历史数据..."):
+                        try:
+                            calls = archive.download(hist_lat, hist_lon, *last_complete_years())
+                            st.success(f"已归档（本次请求 {calls} 次）")
+                        except Exception as e:
+                            st.error(f"下载历史数据时出错: {e}")
+            with hist_col2:
+                fixture = st.file_uploader("或导入 archive JSON 文件", type="json", key="archive_fixture")
+                if fixture is not None:
+                    # 每个上传文件（对每个位置）只导入一次；之后的重跑（如图表缩放）不再重写分区
+                    imported = st.session_state.setdefault('imported_fixtures', {})
+                    upload_key = (fixture.file_id, archive_key)
+                    if upload_key not in imported:
+                        try:
+                            imported[upload_key] = archive.ingest_payload(hist_lat, hist_lon, json.load(fixture))
+                        except Exception as e:
+                            st.error(f"导入历史数据时出错: {e}")
+                    if upload_key in imported:
+                        st.success(f"已导入 {imported[upload_key]} 个月的数据")
             
-            df_forecast = pd.DataFrame(forecast_data)
-            st.dataframe(df_forecast, use_container_width=True, hide_index=True)
+            if archive.months(archive_key):
+                today = datetime.now()
+                same_day = archive.day_of_year(archive_key, today.month, today.day)
+                if not same_day.empty:
+                    fig_hist = go.Figure()
+                    fig_hist.add_trace(go.Bar(
+                        x=same_day.index, y=same_day['mean'], name='Daily mean',
+                        error_y=dict(type='data', symmetric=False,
+                                     array=same_day['max'] - same_day['mean'],
+                                     arrayminus=same_day['mean'] - same_day['min'])
+                    ))
+                    fig_hist.add_hline(y=same_day['mean'].mean(), line_dash='dot',
+                                       annotation_text=f"{len(same_day)}-year average {same_day['mean'].mean():.1f}°C")
+                    fig_hist.update_layout(
+                        title=f"Temperature on {today.strftime('%b %d')} by Year (°C)",
+                        xaxis_title="Year",
+                        yaxis_title="Temperature (°C)",
+                        height=300,
+                    )
+                    st.plotly_chart(fig_hist, use_container_width=True)
+                
+                monthly = archive.monthly_climatology(archive_key)
+                fig_clim = go.Figure()
+                fig_clim.add_trace(go.Scatter(x=monthly.index, y=monthly['daily_max'], mode='lines', name='Avg daily max',
+                                              line=dict(color='red', width=1)))
+                fig_clim.add_trace(go.Scatter(x=monthly.index, y=monthly['daily_min'], mode='lines', name='Avg daily min',
+                                              line=dict(color='royalblue', width=1), fill='tonexty',
+                                              fillcolor='rgba(255, 75, 75, 0.15)'))
+                fig_clim.add_trace(go.Scatter(x=monthly.index, y=monthly['mean'], mode='lines+markers', name='Mean',
+                                              line=dict(color='black', width=2)))
+                fig_clim.update_layout(
+                    title="Monthly Climatology (°C)",
+                    xaxis=dict(title="Month", tickmode='array', tickvals=list(range(1, 13))),
+                    yaxis_title="Temperature (°C)",
+                    height=300,
+                )
+                st.plotly_chart(fig_clim, use_container_width=True)
+                
+                # 全部归档的逐小时温度（十年约 8.8 万点）：min-max 降采样保留极值，窗口只读取相关月份分区
+                archived = archive.months(archive_key)
+                
+                def load_history(start, end):
+                    frame = archive.query(archive_key, start, end, columns=['temperature_2m'])
+                    return frame['time'].to_numpy(), frame['temperature_2m'].to_numpy()
+                
+                zoomable_line_chart(
+                    'history',
+                    ('archive', archive_key, archived[0], archived[-1], len(archived)),
+                    load_history,
+                    "Hourly Temperature History (°C)",
+                    'darkorange',
+                    method='minmax',
+                )
     
     else:
         st.info("👆 请选择或搜索一个位置来查看天气信息")
@@ -325,7 +543,8 @@ with st.sidebar:
     - 📍 输入坐标定位
     - 🏙️ 热门城市快速访问
     - 🌡️ 当前天气状况
-    - 📊 24小时天气预报
+    - 📊 24小时天气预报与多日趋势
+    - 📜 近十年历史气候（本地 Parquet 归档）
     
     ### 数据来源：
     [Open-Meteo Weather API](https://open-meteo.com/)
@@ -336,9 +555,29 @@ with st.sidebar:
     - 点击热门城市按钮快速查看天气
     - 可以输入任何城市名称（英文）
     - 小时预报显示未来24小时数据
+    - 在逐小时曲线上框选区域可放大查看
     - 所有温度均为摄氏度
     """)
 
+    cache_stats = weather_cache.stats()
+    st.caption(f"天气缓存：命中 {cache_stats['hits'] + cache_stats['disk_hits']} / "
+               f"未命中 {cache_stats['misses']} ({cache_stats['hit_rate']:.0%})，"
+               f"已缓存 {cache_stats['memory_items']} 个位置")
+    geo_stats = gazetteer.stats()
+    st.caption(f"地名索引：{geo_stats['places']} 个地点，本地命中 {geo_stats['hits']} / "
+               f"地理编码请求 {geo_stats['misses']}")
+    ds_stats = downsample_cache.stats()
+    st.caption(f"图表降采样：{ds_stats['points_in']} → {ds_stats['points_out']} 个点，"
+               f"窗口缓存命中 {ds_stats['hits']} / 未命中 {ds_stats['misses']}")
+    refresh_stats = refresher.stats()
+    st.caption(f"后台刷新：队列 {refresh_stats['queue_depth']}，已刷新 {refresh_stats['refreshed']} 次"
+               f"（失败 {refresh_stats['failures']}），每批平均 {refresh_stats['avg_refresh_ms']:.0f} ms，"
+               f"先返回旧数据 {refresh_stats['served_stale']} 次")
+    st.caption(f"数据时效：最旧 {refresh_stats['max_age_s'] / 60:.0f} 分钟，{refresh_stats['stale_locations']} 个位置"
+               f"已过更新时刻，下次刷新 {datetime.fromtimestamp(refresh_stats['next_refresh']):%H:%M}")
+    for line in latency_summary():
+        st.caption(line)
+
 # 页脚
 st.markdown("---")
 st.markdown("🌤️ 数据提供: Open-Meteo Weather API | 🚀 构建于 Streamlit")
\ No newline at end of file
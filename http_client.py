@@ -0,0 +1,191 @@
+import bisect
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# -----------------------------------
+# 共享 HTTP 客户端（连接池 + keep-alive + 超时 + 指数退避重试 + 延迟直方图）
+# -----------------------------------
+DEFAULT_TIMEOUT = (3.05, 10)  # (连接, 读取) 秒；不再允许请求无限挂起
+POOL_HOSTS = 8  # 保留连接池的主机数
+POOL_PER_HOST = 10  # 每个主机的最大连接数；超出时阻塞等待而不是新建连接
+RETRIES = 3
+BACKOFF_FACTOR = 0.3  # 重试间隔 0.3 * 2^(n-1) 秒，并遵守 Retry-After
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """固定桶的延迟直方图（毫秒），最后一个桶收纳超过上限的样本"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total_ms = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, ms, error=False):
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.total_ms += ms
+        self.count += 1
+        self.errors += error
+
+    def quantile(self, q):
+        """按桶上界估计分位数；落在溢出桶时返回 inf"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": dict(zip([f"<={b}" for b in self.buckets] + [f">{self.buckets[-1]}"], self.counts)),
+        }
+
+
+class HttpClient:
+    """所有数据应用共用的 HTTP 客户端
+
+    rewrite 把上游根地址映射到其他地址（如本地桩服务），调用方代码无需改动；
+    也可直接传入已配置好的 session。延迟按主机统计，包含重试与退避在内的端到端耗时。
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=RETRIES, backoff_factor=BACKOFF_FACTOR,
+                 pool_hosts=POOL_HOSTS, pool_per_host=POOL_PER_HOST, rewrite=None, session=None):
+        self.timeout = timeout
+        self.rewrite = dict(rewrite or {})
+        self.session = session or self._build_session(retries, backoff_factor, pool_hosts, pool_per_host)
+        self.latency = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _build_session(retries, backoff_factor, pool_hosts, pool_per_host):
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries, backoff_factor=backoff_factor,
+                      status_forcelist=RETRY_STATUSES, allowed_methods=frozenset({"GET", "HEAD"}),
+                      respect_retry_after_header=True, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_per_host, pool_block=True,
+                              max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _resolve(self, url):
+        for origin, target in self.rewrite.items():
+            if url.startswith(origin):
+                return target + url[len(origin):]
+        return url
+
+    def _observe(self, host, ms, error):
+        with self._lock:
+            if host not in self.latency:
+                self.latency[host] = LatencyHistogram()
+            self.latency[host].observe(ms, error)
+
+    def get(self, url, params=None, **kwargs):
+        """GET 请求；未指定 timeout 时使用客户端默认值。重试耗尽后返回最后一次的响应或抛出异常"""
+        url = self._resolve(url)
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).netloc
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, **kwargs)
+        except requests.RequestException:
+            self._observe(host, (time.perf_counter() - start) * 1000, True)
+            raise
+        self._observe(host, (time.perf_counter() - start) * 1000, response.status_code >= 400)
+        return response
+
+    def get_json(self, url, params=None, **kwargs):
+        """GET 并解析 JSON；非 2xx 状态抛出 requests.HTTPError"""
+        response = self.get(url, params, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def stats(self):
+        with self._lock:
+            return {host: histogram.snapshot() for host, histogram in self.latency.items()}
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """进程内共享的默认客户端，首次调用时创建"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def set_client(client):
+    """替换默认客户端（如指向本地桩服务的测试客户端），返回原客户端"""
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+        return previous
+
+
+def latency_summary(client=None):
+    """每个主机一行的延迟摘要，供界面展示"""
+    stats = (client or get_client()).stats()
+    return [f"{host}: {s['count']} req, p50 ≤{s['p50_ms']:g} ms, p95 ≤{s['p95_ms']:g} ms, errors {s['errors']}"
+            for host, s in stats.items()]
+
+
+def benchmark_client(requests_count=50, latency=0.0, failures=2):
+    """对本地桩服务比较每次新建连接的 requests.get 与共享连接池的耗时，并验证 503 重试"""
+    from weather_stub import stub_server
+
+    params = {"latitude": "37.5665", "longitude": "126.9780", "current": "temperature_2m"}
+    results = []
+    with stub_server(latency) as base:
+        url = base + "/v1/forecast"
+        start = time.perf_counter()
+        for _ in range(requests_count):
+            requests.get(url, params=params, timeout=DEFAULT_TIMEOUT).json()
+        results.append({"mode": "requests.get", "ms": (time.perf_counter() - start) * 1000})
+
+        client = HttpClient()
+        start = time.perf_counter()
+        for _ in range(requests_count):
+            client.get_json(url, params)
+        results.append({"mode": "pooled", "ms": (time.perf_counter() - start) * 1000,
+                        "stats": client.stats()[urlsplit(base).netloc]})
+        client.close()
+
+    with stub_server(latency, failures=failures) as base:
+        client = HttpClient(rewrite={"https://api.open-meteo.com": base})
+        start = time.perf_counter()
+        client.get_json("https://api.open-meteo.com/v1/forecast", params)
+        results.append({"mode": f"retry after {failures}x 503", "ms": (time.perf_counter() - start) * 1000})
+        client.close()
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_client():
+        print(f"{row['mode']:>20}  {row['ms']:8.1f} ms")
+        if "stats" in row:
+            s = row["stats"]
+            print(f"{'':>20}  p50 ≤{s['p50_ms']:g} ms  p95 ≤{s['p95_ms']:g} ms  mean {s['mean_ms']:.2f} ms")
@@ -0,0 +1,146 @@
+import argparse
+import csv
+import itertools
+import multiprocessing
+import os
+import time
+import numpy as np
+from nebula_core import ColorPaletteManager, create_nebula_density, create_starfield
+from nebula_cache import layer_rng
+from nebula_composite import composite_nebula
+from nebula_tiled import write_png_stream
+
+# -----------------------------------
+# 批量渲染（无需 Streamlit）
+# -----------------------------------
+DEFAULT_PARAMS = {
+    "seed": None,
+    "center_x": 0.5,
+    "center_y": 0.5,
+    "size": 0.4,
+    "palette": 0,
+    "density_scale": 0.3,
+    "brightness": 0.8,
+    "star_brightness": 1.0,
+    "num_stars": 600,
+    "resolution": 200,
+    "output_size": 800,
+    "noise": "gaussian",
+}
+PARAM_TYPES = {
+    "seed": int, "center_x": float, "center_y": float, "size": float, "palette": int,
+    "density_scale": float, "brightness": float, "star_brightness": float, "num_stars": int,
+    "resolution": int, "output_size": int, "noise": str,
+}
+
+
+def parse_value(name, text):
+    return PARAM_TYPES[name](text)
+
+
+def parse_grid(specs):
+    """把 ["size=0.3,0.5", "palette=0,1"] 展开为参数组合的笛卡尔积"""
+    axes = []
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in PARAM_TYPES:
+            raise ValueError(f"未知参数: {name}")
+        axes.append([(name, parse_value(name, v)) for v in values.split(",") if v])
+    return [dict(combo) for combo in itertools.product(*axes)]
+
+
+def read_jobs_csv(path):
+    """读取参数 CSV，表头为参数名，空单元格使用默认值"""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [{name: parse_value(name, value) for name, value in row.items() if name in PARAM_TYPES and value}
+                for row in csv.DictReader(f)]
+
+
+def build_jobs(param_sets, repeat=1, base_seed=0):
+    """补全默认参数；未指定 seed 的任务从 base_seed 派生独立随机流，结果与进程分配无关"""
+    total = len(param_sets) * repeat
+    seeds = np.random.SeedSequence(base_seed).generate_state(total, dtype=np.uint32)
+    jobs = []
+    for index, params in enumerate(p for p in param_sets for _ in range(repeat)):
+        job = {**DEFAULT_PARAMS, **params, "index": index}
+        if job["seed"] is None:
+            job["seed"] = int(seeds[index])
+        jobs.append(job)
+    return jobs
+
+
+def render_job(job, palettes):
+    """渲染一张图像，返回 uint8 RGB 数组"""
+    seed = job["seed"]
+    _, _, density = create_nebula_density((job["center_x"], job["center_y"]), job["size"], job["resolution"],
+                                          rng=layer_rng(seed, "density"), noise=job["noise"])
+    starfield = create_starfield(job["output_size"], job["num_stars"], job["star_brightness"],
+                                 rng=layer_rng(seed, "starfield"))
+    colors = palettes[job["palette"] % len(palettes)]
+    return composite_nebula(density * job["density_scale"], colors, job["brightness"], starfield,
+                            job["output_size"])
+
+
+def run_job(args):
+    job, out_dir, palettes = args
+    start = time.perf_counter()
+    image = render_job(job, palettes)
+    filename = f"nebula_{job['index']:06d}_{job['seed']}.png"
+    write_png_stream(os.path.join(out_dir, filename), image.shape[1], image.shape[0], [image])
+    return {**job, "file": filename, "elapsed_ms": (time.perf_counter() - start) * 1000}
+
+
+def render_batch(jobs, out_dir, workers=None, palettes=None):
+    """用进程池渲染全部任务，写出 manifest.csv，返回 (manifest 行, 统计)"""
+    os.makedirs(out_dir, exist_ok=True)
+    palettes = palettes or ColorPaletteManager().get_all_palettes()
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    tasks = [(job, out_dir, palettes) for job in jobs]
+    if workers == 1:
+        rows = [run_job(task) for task in tasks]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            rows = list(pool.imap_unordered(run_job, tasks, chunksize=max(1, len(tasks) // (workers * 8))))
+    elapsed = time.perf_counter() - start
+    rows.sort(key=lambda row: row["index"])
+
+    fields = ["index", "file", *DEFAULT_PARAMS, "elapsed_ms"]
+    with open(os.path.join(out_dir, "manifest.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    images_per_second = len(rows) / elapsed if elapsed > 0 else 0.0
+    cores = min(workers, os.cpu_count() or 1)
+    stats = {
+        "images": len(rows),
+        "workers": workers,
+        "cores": cores,
+        "elapsed": elapsed,
+        "images_per_second": images_per_second,
+        "images_per_second_per_core": images_per_second / cores,
+    }
+    return rows, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量渲染星云图像")
+    parser.add_argument("out_dir")
+    parser.add_argument("--grid", nargs="*", default=[], metavar="NAME=V1,V2",
+                        help="参数网格，如 size=0.3,0.5 palette=0,1,2")
+    parser.add_argument("--csv", help="每行一个任务的参数 CSV（表头为参数名）")
+    parser.add_argument("--repeat", type=int, default=1, help="每组参数渲染的张数（各自使用不同 seed）")
+    parser.add_argument("--seed", type=int, default=0, help="派生任务 seed 的基础 seed")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    param_sets = read_jobs_csv(args.csv) if args.csv else parse_grid(args.grid)
+    jobs = build_jobs(param_sets, args.repeat, args.seed)
+    _, stats = render_batch(jobs, args.out_dir, args.workers)
+    print(f"{stats['images']} images in {stats['elapsed']:.1f} s with {stats['workers']} workers "
+          f"on {stats['cores']} cores: "
+          f"{stats['images_per_second']:.2f} img/s, {stats['images_per_second_per_core']:.2f} img/s/core")
+
+
+if __name__ == "__main__":
+    main()
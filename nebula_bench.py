@@ -0,0 +1,206 @@
+import argparse
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import statistics
+import sys
+import time
+import matplotlib
+import numpy as np
+
+matplotlib.use("Agg")
+
+from nebula_core import (  # noqa: E402
+    ColorPaletteManager,
+    create_nebula_density,
+    create_starfield,
+    draw_nebula,
+    generate_fractal_noise,
+)
+
+# -----------------------------------
+# 基准测试 / 性能剖析（无需 Streamlit）
+# -----------------------------------
+RESOLUTIONS = (200, 512, 1024)
+STAR_RESOLUTIONS = (800, 2048)
+STAR_COUNTS = (600, 10_000, 100_000)
+OCTAVE_COUNTS = (4, 8)
+PALETTE_COUNTS = (100, 1_000, 10_000)
+REGRESSION_THRESHOLD = 1.2  # 中位数变慢超过 20% 视为回归
+
+
+def palette_csv(count, seed=0):
+    """生成 count 行随机色板的 CSV 字节串，格式与 ColorPaletteManager.export_as_csv 一致"""
+    rng = np.random.default_rng(seed)
+    colors = rng.integers(0, 0x1000000, (count, 6))
+    lines = ["PaletteName,Color1,Color2,Color3,Color4,Color5,Color6"]
+    lines += [f"bench{i}," + ",".join(f"#{c:06x}" for c in row) for i, row in enumerate(colors)]
+    return "\n".join(lines).encode("utf-8")
+
+
+def noise_cases():
+    for resolution in RESOLUTIONS:
+        for octaves in OCTAVE_COUNTS:
+            yield (f"generate_fractal_noise[res={resolution},octaves={octaves}]",
+                   lambda r=resolution, o=octaves: generate_fractal_noise(r, o, rng=np.random.default_rng(0)))
+
+
+def density_cases():
+    for resolution in RESOLUTIONS:
+        for noise in ("gaussian", "spectral"):
+            yield (f"create_nebula_density[res={resolution},noise={noise}]",
+                   lambda r=resolution, n=noise: create_nebula_density(resolution=r, rng=np.random.default_rng(0),
+                                                                       noise=n))
+
+
+def starfield_cases():
+    for resolution in STAR_RESOLUTIONS:
+        for stars in STAR_COUNTS:
+            yield (f"create_starfield[res={resolution},stars={stars}]",
+                   lambda r=resolution, s=stars: create_starfield(r, s, rng=np.random.default_rng(0)))
+
+
+def draw_cases():
+    import matplotlib.pyplot as plt
+
+    colors = ColorPaletteManager().get_palette(0)
+    X, Y, density = create_nebula_density(rng=np.random.default_rng(0))
+    for resolution in STAR_RESOLUTIONS[:1]:
+        starfield = create_starfield(resolution, rng=np.random.default_rng(0))
+
+        def draw(s=starfield):
+            fig = draw_nebula(X, Y, density, colors, starfield=s)
+            fig.savefig(io.BytesIO(), format="png", dpi=100)
+            plt.close(fig)
+
+        yield f"draw_nebula[stars_res={resolution}]", draw
+
+
+def palette_cases():
+    from nebula_palettes import PaletteStore
+
+    for count in PALETTE_COUNTS:
+        data = palette_csv(count)
+        yield f"ColorPaletteManager.import_csv[palettes={count}]", lambda d=data: ColorPaletteManager().import_csv(d)
+        yield f"PaletteStore.import_csv[palettes={count}]", lambda d=data: PaletteStore(":memory:").import_csv(d)
+
+
+SUITES = {
+    "noise": noise_cases,
+    "density": density_cases,
+    "starfield": starfield_cases,
+    "draw": draw_cases,
+    "palettes": palette_cases,
+}
+
+
+def time_case(fn, repeats=5, warmup=1):
+    """返回多次运行的耗时统计（毫秒）；warmup 次运行不计入"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "min_ms": min(samples),
+        "median_ms": statistics.median(samples),
+        "mean_ms": statistics.fmean(samples),
+        "stdev_ms": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "repeats": repeats,
+    }
+
+
+def profile_case(fn, top=15, sort="cumulative"):
+    """用 cProfile 跑一次，返回按 sort 排序的前 top 行各阶段耗时"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    fn()
+    profiler.disable()
+    stats = pstats.Stats(profiler).sort_stats(sort)
+    rows = []
+    for filename, line, func in stats.fcn_list[:top]:
+        _, calls, tottime, cumtime, _ = stats.stats[(filename, line, func)]
+        rows.append({"function": f"{os.path.basename(filename)}:{line}({func})", "calls": calls,
+                     "tottime_ms": tottime * 1000, "cumtime_ms": cumtime * 1000})
+    return rows
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run_suite(suites=tuple(SUITES), repeats=5, match=None, profile=False, top=15):
+    """运行所选基准，返回可写成 JSON 的结果字典"""
+    results = {"environment": environment(), "benchmarks": {}}
+    for suite in suites:
+        for name, fn in SUITES[suite]():
+            if match and match not in name:
+                continue
+            row = {"suite": suite, **time_case(fn, repeats)}
+            if profile:
+                row["profile"] = profile_case(fn, top)
+            results["benchmarks"][name] = row
+            print(f"{name:<60} median {row['median_ms']:9.2f} ms  min {row['min_ms']:9.2f} ms", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """与基线 JSON 对比中位数，返回 (名称, 基线 ms, 当前 ms, 比值) 列表及回归项"""
+    rows, regressions = [], []
+    for name, row in results["benchmarks"].items():
+        old = baseline.get("benchmarks", {}).get(name)
+        if old is None:
+            continue
+        ratio = row["median_ms"] / old["median_ms"] if old["median_ms"] > 0 else float("inf")
+        rows.append((name, old["median_ms"], row["median_ms"], ratio))
+        if ratio > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="星云生成流水线基准测试")
+    parser.add_argument("--suite", nargs="*", choices=list(SUITES), default=list(SUITES))
+    parser.add_argument("--match", help="只运行名称包含该子串的用例")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", "-o", help="结果 JSON 路径")
+    parser.add_argument("--compare", metavar="BASELINE", help="与基线 JSON 对比，出现回归时返回码为 1")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--profile", action="store_true", help="为每个用例附加 cProfile 各阶段耗时")
+    parser.add_argument("--top", type=int, default=15, help="--profile 时保留的函数行数")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.suite, args.repeats, args.match, args.profile, args.top)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.profile:
+        for name, row in results["benchmarks"].items():
+            print(f"\n{name}")
+            for entry in row["profile"]:
+                print(f"  {entry['cumtime_ms']:9.2f} ms cum  {entry['tottime_ms']:9.2f} ms self  "
+                      f"{entry['calls']:>7}  {entry['function']}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            rows, regressions = compare(results, json.load(f), args.threshold)
+        for name, old, new, ratio in rows:
+            flag = "  REGRESSION" if name in regressions else ""
+            print(f"{name:<60} {old:9.2f} -> {new:9.2f} ms  x{ratio:.2f}{flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+from nebula_core import create_nebula_density, create_starfield, draw_nebula, figure_to_rgb, nebula_grid
+from nebula_composite import composite_nebula
+
+# -----------------------------------
+# 渲染缓存（内存 LRU + 磁盘溢出）
+# -----------------------------------
+# 每个图层使用独立的随机流，保证同一 seed 下各层互不影响
+LAYER_STREAMS = {"density": 0, "starfield": 1, "noise": 2, "tiny_stars": 3}
+
+DEFAULT_MEMORY_BYTES = 256 * 1024 ** 2
+DEFAULT_DISK_BYTES = 1024 ** 3
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "nebula_cache")
+
+
+def layer_rng(seed, layer, *keys):
+    """由全局 seed、图层名和可选的附加键（如分块坐标）派生独立的随机数生成器"""
+    return np.random.default_rng([seed, LAYER_STREAMS[layer], *keys])
+
+
+def cache_key(layer, params, seed):
+    """按图层名、完整参数元组和 seed 计算内容寻址键"""
+    return hashlib.sha256(repr((layer, params, seed)).encode("utf-8")).hexdigest()
+
+
+class NebulaRenderCache:
+    def __init__(self, max_memory_bytes=DEFAULT_MEMORY_BYTES, max_disk_bytes=DEFAULT_DISK_BYTES,
+                 cache_dir=DEFAULT_CACHE_DIR):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.cache_dir = cache_dir
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.disk = OrderedDict()
+        self.disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if self.cache_dir and self.max_disk_bytes > 0:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._scan_disk()
+
+    def _scan_disk(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npy"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, nbytes in sorted(entries):
+            self.disk[key] = nbytes
+            self.disk_bytes += nbytes
+        self._evict_disk()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key + ".npy")
+
+    def _evict_memory(self):
+        while self.memory_bytes > self.max_memory_bytes and self.memory:
+            key, value = self.memory.popitem(last=False)
+            self.memory_bytes -= value.nbytes
+            self._spill(key, value)
+
+    def _spill(self, key, value):
+        if not self.cache_dir or self.max_disk_bytes <= 0 or key in self.disk:
+            return
+        if value.nbytes > self.max_disk_bytes:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, value)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.disk[key] = os.path.getsize(path)
+        self.disk_bytes += self.disk[key]
+        self._evict_disk()
+
+    def _evict_disk(self):
+        while self.disk_bytes > self.max_disk_bytes and self.disk:
+            key, nbytes = self.disk.popitem(last=False)
+            self.disk_bytes -= nbytes
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def _load_disk(self, key):
+        if key not in self.disk:
+            return None
+        path = self._disk_path(key)
+        try:
+            value = np.load(path)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.disk_bytes -= self.disk.pop(key)
+            return None
+        self.disk.move_to_end(key)
+        value.setflags(write=False)
+        return value
+
+    def _store(self, key, value):
+        if key in self.memory:
+            return
+        self.memory[key] = value
+        self.memory_bytes += value.nbytes
+        self._evict_memory()
+
+    def get(self, layer, params, seed):
+        key = cache_key(layer, params, seed)
+        with self._lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key]
+            value = self._load_disk(key)
+            if value is not None:
+                self.disk_hits += 1
+                self._store(key, value)
+            return value
+
+    def contains(self, layer, params, seed):
+        """只查询是否已缓存（内存或磁盘），不计入命中统计"""
+        key = cache_key(layer, params, seed)
+        with self._lock:
+            return key in self.memory or key in self.disk
+
+    def put(self, layer, params, seed, value):
+        value = np.ascontiguousarray(value)
+        value.setflags(write=False)
+        with self._lock:
+            self._store(cache_key(layer, params, seed), value)
+        return value
+
+    def get_or_create(self, layer, params, seed, create):
+        """命中则直接返回缓存图层，否则调用 create() 生成并写入缓存"""
+        value = self.get(layer, params, seed)
+        if value is not None:
+            return value
+        with self._lock:
+            self.misses += 1
+        return self.put(layer, params, seed, create())
+
+    def clear(self):
+        with self._lock:
+            self.memory.clear()
+            self.memory_bytes = 0
+            for key in list(self.disk):
+                try:
+                    os.remove(self._disk_path(key))
+                except OSError:
+                    pass
+            self.disk.clear()
+            self.disk_bytes = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_items": len(self.memory),
+            "memory_bytes": self.memory_bytes,
+            "disk_items": len(self.disk),
+            "disk_bytes": self.disk_bytes,
+        }
+
+
+# -----------------------------------
+# 带缓存的图层生成
+# -----------------------------------
+def density_params(center, size, resolution, noise="gaussian", dtype=np.float64):
+    return (tuple(center), size, resolution, noise, np.dtype(dtype).name)
+
+
+def starfield_params(resolution, num_stars, brightness_factor, dtype=np.float64, psf="cone"):
+    return (resolution, num_stars, brightness_factor, np.dtype(dtype).name, psf)
+
+
+def cached_density(cache, center, size, resolution, seed, noise="gaussian", dtype=np.float64, arena=None):
+    params = density_params(center, size, resolution, noise, dtype)
+    density = cache.get_or_create(
+        "density", params, seed,
+        lambda: create_nebula_density(center, size, resolution, rng=layer_rng(seed, "density"), noise=noise,
+                                      dtype=dtype, arena=arena)[2])
+    _, X, Y = nebula_grid(resolution)
+    return X, Y, density
+
+
+def cached_starfield(cache, resolution, num_stars, brightness_factor, seed, dtype=np.float64, arena=None,
+                     psf="cone"):
+    params = starfield_params(resolution, num_stars, brightness_factor, dtype, psf)
+    return cache.get_or_create(
+        "starfield", params, seed,
+        lambda: create_starfield(resolution, num_stars, brightness_factor, rng=layer_rng(seed, "starfield"),
+                                 dtype=dtype, arena=arena, psf=psf))
+
+
+def palette_key(colors):
+    """色板的缓存键：颜色列表取元组；已编译的 LUT（ndarray 的 repr 会被截断）取内容摘要"""
+    if isinstance(colors, np.ndarray):
+        return "lut:" + hashlib.sha256(np.ascontiguousarray(colors).tobytes()).hexdigest()
+    return tuple(colors)
+
+
+def image_params(center, size, colors, density_scale=1.0, brightness=0.8, star_brightness=1.0, num_stars=600,
+                 resolution=200, star_resolution=800, output_size=None, backend="numpy", noise="gaussian",
+                 dtype=np.float64, psf="cone"):
+    """cached_nebula_image 的缓存参数元组"""
+    return (tuple(center), size, resolution, density_scale, brightness, star_brightness, num_stars,
+            star_resolution, palette_key(colors), output_size, backend, noise, np.dtype(dtype).name, psf)
+
+
+def cached_nebula_image(cache, center, size, colors, seed, density_scale=1.0, brightness=0.8,
+                        star_brightness=1.0, num_stars=600, resolution=200, star_resolution=800,
+                        output_size=None, backend="numpy", noise="gaussian", dtype=np.float64, arena=None,
+                        workers=None, timings=None, psf="cone"):
+    """返回最终 uint8 RGB 图像；任一参数相同的图层都会被复用
+
+    backend="numpy" 走查找表合成器，backend="matplotlib" 保留原 figure 渲染路径。
+    dtype=np.float32 与 arena 一起启用省内存模式。
+    psf 选择星核（见 create_starfield）。
+    指定 workers 时缺失的图层由线程池并行生成（结果与串行逐位一致），各阶段耗时写入 timings。
+    """
+    if backend not in ("numpy", "matplotlib"):
+        raise ValueError(f"未知的渲染后端: {backend}")
+    params = image_params(center, size, colors, density_scale, brightness, star_brightness, num_stars,
+                          resolution, star_resolution, output_size, backend, noise, dtype, psf)
+
+    def render():
+        if workers:
+            from nebula_parallel import prefetch_layers
+
+            stages = prefetch_layers(cache, center, size, resolution, star_resolution, num_stars, star_brightness,
+                                     seed, noise, dtype, workers, psf, arena)
+            if timings is not None:
+                timings.update(stages)
+        X, Y, density = cached_density(cache, center, size, resolution, seed, noise, dtype, arena)
+        starfield = cached_starfield(cache, star_resolution, num_stars, star_brightness, seed, dtype, arena, psf)
+        if backend == "numpy":
+            return composite_nebula(density * density_scale, colors, brightness, starfield, output_size)
+        fig = draw_nebula(X, Y, density * density_scale, colors, brightness, star_brightness,
+                          starfield=starfield)
+        return figure_to_rgb(fig)
+
+    return cache.get_or_create("image", params, seed, render)
@@ -0,0 +1,131 @@
+import io
+import time
+from functools import lru_cache
+import numpy as np
+from nebula_core import create_nebula_colormap
+
+# -----------------------------------
+# 纯 NumPy 合成器（无 matplotlib figure）
+# -----------------------------------
+LUT_SIZE = 256
+NEBULA_ALPHA = 0.9  # 与 draw_nebula 中 imshow 的 alpha 保持一致
+STAR_ALPHA = 0.8
+MAX_OUTPUT_SIZE = 7680  # 8K
+ROW_CHUNK = 512  # 每次合成的行数，限制临时数组大小
+
+
+@lru_cache(maxsize=64)
+def colormap_lut(colors):
+    """把色板编译成 256x3 的 float32 查找表（0-255），按色板缓存"""
+    cmap = create_nebula_colormap(list(colors))
+    lut = (cmap(np.linspace(0, 1, LUT_SIZE))[:, :3] * 255).astype(np.float32)
+    lut.setflags(write=False)
+    return lut
+
+
+def lut_indices(values):
+    """与 matplotlib 相同的量化方式：clip 到 [0,1] 后取 int(x*N)"""
+    idx = np.clip(values, 0, 1) * LUT_SIZE
+    return np.minimum(idx.astype(np.intp), LUT_SIZE - 1).astype(np.uint8)
+
+
+def blend_lut(colors, with_starfield):
+    """预乘 alpha 的 uint8 查找表；有星空层时星云颜色再乘以 (1 - STAR_ALPHA)
+
+    colors 也可以是已编译好的 256x3 uint8 LUT（如 PaletteStore.get_lut 的结果）。
+    """
+    base = colors.astype(np.float32) if isinstance(colors, np.ndarray) else colormap_lut(tuple(colors))
+    lut = base * NEBULA_ALPHA
+    if with_starfield:
+        lut *= 1 - STAR_ALPHA
+    return np.rint(lut).astype(np.uint8)
+
+
+def star_levels(stars):
+    """把星空亮度量化为叠加用的 uint8 灰度"""
+    star = np.clip(stars, 0, 1) * (STAR_ALPHA * 255)
+    return np.rint(star, out=star).astype(np.uint8)
+
+
+def resample_nearest(image, rows, size):
+    """按最近邻把 image 的 rows 行段重采样为 size 列；尺寸一致时直接切片"""
+    if image.shape[0] == size and image.shape[1] == size:
+        return image[rows]
+    row_idx = (np.arange(rows.start, rows.stop) * image.shape[0]) // size
+    col_idx = (np.arange(size) * image.shape[1]) // size
+    return image[row_idx][:, col_idx]
+
+
+def composite_nebula(density, colors, brightness=0.8, starfield=None, output_size=None):
+    """把密度图与星空层合成为 uint8 RGB 图像，效果等同于 draw_nebula 的两层 imshow
+
+    两层都先量化为 uint8 再做整数加法，与浮点混合相比每通道误差不超过 1。
+    """
+    if output_size is None:
+        output_size = max(density.shape[0], starfield.shape[0] if starfield is not None else 0)
+    if not 0 < output_size <= MAX_OUTPUT_SIZE:
+        raise ValueError(f"output_size 必须在 1 到 {MAX_OUTPUT_SIZE} 之间")
+
+    lut = blend_lut(colors, starfield is not None)
+    # origin='lower'：第 0 行在图像底部
+    indices = lut_indices(density[::-1] * brightness)
+    stars = starfield[::-1] if starfield is not None else None
+
+    image = np.empty((output_size, output_size, 3), dtype=np.uint8)
+    for start in range(0, output_size, ROW_CHUNK):
+        rows = slice(start, min(start + ROW_CHUNK, output_size))
+        chunk = image[rows]
+        np.take(lut, resample_nearest(indices, rows, output_size), axis=0, out=chunk)
+        if stars is not None:
+            chunk += star_levels(resample_nearest(stars, rows, output_size))[..., None]
+    return image
+
+
+def composite_tile(density, colors, brightness=0.8, starfield=None):
+    """同尺寸图层逐像素合成，不翻转也不重采样，供分块渲染使用"""
+    image = np.take(blend_lut(colors, starfield is not None), lut_indices(density * brightness), axis=0)
+    if starfield is not None:
+        image += star_levels(starfield)[..., None]
+    return image
+
+
+def benchmark_compositor(sizes=(800, 2048, 4096, 7680), repeats=3, figure_max_size=4096):
+    """对比 figure 路径（draw_nebula + PNG 栅格化）与 NumPy 合成器的端到端耗时（毫秒）"""
+    import matplotlib.pyplot as plt
+    from nebula_core import create_nebula_density, create_starfield, draw_nebula
+
+    rng = np.random.default_rng(0)
+    X, Y, density = create_nebula_density(rng=rng)
+    colors = ["#0b0b2b", "#1a1a4b", "#2d2d7a", "#4a4ab8", "#6b6bff", "#9d9dff"]
+    results = []
+    for size in sizes:
+        starfield = create_starfield(size, rng=rng)
+
+        def figure_path():
+            fig = draw_nebula(X, Y, density, colors, starfield=starfield)
+            buf = io.BytesIO()
+            fig.savefig(buf, format="png", dpi=size / 8)
+            plt.close(fig)
+
+        def numpy_path():
+            composite_nebula(density, colors, starfield=starfield, output_size=size)
+
+        row = {"size": size}
+        for name, fn in (("figure", figure_path), ("numpy", numpy_path)):
+            if name == "figure" and size > figure_max_size:
+                row["figure_ms"] = None
+                continue
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                fn()
+                best = min(best, time.perf_counter() - start)
+            row[f"{name}_ms"] = best * 1000
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_compositor():
+        figure = f"{row['figure_ms']:8.1f} ms" if row["figure_ms"] is not None else "     n/a   "
+        print(f"{row['size']:>5}px  figure {figure}  numpy {row['numpy_ms']:8.1f} ms")
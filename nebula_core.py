@@ -0,0 +1,356 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.colors import LinearSegmentedColormap, ListedColormap
+import random
+from scipy import ndimage
+import pandas as pd
+import io
+import time
+from nebula_memory import scratch
+from nebula_noise import generate_spectral_noise
+from nebula_psf import render_psf_starfield
+from nebula_starfield import render_starfield
+
+# -----------------------------------
+# 色板管理器
+# -----------------------------------
+class ColorPaletteManager:
+    def __init__(self):
+        self.default_palettes = [
+            ["#0b0b2b", "#1a1a4b", "#2d2d7a", "#4a4ab8", "#6b6bff", "#9d9dff"],
+            ["#1a0033", "#330066", "#6600cc", "#9966ff", "#ccb3ff", "#e6d9ff"],
+            ["#00264d", "#004d99", "#0080ff", "#66b3ff", "#b3d9ff", "#e6f2ff"],
+            ["#330033", "#660066", "#990099", "#cc00cc", "#ff66ff", "#ffb3ff"],
+            ["#003300", "#006600", "#009900", "#00cc00", "#66ff66", "#b3ffb3"],
+        ]
+        self.custom_palettes = []
+        self.palette_names = [f"默认色板 {i+1}" for i in range(len(self.default_palettes))]
+        self.palette_names_custom = []
+        self.current_palette_idx = 0
+    
+    def get_all_palettes(self):
+        return self.default_palettes + [p['colors'] for p in self.custom_palettes]
+    
+    def get_palette_names(self):
+        return self.palette_names + self.palette_names_custom
+    
+    def get_palette(self, idx):
+        return self.get_all_palettes()[idx]
+    
+    def add_palette(self, name, colors):
+        if len([c for c in colors if self.is_valid_color(c)]) >= 3:
+            self.custom_palettes.append({'name': name, 'colors': colors})
+            self.palette_names_custom.append(f"自定义: {name}")
+            return True
+        return False
+
+    def delete_palette(self, idx):
+        if idx < len(self.default_palettes):
+            return False
+        custom_idx = idx - len(self.default_palettes)
+        if 0 <= custom_idx < len(self.custom_palettes):
+            del self.custom_palettes[custom_idx]
+            del self.palette_names_custom[custom_idx]
+            return True
+        return False
+
+    def is_valid_color(self, color):
+        return (isinstance(color, str) and color.startswith('#') and len(color) in [7, 9])
+    
+    def export_as_csv(self):
+        if not self.custom_palettes:
+            return None
+        csv_data = "PaletteName,Color1,Color2,Color3,Color4,Color5,Color6\n"
+        for item in self.custom_palettes:
+            colors = item['colors'] + [''] * (6 - len(item['colors']))
+            row = [item['name']] + colors[:6]
+            csv_data += ','.join([f'"{i}"' for i in row]) + "\n"
+        return csv_data.encode("utf-8")
+
+    def import_csv(self, csv_bytes):
+        content = csv_bytes.decode("utf-8")
+        try:
+            df = pd.read_csv(io.StringIO(content))
+            imported = 0
+            for _, row in df.iterrows():
+                name = str(row.iloc[0])
+                colors = [str(row.iloc[i]) for i in range(1,7) if pd.notna(row.iloc[i]) and self.is_valid_color(str(row.iloc[i]))]
+                if len(colors) >= 3 and name and name not in self.palette_names_custom:
+                    self.add_palette(name, colors)
+                    imported += 1
+            return imported
+        except Exception as e:
+            return 0
+
+# -----------------------------------
+# Nebula Core Functions
+# -----------------------------------
+def generate_fractal_noise(resolution, octaves=4, persistence=0.5, rng=None, dtype=np.float64, arena=None):
+    rng = np.random.default_rng() if rng is None else rng
+    shape = (resolution, resolution)
+    noise = scratch(arena, "plane_b", shape, dtype, zero=True)
+    octave_noise = scratch(arena, "plane_a", shape, dtype)
+    frequency = 1
+    amplitude = 1
+    max_amplitude = 0
+    for _ in range(octaves):
+        rng.standard_normal(dtype=dtype, out=octave_noise)
+        ndimage.gaussian_filter(octave_noise, sigma=1/frequency, output=octave_noise)
+        octave_noise *= amplitude
+        noise += octave_noise
+        max_amplitude += amplitude
+        amplitude *= persistence
+        frequency *= 2
+    noise /= max_amplitude
+    return noise
+
+KERNEL_CUTOFF = 4.0  # 高斯核在 4 sigma 之外截断，截断项 < exp(-8) ≈ 3.4e-4 × 振幅
+
+def nebula_grid(resolution, dtype=np.float64):
+    """返回 1-D 坐标轴以及只读广播视图 X/Y，不分配完整网格"""
+    x = np.linspace(0, 1, resolution, dtype=dtype)
+    X = np.broadcast_to(x, (resolution, resolution))
+    Y = np.broadcast_to(x[:, np.newaxis], (resolution, resolution))
+    return x, X, Y
+
+def axis_window(axis, lo, hi):
+    """返回坐标轴 axis（单调递增）上落在 [lo, hi] 内的索引区间"""
+    return int(np.searchsorted(axis, lo, "left")), int(np.searchsorted(axis, hi, "right"))
+
+def add_gaussian_clump(density, x_rows, x_cols, cx, cy, sigma, amplitude):
+    """在 4 sigma 包围盒内累加各向同性高斯，按两个 1-D 高斯的外积计算
+
+    x_rows/x_cols 是 density 每行/每列对应的全局坐标，可以是整图或任意窗口。
+    """
+    r = KERNEL_CUTOFF * sigma
+    c0, c1 = axis_window(x_cols, cx - r, cx + r)
+    r0, r1 = axis_window(x_rows, cy - r, cy + r)
+    if c0 >= c1 or r0 >= r1:
+        return
+    gx = np.exp(-((x_cols[c0:c1] - cx) ** 2) / (2 * sigma ** 2))
+    gy = np.exp(-((x_rows[r0:r1] - cy) ** 2) / (2 * sigma ** 2)) * amplitude
+    density[r0:r1, c0:c1] += gy[:, np.newaxis] * gx[np.newaxis, :]
+
+def add_filament(density, x_rows, x_cols, cx, cy, u, v, width, amplitude):
+    """累加一条丝状结构，只在解析求得的包围盒内计算
+
+    丝状结构的距离为 (x_j - cx - u*t_i)^2 + (y_i - cy - v*t_j)^2（t = x - 0.5），两项都小于
+    (4*width)^2 的区域是一个平行四边形，由 1 - u*v 的线性方程组给出其包围盒。
+    """
+    r = KERNEL_CUTOFF * width
+    det = 1 - u * v
+    if det > 0.05:
+        p0 = ((cx - 0.5) + u * (cy - 0.5)) / det
+        q0 = ((cy - 0.5) + v * (cx - 0.5)) / det
+        dp = r * (1 + abs(u)) / det
+        dq = r * (1 + abs(v)) / det
+        c0, c1 = axis_window(x_cols, p0 - dp + 0.5, p0 + dp + 0.5)
+        r0, r1 = axis_window(x_rows, q0 - dq + 0.5, q0 + dq + 0.5)
+    else:
+        c0, c1, r0, r1 = 0, len(x_cols), 0, len(x_rows)
+    if c0 >= c1 or r0 >= r1:
+        return
+    cols = x_cols[np.newaxis, c0:c1]
+    rows = x_rows[r0:r1, np.newaxis]
+    filament_x = cx + u * (rows - 0.5)
+    filament_y = cy + v * (cols - 0.5)
+    dist2 = (cols - filament_x) ** 2 + (rows - filament_y) ** 2
+    density[r0:r1, c0:c1] += np.exp(-dist2 / (2 * width ** 2)) * amplitude
+
+def draw_density_layout(center=(0.5, 0.5), size=0.4, rng=None):
+    """抽取主体、团块与丝状结构的参数，之后可以在任意分辨率或窗口上复用"""
+    rng = np.random.default_rng() if rng is None else rng
+    clumps = []
+    num_clumps = int(rng.integers(8, 16))
+    for _ in range(num_clumps):
+        clump_x = center[0] + rng.uniform(-size*0.8, size*0.8)
+        clump_y = center[1] + rng.uniform(-size*0.8, size*0.8)
+        clump_size = rng.uniform(size/8, size/4)
+        clumps.append((clump_x, clump_y, clump_size, rng.uniform(0.3, 0.7)))
+    filaments = []
+    num_filaments = int(rng.integers(3, 7))
+    for _ in range(num_filaments):
+        angle = rng.uniform(0, 2 * np.pi)
+        length = rng.uniform(size * 0.5, size * 1.2)
+        width = rng.uniform(size / 15, size / 8)
+        filaments.append((np.cos(angle) * length, np.sin(angle) * length, width, rng.uniform(0.4, 0.8)))
+    return {"center": tuple(center), "size": size, "clumps": clumps, "filaments": filaments}
+
+def render_density_layout(layout, x_rows, x_cols, out=None):
+    """在给定坐标窗口上累加主体、团块与丝状结构（不含噪声与平滑）；out 需预先清零"""
+    if out is None:
+        out = np.zeros((len(x_rows), len(x_cols)), dtype=x_cols.dtype)
+    cx, cy = layout["center"]
+    for clump in layout["clumps"]:
+        add_gaussian_clump(out, x_rows, x_cols, *clump)
+    for u, v, width, amplitude in layout["filaments"]:
+        add_filament(out, x_rows, x_cols, cx, cy, u, v, width, amplitude)
+    out *= 0.4
+    add_gaussian_clump(out, x_rows, x_cols, cx, cy, layout["size"] / 3, 0.6)
+    return out
+
+NOISE_GENERATORS = {
+    "gaussian": generate_fractal_noise,
+    "spectral": generate_spectral_noise,
+}
+
+def create_nebula_density(center=(0.5, 0.5), size=0.4, resolution=200, rng=None, noise="gaussian",
+                          dtype=np.float64, arena=None):
+    """生成云气体密度图
+
+    团块与丝状结构只在 4 sigma 包围盒内计算，成本随团块面积而非分辨率平方增长。
+    与 create_nebula_density_dense 使用同一随机流时，归一化后的最大绝对误差 < 1e-3。
+    noise 选择分形噪声生成器："gaussian"（逐倍频程高斯滤波）或 "spectral"（单次 FFT）。
+    dtype=np.float32 配合 ScratchArena 为省内存模式：全程单精度、原地累加，
+    两张整幅临时平面在多次调用（以及 create_starfield）间复用，只有返回的密度图是新分配的。
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    shape = (resolution, resolution)
+    x, X, Y = nebula_grid(resolution, dtype)
+    layout = draw_density_layout(center, size, rng)
+    if noise == "gaussian":
+        fractal_noise = generate_fractal_noise(resolution, octaves=4, rng=rng, dtype=dtype, arena=arena)
+    else:
+        fractal_noise = NOISE_GENERATORS[noise](resolution, octaves=4, rng=rng)
+    # 噪声生成完毕后 plane_a 空闲，用来累加团块与丝状结构
+    density = render_density_layout(layout, x, x, out=scratch(arena, "plane_a", shape, dtype, zero=True))
+    fractal_noise *= 0.2
+    density += fractal_noise
+    result = np.empty(shape, dtype=dtype)
+    ndimage.gaussian_filter(density, sigma=1.2, output=result)
+    result -= result.min()
+    result /= result.max()
+    return X, Y, result
+
+def create_nebula_density_dense(center=(0.5, 0.5), size=0.4, resolution=200, rng=None):
+    # 原全分辨率实现，仅作为精度与基准测试的参照
+    rng = np.random.default_rng() if rng is None else rng
+    x = np.linspace(0, 1, resolution)
+    y = np.linspace(0, 1, resolution)
+    X, Y = np.meshgrid(x, y)
+    dist_from_center = np.sqrt((X - center[0]) ** 2 + (Y - center[1]) ** 2)
+    density = np.zeros_like(X)
+    main_body = np.exp(-(dist_from_center ** 2) / (2 * (size / 3) ** 2))
+    num_clumps = int(rng.integers(8, 16))
+    for _ in range(num_clumps):
+        clump_x = center[0] + rng.uniform(-size*0.8, size*0.8)
+        clump_y = center[1] + rng.uniform(-size*0.8, size*0.8)
+        clump_size = rng.uniform(size/8, size/4)
+        clump_dist = np.sqrt((X - clump_x) ** 2 + (Y - clump_y) ** 2)
+        clump = np.exp(-(clump_dist ** 2) / (2 * clump_size ** 2)) * rng.uniform(0.3, 0.7)
+        density += clump
+    num_filaments = int(rng.integers(3, 7))
+    for _ in range(num_filaments):
+        angle = rng.uniform(0, 2 * np.pi)
+        length = rng.uniform(size * 0.5, size * 1.2)
+        width = rng.uniform(size / 15, size / 8)
+        filament_x = center[0] + np.cos(angle) * length * np.linspace(-0.5, 0.5, resolution)[:, np.newaxis]
+        filament_y = center[1] + np.sin(angle) * length * np.linspace(-0.5, 0.5, resolution)[np.newaxis, :]
+        filament_dist = np.sqrt((X - filament_x) ** 2 + (Y - filament_y) ** 2)
+        filament = np.exp(-(filament_dist ** 2) / (2 * width ** 2)) * rng.uniform(0.4, 0.8)
+        density += filament
+    density = main_body * 0.6 + density * 0.4
+    fractal_noise = generate_fractal_noise(resolution, octaves=4, rng=rng)
+    density += fractal_noise * 0.2
+    density = ndimage.gaussian_filter(density, sigma=1.2)
+    density = (density - density.min()) / (density.max() - density.min())
+    return X, Y, density
+
+def create_nebula_colormap(colors):
+    # 已编译的 256x3 uint8 LUT（PaletteStore.get_lut）直接作为离散色表
+    if isinstance(colors, np.ndarray):
+        return ListedColormap(colors[:, :3] / 255, "nebula_cmap")
+    return LinearSegmentedColormap.from_list("nebula_cmap", colors)
+
+def create_starfield(resolution=800, num_stars=600, brightness_factor=1.0, rng=None, dtype=np.float64, arena=None,
+                     psf="cone"):
+    """psf="cone" 为原线性衰减星核；"gaussian" / "moffat" / "spikes" 使用 PSF 图集渲染器"""
+    if psf != "cone":
+        starfield, _ = render_psf_starfield(resolution, num_stars, brightness_factor, rng, psf, dtype)
+        return starfield
+    starfield, _ = render_starfield(resolution, num_stars, brightness_factor, rng, dtype, arena)
+    return starfield
+
+def create_starfield_loop(resolution=800, num_stars=600, brightness_factor=1.0):
+    # 原逐像素循环实现，仅作为基准测试的参照
+    starfield = np.zeros((resolution, resolution))
+    for _ in range(num_stars):
+        x = random.randint(0, resolution-1)
+        y = random.randint(0, resolution-1)
+        base_brightness = random.uniform(0.5, 1.2) * brightness_factor
+        size = random.randint(1, 4)
+        for i in range(max(0, x-size), min(resolution, x+size+1)):
+            for j in range(max(0, y-size), min(resolution, y+size+1)):
+                dist = np.sqrt((i-x)**2 + (j-y)**2)
+                if dist <= size:
+                    star_intensity = base_brightness * (1 - dist/size)
+                    starfield[j, i] = max(starfield[j, i], star_intensity)
+    tiny_stars = np.random.random((resolution, resolution)) * 0.2 * brightness_factor
+    tiny_stars = tiny_stars * (tiny_stars > 0.06)
+    starfield += tiny_stars
+    for _ in range(20):
+        x = random.randint(0, resolution-1)
+        y = random.randint(0, resolution-1)
+        bright_star_intensity = random.uniform(1.5, 2.5) * brightness_factor
+        size = random.randint(2, 5)
+        for i in range(max(0, x-size), min(resolution, x+size+1)):
+            for j in range(max(0, y-size), min(resolution, y+size+1)):
+                dist = np.sqrt((i-x)**2 + (j-y)**2)
+                if dist <= size:
+                    intensity = bright_star_intensity * (1 - dist/size)
+                    starfield[j, i] = max(starfield[j, i], intensity)
+    starfield = np.clip(starfield, 0, 1.0)
+    return starfield
+
+def draw_nebula(X, Y, density, colors, brightness=0.8, star_brightness=1.0, with_starfield=True, starfield=None):
+    fig, ax = plt.subplots(figsize=(8, 8))
+    fig.patch.set_facecolor('black')
+    ax.set_facecolor('black')
+    cmap = create_nebula_colormap(colors)
+    adjusted_density = density * brightness
+    im = ax.imshow(adjusted_density, extent=[0, 1, 0, 1], cmap=cmap,
+                   origin='lower', alpha=0.9, vmin=0, vmax=1)
+    if with_starfield:
+        if starfield is None:
+            starfield = create_starfield(brightness_factor=star_brightness)
+        ax.imshow(starfield, extent=[0, 1, 0, 1], cmap='gray',
+                  origin='lower', alpha=0.8, vmin=0, vmax=1)
+    ax.set_xticks([]); ax.set_yticks([])
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    plt.tight_layout()
+    return fig
+
+def figure_to_rgb(fig):
+    fig.canvas.draw()
+    rgb = np.asarray(fig.canvas.buffer_rgba())[..., :3].copy()
+    plt.close(fig)
+    return rgb
+
+def benchmark_density(resolutions=(200, 1024, 2048, 4096), repeats=3, dense_max_resolution=2048):
+    """对比包围盒密度引擎与全分辨率实现的耗时（毫秒）及最大绝对误差"""
+    results = []
+    for resolution in resolutions:
+        row = {"resolution": resolution, "dense_ms": None, "max_abs_error": None}
+        for name, fn in (("bbox", create_nebula_density), ("dense", create_nebula_density_dense)):
+            if name == "dense" and resolution > dense_max_resolution:
+                continue
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                _, _, density = fn(resolution=resolution, rng=np.random.default_rng(0))
+                best = min(best, time.perf_counter() - start)
+            row[f"{name}_ms"] = best * 1000
+            row[name] = density
+        if "dense" in row:
+            row["max_abs_error"] = float(np.abs(row.pop("bbox") - row.pop("dense")).max())
+        else:
+            row.pop("bbox")
+        results.append(row)
+    return results
+
+if __name__ == "__main__":
+    for row in benchmark_density():
+        dense = f"{row['dense_ms']:8.1f} ms" if row["dense_ms"] is not None else "     n/a   "
+        error = f"{row['max_abs_error']:.1e}" if row["max_abs_error"] is not None else "n/a"
+        print(f"{row['resolution']:>5}px  dense {dense}  bbox {row['bbox_ms']:8.1f} ms  max|err| {error}")
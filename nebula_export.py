@@ -0,0 +1,247 @@
+import io
+import os
+import struct
+import time
+import zipfile
+import zlib
+from contextlib import nullcontext
+from importlib.util import find_spec
+import numpy as np
+from nebula_tiled import PNG_STRIP_ROWS, write_png_stream
+
+# -----------------------------------
+# 无损导出（16 位 PNG / TIFF、float32 TIFF、压缩 npz）
+# -----------------------------------
+EXPORT_FORMATS = ("npz", "tiff16", "tiff32", "png16")
+NPZ_COMPRESSORS = ("zlib", "lz4") if find_spec("lz4") else ("zlib",)
+DEFAULT_LEVEL = 1  # zlib 级别 1 已能把平滑的密度层压到原始大小的一小部分，速度远快于默认的 6
+TIFF_STRIP_ROWS = 64
+
+
+def open_binary(target):
+    """路径则以 "wb" 打开，已打开的文件对象原样使用且不关闭"""
+    return open(target, "wb") if isinstance(target, (str, os.PathLike)) else nullcontext(target)
+
+
+def iter_row_strips(layer, strip_rows=PNG_STRIP_ROWS, flip=True):
+    """按图像行序产出行条带视图；flip=True 时与 origin='lower' 的显示方向一致（从最后一行开始）"""
+    height = layer.shape[0]
+    for top in range(0, height, strip_rows):
+        bottom = min(top + strip_rows, height)
+        yield layer[height - bottom:height - top][::-1] if flip else layer[top:bottom]
+
+
+def quantize16(strip):
+    """[0, 1] 浮点 -> uint16，只为当前条带分配临时数组"""
+    out = np.clip(strip, 0, 1) * 65535
+    return np.rint(out, out=out).astype(np.uint16)
+
+
+# ---------- PNG ----------
+def write_layer_png16(target, layer, level=DEFAULT_LEVEL, strip_rows=PNG_STRIP_ROWS):
+    """把一个浮点图层写成 16 位灰度 PNG，逐条带量化并压缩"""
+    height, width = layer.shape
+    strips = (quantize16(strip) for strip in iter_row_strips(layer, strip_rows))
+    return write_png_stream(target, width, height, strips, bit_depth=16, channels=1, level=level, sub_filter=True)
+
+
+def write_layers_png16(target, layers, level=DEFAULT_LEVEL, strip_rows=PNG_STRIP_ROWS):
+    """PNG 一个文件只能放一层：每层写成 <名称>.png，打包为不再压缩的 zip"""
+    with open_binary(target) as f, zipfile.ZipFile(f, "w", zipfile.ZIP_STORED) as zf:
+        for name, layer in layers.items():
+            with zf.open(f"{name}.png", "w", force_zip64=True) as entry:
+                write_layer_png16(entry, np.asarray(layer), level, strip_rows)
+    return target
+
+
+# ---------- TIFF ----------
+TIFF_SHORT, TIFF_LONG, TIFF_ASCII = 3, 4, 2
+
+
+def tiff_entry(tag, kind, values):
+    """返回 (tag, kind, count, 负载字节)；负载不超过 4 字节时直接放入 IFD"""
+    if kind == TIFF_ASCII:
+        payload = values.encode("ascii") + b"\0"
+        return tag, kind, len(payload), payload
+    fmt = "<%d%s" % (len(values), "H" if kind == TIFF_SHORT else "I")
+    return tag, kind, len(values), struct.pack(fmt, *values)
+
+
+def tiff_predict(strip, bits):
+    """TIFF 预测器：16 位用水平差分（Predictor=2），float32 用浮点预测（Predictor=3）
+
+    浮点预测把每行的 4 个字节平面按高位在前拼接后再逐字节差分，指数与高位尾数变化缓慢，压缩率明显提升。
+    """
+    if bits == 16:
+        values = quantize16(strip).astype("<u2", copy=False)
+        values[:, 1:] = np.diff(values, axis=1)
+        return values.tobytes()
+    planes = np.ascontiguousarray(strip, dtype=">f4").view(np.uint8)
+    rows = planes.reshape(strip.shape[0], strip.shape[1], 4).transpose(0, 2, 1).reshape(strip.shape[0], -1)
+    rows = np.ascontiguousarray(rows)
+    rows[:, 1:] = np.diff(rows, axis=1)
+    return rows.tobytes()
+
+
+def write_tiff_page(f, layer, name, bits, level, strip_rows, ifd_link):
+    """写一页（一个图层）的条带数据与 IFD，回填上一页的 next-IFD 指针；返回本页 next 指针的位置"""
+    height, width = layer.shape
+    offsets, counts = [], []
+    for strip in iter_row_strips(layer, strip_rows):
+        if level:
+            data = zlib.compress(tiff_predict(strip, bits), level)
+        elif bits == 16:
+            data = quantize16(strip).astype("<u2", copy=False).tobytes()
+        else:
+            data = np.ascontiguousarray(strip, dtype="<f4").tobytes()
+        offsets.append(f.tell())
+        counts.append(len(data))
+        f.write(data)
+
+    entries = [
+        tiff_entry(256, TIFF_LONG, [width]),
+        tiff_entry(257, TIFF_LONG, [height]),
+        tiff_entry(258, TIFF_SHORT, [bits]),
+        tiff_entry(259, TIFF_SHORT, [8 if level else 1]),  # 8 = Adobe Deflate
+        tiff_entry(262, TIFF_SHORT, [1]),  # BlackIsZero
+        tiff_entry(273, TIFF_LONG, offsets),
+        tiff_entry(277, TIFF_SHORT, [1]),
+        tiff_entry(278, TIFF_LONG, [strip_rows]),
+        tiff_entry(279, TIFF_LONG, counts),
+        tiff_entry(284, TIFF_SHORT, [1]),
+        tiff_entry(285, TIFF_ASCII, name),
+        tiff_entry(317, TIFF_SHORT, [(2 if bits == 16 else 3) if level else 1]),  # Predictor
+        tiff_entry(339, TIFF_SHORT, [1 if bits == 16 else 3]),  # SampleFormat: uint / IEEE float
+    ]
+    if f.tell() % 2:
+        f.write(b"\0")
+    ifd_start = f.tell()
+    extra = ifd_start + 2 + 12 * len(entries) + 4
+    ifd = [struct.pack("<H", len(entries))]
+    blobs = []
+    for tag, kind, count, payload in entries:
+        if len(payload) <= 4:
+            ifd.append(struct.pack("<HHI", tag, kind, count) + payload.ljust(4, b"\0"))
+        else:
+            ifd.append(struct.pack("<HHII", tag, kind, count, extra))
+            blobs.append(payload)
+            extra += len(payload) + len(payload) % 2
+    f.write(b"".join(ifd))
+    next_link = f.tell()
+    f.write(struct.pack("<I", 0))
+    for payload in blobs:
+        f.write(payload + b"\0" * (len(payload) % 2))
+    end = f.tell()
+    f.seek(ifd_link)
+    f.write(struct.pack("<I", ifd_start))
+    f.seek(end)
+    return next_link
+
+
+def write_layers_tiff(target, layers, bits=16, level=DEFAULT_LEVEL, strip_rows=TIFF_STRIP_ROWS):
+    """把 {名称: 图层} 写成多页 TIFF，每页一个图层，Deflate 压缩的行条带
+
+    bits=16 量化到 uint16；bits=32 写原始 float32（不截断，保留完整动态范围）。
+    """
+    if bits not in (16, 32):
+        raise ValueError("bits 必须是 16 或 32")
+    with open_binary(target) as f:
+        f.write(b"II*\0")
+        link = f.tell()
+        f.write(struct.pack("<I", 0))
+        for name, layer in layers.items():
+            link = write_tiff_page(f, layer, name, bits, level, strip_rows, link)
+    return target
+
+
+# ---------- npz ----------
+def write_layers_npz(target, layers, compressor="zlib", level=DEFAULT_LEVEL):
+    """把 {名称: 图层} 写成 npz；数组按块流式写入 zip 条目，不生成整幅副本
+
+    compressor="zlib" 为标准 npz（np.load 可直接读取）；"lz4" 需要 lz4 包，条目为 <名称>.npy.lz4，
+    用 read_layers_npz 读取。方向与 TIFF / PNG 一致：第 0 行为图像顶部（y 最大处）。
+    """
+    if compressor not in NPZ_COMPRESSORS:
+        raise ValueError(f"不支持的压缩方式: {compressor}")
+    with open_binary(target) as f:
+        if compressor == "zlib":
+            with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED, compresslevel=level) as zf:
+                for name, layer in layers.items():
+                    with zf.open(f"{name}.npy", "w", force_zip64=True) as entry:
+                        np.lib.format.write_array(entry, np.asarray(layer)[::-1], allow_pickle=False)
+        else:
+            import lz4.frame
+
+            with zipfile.ZipFile(f, "w", zipfile.ZIP_STORED) as zf:
+                for name, layer in layers.items():
+                    with zf.open(f"{name}.npy.lz4", "w", force_zip64=True) as entry, \
+                            lz4.frame.open(entry, "wb", compression_level=level) as stream:
+                        np.lib.format.write_array(stream, np.asarray(layer)[::-1], allow_pickle=False)
+    return target
+
+
+def read_layers_npz(source):
+    """读取 write_layers_npz 写出的文件，返回 {名称: 数组}"""
+    layers = {}
+    with zipfile.ZipFile(source) as zf:
+        for name in zf.namelist():
+            with zf.open(name) as entry:
+                if name.endswith(".npy.lz4"):
+                    import lz4.frame
+
+                    with lz4.frame.open(entry, "rb") as stream:
+                        layers[name[:-8]] = np.lib.format.read_array(stream)
+                else:
+                    layers[name[:-4]] = np.lib.format.read_array(entry)
+    return layers
+
+
+# ---------- 入口 ----------
+def export_layers(target, density, starfield, fmt="npz", level=DEFAULT_LEVEL, compressor="zlib"):
+    """按格式导出密度与星空图层；png16 为两张 16 位 PNG 的 zip"""
+    layers = {"density": density, "starfield": starfield}
+    if fmt == "npz":
+        return write_layers_npz(target, layers, compressor, level)
+    if fmt in ("tiff16", "tiff32"):
+        return write_layers_tiff(target, layers, bits=int(fmt[4:]), level=level)
+    if fmt == "png16":
+        return write_layers_png16(target, layers, level)
+    raise ValueError(f"未知的导出格式: {fmt}")
+
+
+EXPORT_EXTENSIONS = {"npz": "npz", "tiff16": "tif", "tiff32": "tif", "png16": "zip"}
+EXPORT_MIME = {"npz": "application/zip", "tiff16": "image/tiff", "tiff32": "image/tiff", "png16": "application/zip"}
+
+
+def export_bytes(density, starfield, fmt="npz", level=DEFAULT_LEVEL, compressor="zlib"):
+    buf = io.BytesIO()
+    export_layers(buf, density, starfield, fmt, level, compressor)
+    return buf.getvalue()
+
+
+def benchmark_export(resolution=4096, levels=(0, 1, 6), formats=EXPORT_FORMATS):
+    """各格式 / 压缩级别的写出耗时与压缩比（相对 float32 原始大小）"""
+    import tempfile
+    from nebula_core import create_nebula_density, create_starfield
+
+    _, _, density = create_nebula_density(resolution=resolution, rng=np.random.default_rng(0), dtype=np.float32)
+    starfield = create_starfield(resolution, rng=np.random.default_rng(1), dtype=np.float32)
+    raw = density.nbytes + starfield.nbytes
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in formats:
+            for compressor in NPZ_COMPRESSORS if fmt == "npz" else ("zlib",):
+                for level in levels:
+                    path = os.path.join(tmp, f"out.{EXPORT_EXTENSIONS[fmt]}")
+                    start = time.perf_counter()
+                    export_layers(path, density, starfield, fmt, level, compressor)
+                    elapsed = time.perf_counter() - start
+                    results.append({"format": fmt, "compressor": compressor, "level": level,
+                                    "ms": elapsed * 1000, "ratio": os.path.getsize(path) / raw})
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_export():
+        print(f"{row['format']:>7} {row['compressor']:>4} level {row['level']}  {row['ms']:8.1f} ms  "
+              f"size {row['ratio'] * 100:5.1f}% of float32")
@@ -0,0 +1,110 @@
+import json
+import subprocess
+import sys
+import tracemalloc
+import numpy as np
+
+# -----------------------------------
+# 省内存模式：可复用的临时缓冲区
+# -----------------------------------
+class ScratchArena:
+    """按 (名称, 形状, dtype) 复用临时数组，避免每次重跑都重新分配整幅缓冲区
+
+    同一个 arena 不能被多个线程同时使用；Streamlit 中每个会话各持有一个。
+    """
+
+    def __init__(self):
+        self.buffers = {}
+
+    def buffer(self, name, shape, dtype=np.float64, zero=False):
+        key = (name, tuple(shape), np.dtype(dtype))
+        buf = self.buffers.get(key)
+        if buf is None:
+            buf = self.buffers[key] = np.empty(shape, dtype=dtype)
+        if zero:
+            buf.fill(0)
+        return buf
+
+    def release(self):
+        self.buffers.clear()
+
+    @property
+    def nbytes(self):
+        return sum(buf.nbytes for buf in self.buffers.values())
+
+
+def scratch(arena, name, shape, dtype, zero=False):
+    """有 arena 时取复用缓冲区，否则新分配"""
+    if arena is None:
+        return np.zeros(shape, dtype=dtype) if zero else np.empty(shape, dtype=dtype)
+    return arena.buffer(name, shape, dtype, zero)
+
+
+# -----------------------------------
+# 内存测量
+# -----------------------------------
+def traced_peak(fn, *args, **kwargs):
+    """返回 (结果, 调用期间 tracemalloc 记录的峰值字节数)；NumPy 的数组分配会被计入"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        result = fn(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def peak_rss_bytes():
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+PROBE = """
+import json, sys
+import numpy as np
+from nebula_core import create_nebula_density, create_starfield
+from nebula_memory import ScratchArena, peak_rss_bytes, traced_peak
+resolution, star_resolution, lean = int(sys.argv[1]), int(sys.argv[2]), sys.argv[3] == "1"
+dtype = np.float32 if lean else np.float64
+arena = ScratchArena() if lean else None
+# 先用小尺寸跑一遍，把惰性导入的模块计入基线
+create_nebula_density(resolution=16, dtype=dtype)
+create_starfield(16, dtype=dtype)
+baseline = peak_rss_bytes()
+traced = 0
+for _ in range(3):
+    _, density_peak = traced_peak(create_nebula_density, resolution=resolution, rng=np.random.default_rng(0),
+                                  dtype=dtype, arena=arena)
+    _, star_peak = traced_peak(create_starfield, star_resolution, rng=np.random.default_rng(0),
+                               dtype=dtype, arena=arena)
+    traced = density_peak + star_peak
+print(json.dumps({"baseline": baseline, "peak": peak_rss_bytes(), "traced": traced}))
+"""
+
+
+def memory_report(resolution=2048, star_resolution=2048):
+    """在独立子进程中分别运行 float64 原始模式与 float32 省内存模式
+
+    报告进程峰值 RSS、流水线带来的 RSS 增量，以及 arena 预热后单次重跑的 NumPy 分配峰值。
+    """
+    import os
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    report = {}
+    for mode, lean in (("float64", "0"), ("float32", "1")):
+        out = subprocess.run([sys.executable, "-c", PROBE, str(resolution), str(star_resolution), lean],
+                             cwd=here, capture_output=True, text=True, check=True).stdout
+        probe = json.loads(out)
+        report[mode] = {"peak_rss": probe["peak"], "pipeline_rss": probe["peak"] - probe["baseline"],
+                        "rerun_allocations": probe["traced"]}
+    return report
+
+
+if __name__ == "__main__":
+    for mode, row in memory_report().items():
+        print(f"{mode}: peak RSS {row['peak_rss'] / 1024 ** 2:8.1f} MiB  "
+              f"pipeline {row['pipeline_rss'] / 1024 ** 2:8.1f} MiB  "
+              f"rerun allocations {row['rerun_allocations'] / 1024 ** 2:8.1f} MiB")
@@ -0,0 +1,95 @@
+import time
+from functools import lru_cache
+import numpy as np
+from scipy import fft
+
+# -----------------------------------
+# 频域分形噪声
+# -----------------------------------
+def gaussian_response(freqs, sigma):
+    """与 ndimage.gaussian_filter（truncate=4）相同的离散高斯核的频率响应"""
+    radius = int(4 * sigma + 0.5)
+    taps = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * taps ** 2 / sigma ** 2)
+    kernel /= kernel.sum()
+    return (kernel[:, np.newaxis] * np.cos(2 * np.pi * taps[:, np.newaxis] * freqs[np.newaxis, :])).sum(axis=0)
+
+
+@lru_cache(maxsize=8)
+def spectral_filter(shape, octaves=4, persistence=0.5, beta=None, dtype=np.float32):
+    """构造 rfft2 半平面上的幅度响应（按参数缓存，只读）
+
+    beta 为 None 时，合成与 generate_fractal_noise 统计等价的频谱：各倍频程是独立的
+    高斯滤波白噪声，和的功率谱等于 sum(a_k^2 * |G_k(fy) G_k(fx)|^2)，再除以 sum(a_k)。
+    beta 为数值时使用 1/f^beta 功率谱（去掉直流分量），并归一化到单位方差。
+    """
+    fy = fft.fftfreq(shape[0])
+    fx = fft.rfftfreq(shape[1])
+    if beta is None:
+        power = np.zeros((len(fy), len(fx)))
+        amplitude = 1.0
+        max_amplitude = 0.0
+        for octave in range(octaves):
+            sigma = 1 / 2 ** octave
+            response = np.outer(gaussian_response(fy, sigma), gaussian_response(fx, sigma))
+            power += amplitude ** 2 * response ** 2
+            max_amplitude += amplitude
+            amplitude *= persistence
+        response = (np.sqrt(power) / max_amplitude).astype(dtype)
+        response.setflags(write=False)
+        return response
+    f2 = (fy[:, np.newaxis] ** 2 + fx[np.newaxis, :] ** 2).astype(dtype)
+    f2[0, 0] = 1
+    response = f2 ** (-beta / 4)
+    response[0, 0] = 0
+    # 白噪声经 rfft2 后每个频点方差为 N，这里让输出方差为 1
+    weights = np.full(f2.shape[1], 2.0, dtype=dtype)
+    weights[0] = 1
+    if shape[1] % 2 == 0:
+        weights[-1] = 1
+    response /= np.sqrt((response ** 2 * weights).sum() / (shape[0] * shape[1]))
+    response.setflags(write=False)
+    return response
+
+
+def generate_spectral_noise(resolution, octaves=4, persistence=0.5, rng=None, beta=None,
+                            periodic=True, dtype=np.float32):
+    """一次 FFT 合成全部倍频程的噪声，成本与倍频程数无关
+
+    periodic=True 时结果可无缝平铺；为 False 时在扩边网格上合成后裁剪，消除环绕相关。
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    pad = 0 if periodic else max(8, resolution // 8)
+    shape = (resolution + pad, resolution + pad)
+    white = rng.standard_normal(shape, dtype=dtype)
+    spectrum = fft.rfft2(white, workers=-1)
+    spectrum *= spectral_filter(shape, octaves, persistence, beta, np.dtype(dtype))
+    noise = fft.irfft2(spectrum, s=shape, workers=-1)
+    return noise[:resolution, :resolution]
+
+
+def benchmark_noise(resolutions=(200, 512, 1024, 2048, 4096), octave_counts=(4, 8), repeats=3):
+    """对比 gaussian_filter 逐倍频程实现与频域实现的耗时（毫秒）"""
+    from nebula_core import generate_fractal_noise
+
+    results = []
+    for resolution in resolutions:
+        for octaves in octave_counts:
+            row = {"resolution": resolution, "octaves": octaves}
+            for name, fn in (("gaussian", generate_fractal_noise), ("spectral", generate_spectral_noise)):
+                best = float("inf")
+                for _ in range(repeats):
+                    rng = np.random.default_rng(0)
+                    start = time.perf_counter()
+                    fn(resolution, octaves=octaves, rng=rng)
+                    best = min(best, time.perf_counter() - start)
+                row[f"{name}_ms"] = best * 1000
+            row["speedup"] = row["gaussian_ms"] / row["spectral_ms"]
+            results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_noise():
+        print(f"{row['resolution']:>5}px  {row['octaves']} octaves  gaussian {row['gaussian_ms']:8.1f} ms  "
+              f"spectral {row['spectral_ms']:8.1f} ms  x{row['speedup']:.1f}")
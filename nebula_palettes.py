@@ -0,0 +1,202 @@
+import io
+import json
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from matplotlib.colors import to_rgba_array
+from nebula_core import ColorPaletteManager
+
+# -----------------------------------
+# 持久化色板库（SQLite，跨会话 / 跨进程共享）
+# -----------------------------------
+DEFAULT_DB_PATH = os.environ.get("NEBULA_PALETTE_DB", os.path.join(os.path.expanduser("~"), ".nebula_palettes.sqlite3"))
+LUT_SIZE = 256
+CSV_COLUMNS = ["PaletteName", "Color1", "Color2", "Color3", "Color4", "Color5", "Color6"]
+CSV_CHUNK_ROWS = 10_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS palettes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    colors TEXT NOT NULL,
+    lut BLOB NOT NULL
+)
+"""
+
+
+def compile_lut(colors):
+    """把色板编译为 256x3 uint8 查找表
+
+    与 LinearSegmentedColormap.from_list(colors)(np.linspace(0, 1, 256)) 的采样方式一致，
+    但直接用 np.interp 计算，不创建 matplotlib 对象。
+    """
+    stops = to_rgba_array(colors)[:, :3]
+    positions = np.linspace(0, 1, len(stops))
+    index = np.minimum((np.linspace(0, 1, LUT_SIZE) * LUT_SIZE).astype(int), LUT_SIZE - 1)
+    samples = index / (LUT_SIZE - 1)
+    lut = np.stack([np.interp(samples, positions, stops[:, c]) for c in range(3)], axis=1)
+    return np.rint(lut * 255).astype(np.uint8)
+
+
+def valid_color_mask(frame):
+    """与 ColorPaletteManager.is_valid_color 相同的规则，对整张表一次性判断"""
+    text = frame.astype("string")
+    return text.apply(lambda col: col.str.startswith("#") & col.str.len().isin([7, 9])).fillna(False).astype(bool)
+
+
+class PaletteStore(ColorPaletteManager):
+    """ColorPaletteManager 的持久化版本，自定义色板保存在 SQLite 中
+
+    其他进程写入后通过 PRAGMA data_version 感知并重新加载；每个色板入库时编译一次 LUT。
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        super().__init__()
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        self._rows = []
+        self._luts = {}
+        self._data_version = None
+        self._reload()
+
+    # ---------- 内部缓存 ----------
+    def _reload(self):
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return
+            self._rows = [(pid, name, json.loads(colors))
+                          for pid, name, colors in self._conn.execute("SELECT id, name, colors FROM palettes ORDER BY id")]
+            self._luts = {}
+            self._data_version = version
+
+    def _invalidate(self):
+        self._data_version = None
+
+    @property
+    def custom_palettes(self):
+        self._reload()
+        return [{'name': name, 'colors': colors} for _, name, colors in self._rows]
+
+    @custom_palettes.setter
+    def custom_palettes(self, value):
+        # ColorPaletteManager.__init__ 会赋值空列表，数据以数据库为准
+        pass
+
+    @property
+    def palette_names_custom(self):
+        self._reload()
+        return [f"自定义: {name}" for _, name, _ in self._rows]
+
+    @palette_names_custom.setter
+    def palette_names_custom(self, value):
+        pass
+
+    # ---------- 读写 ----------
+    def add_palette(self, name, colors):
+        colors = [c for c in colors if self.is_valid_color(c)]
+        if len(colors) < 3:
+            return False
+        with self._lock:
+            self._conn.execute("INSERT INTO palettes (name, colors, lut) VALUES (?, ?, ?)",
+                               (name, json.dumps(colors), compile_lut(colors).tobytes()))
+            self._invalidate()
+        return True
+
+    def delete_palette(self, idx):
+        custom_idx = idx - len(self.default_palettes)
+        with self._lock:
+            self._reload()
+            if idx < len(self.default_palettes) or not 0 <= custom_idx < len(self._rows):
+                return False
+            self._conn.execute("DELETE FROM palettes WHERE id = ?", (self._rows[custom_idx][0],))
+            self._invalidate()
+        return True
+
+    def get_lut(self, idx):
+        """返回色板的 256x3 uint8 LUT；默认色板在进程内编译一次，自定义色板直接读取入库时的编译结果"""
+        with self._lock:
+            self._reload()
+            if idx not in self._luts:
+                if idx < len(self.default_palettes):
+                    lut = compile_lut(self.default_palettes[idx])
+                else:
+                    pid = self._rows[idx - len(self.default_palettes)][0]
+                    blob = self._conn.execute("SELECT lut FROM palettes WHERE id = ?", (pid,)).fetchone()[0]
+                    lut = np.frombuffer(blob, dtype=np.uint8).reshape(LUT_SIZE, 3)
+                lut.setflags(write=False)
+                self._luts[idx] = lut
+            return self._luts[idx]
+
+    # ---------- CSV ----------
+    def iter_csv(self, chunk_rows=CSV_CHUNK_ROWS):
+        """按块产出 CSV 文本，首块含表头"""
+        header = True
+        # 连接在线程间共享，每次访问都持锁；产出块时不持锁，慢速消费者不会阻塞其他会话
+        with self._lock:
+            cursor = self._conn.execute("SELECT name, colors FROM palettes ORDER BY id")
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            frame = pd.DataFrame([[name] + (json.loads(colors) + [''] * 6)[:6] for name, colors in rows],
+                                 columns=CSV_COLUMNS)
+            yield frame.to_csv(index=False, header=header, quoting=1)
+            header = False
+
+    def export_as_csv(self):
+        with self._lock:
+            self._reload()
+            if not self._rows:
+                return None
+            return "".join(self.iter_csv()).encode("utf-8")
+
+    def import_csv(self, csv_bytes, chunk_rows=CSV_CHUNK_ROWS):
+        """分块读取 CSV，整块校验颜色并在一个事务中批量写入；返回导入的色板数"""
+        source = io.BytesIO(csv_bytes) if isinstance(csv_bytes, (bytes, bytearray)) else csv_bytes
+        try:
+            reader = pd.read_csv(source, chunksize=chunk_rows, dtype=str, keep_default_na=False,
+                                 encoding="utf-8")
+            imported = 0
+            with self._lock:
+                self._reload()
+                existing = {name for _, name, _ in self._rows}
+                for chunk in reader:
+                    imported += self._import_chunk(chunk, existing)
+                self._invalidate()
+            return imported
+        except Exception:
+            return 0
+
+    def _import_chunk(self, chunk, existing):
+        if chunk.shape[1] < 4:
+            return 0
+        names = chunk.iloc[:, 0].str.strip()
+        color_frame = chunk.iloc[:, 1:7].replace("", pd.NA)
+        valid = valid_color_mask(color_frame).to_numpy(dtype=bool)
+        keep = (valid.sum(axis=1) >= 3) & (names != "").to_numpy() & ~names.isin(existing).to_numpy()
+        # 同名只取第一条通过校验的行（无效行不占用名字），与逐行导入一致
+        keep[keep] = ~names[keep].duplicated().to_numpy()
+        if not keep.any():
+            return 0
+        values = color_frame.to_numpy(dtype=object)
+        rows = []
+        for name, colors, mask in zip(names[keep], values[keep], valid[keep]):
+            colors = list(colors[mask])
+            rows.append((name, json.dumps(colors), compile_lut(colors).tobytes()))
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany("INSERT INTO palettes (name, colors, lut) VALUES (?, ?, ?)", rows)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        existing.update(name for name, _, _ in rows)
+        return len(rows)
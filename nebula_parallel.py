@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from scipy import ndimage
+from nebula_core import (
+    NOISE_GENERATORS,
+    create_nebula_density,
+    create_starfield,
+    draw_density_layout,
+    generate_fractal_noise,
+    nebula_grid,
+    render_density_layout,
+)
+from nebula_cache import density_params, layer_rng, starfield_params
+from nebula_tiled import SMOOTH_HALO, SMOOTH_SIGMA
+
+# -----------------------------------
+# 多线程并行生成图层
+# -----------------------------------
+MIN_BAND_ROWS = 32
+
+
+def row_bands(rows, workers):
+    """把 rows 行切成至多 workers 段（每段不少于 MIN_BAND_ROWS 行）"""
+    count = max(1, min(workers, rows // MIN_BAND_ROWS))
+    edges = np.linspace(0, rows, count + 1).astype(int)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def render_layout_band(layout, x, out, r0, r1):
+    """在 [r0:r1] 行段上累加全部团块与丝状结构；逐像素的累加顺序与整图相同，结果逐位一致"""
+    render_density_layout(layout, x[r0:r1], x, out=out[r0:r1])
+
+
+def smooth_band(density, result, r0, r1):
+    """带 halo 的行段高斯平滑；halo 不小于核半径，因此与整图滤波逐位一致"""
+    e0, e1 = max(0, r0 - SMOOTH_HALO), min(density.shape[0], r1 + SMOOTH_HALO)
+    result[r0:r1] = ndimage.gaussian_filter(density[e0:e1], sigma=SMOOTH_SIGMA)[r0 - e0:r1 - e0]
+
+
+def parallel_layers(center=(0.5, 0.5), size=0.4, resolution=200, star_resolution=800, num_stars=600,
+                    star_brightness=1.0, seed=0, noise="gaussian", dtype=np.float64, workers=None,
+                    layers=("density", "starfield"), psf="cone", arena=None):
+    """在线程池中并发生成密度图（含噪声）与星空层，返回 ({图层: 数组}, {阶段: 耗时毫秒})
+
+    噪声与星空各自是一个任务；团块/丝状结构的累加与最终平滑按行段拆给各线程。
+    布局先用 "density" 随机流抽取，噪声随后从同一随机流继续抽取，与 create_nebula_density
+    的抽样顺序相同；行段拆分不改变任何像素的运算顺序。因此结果与串行版本逐位一致，
+    与线程数无关。各阶段耗时是工作线程实际执行的时间（行段任务累加），total 是墙钟时间。
+    arena（省内存模式的 ScratchArena）只交给噪声任务作两张临时平面：各任务并发执行，
+    星空与团块累加若也使用同一 arena 会互相覆盖，因此仍各自分配缓冲区。
+    """
+    workers = workers or os.cpu_count() or 1
+    timings = {}
+    lock = threading.Lock()
+    out = {}
+    start = time.perf_counter()
+
+    def timed(name, fn, *args):
+        # 行段任务的耗时累加到同一阶段；排队等待的时间不计入
+        t0 = time.perf_counter()
+        result = fn(*args)
+        with lock:
+            timings[name] = timings.get(name, 0.0) + (time.perf_counter() - t0) * 1000
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        if "starfield" in layers:
+            starfield = pool.submit(timed, "starfield", create_starfield, star_resolution, num_stars,
+                                    star_brightness, layer_rng(seed, "starfield"), dtype, None, psf)
+        if "density" in layers:
+            rng = layer_rng(seed, "density")
+            x, _, _ = nebula_grid(resolution, dtype)
+            layout = draw_density_layout(center, size, rng)
+            if noise == "gaussian":
+                fractal_noise = pool.submit(timed, "noise", generate_fractal_noise, resolution, 4, 0.5, rng, dtype,
+                                            arena)
+            else:
+                fractal_noise = pool.submit(timed, "noise", NOISE_GENERATORS[noise], resolution, 4, 0.5, rng)
+
+            density = np.zeros((resolution, resolution), dtype=dtype)
+            bands = row_bands(resolution, workers)
+            for future in [pool.submit(timed, "layout", render_layout_band, layout, x, density, r0, r1)
+                           for r0, r1 in bands]:
+                future.result()
+
+            noise_field = fractal_noise.result()
+            noise_field *= 0.2
+            density += noise_field
+            result = np.empty_like(density)
+            for future in [pool.submit(timed, "smooth", smooth_band, density, result, r0, r1) for r0, r1 in bands]:
+                future.result()
+            result -= result.min()
+            result /= result.max()
+            out["density"] = result
+        if "starfield" in layers:
+            out["starfield"] = starfield.result()
+    timings["total"] = (time.perf_counter() - start) * 1000
+    return out, timings
+
+
+def prefetch_layers(cache, center, size, resolution, star_resolution, num_stars, star_brightness, seed,
+                    noise="gaussian", dtype=np.float64, workers=None, psf="cone", arena=None):
+    """并行生成缓存中缺失的图层并写入缓存，键与 cached_density / cached_starfield 相同；返回各阶段耗时"""
+    missing = []
+    if not cache.contains("density", density_params(center, size, resolution, noise, dtype), seed):
+        missing.append("density")
+    star_params = starfield_params(star_resolution, num_stars, star_brightness, dtype, psf)
+    if not cache.contains("starfield", star_params, seed):
+        missing.append("starfield")
+    if not missing:
+        return {}
+    layers, timings = parallel_layers(center, size, resolution, star_resolution, num_stars, star_brightness, seed,
+                                      noise, dtype, workers, missing, psf, arena)
+    if "density" in layers:
+        cache.put("density", density_params(center, size, resolution, noise, dtype), seed, layers["density"])
+    if "starfield" in layers:
+        cache.put("starfield", star_params, seed, layers["starfield"])
+    return timings
+
+
+def benchmark_parallel(resolution=2048, star_resolution=2048, num_stars=100_000, worker_counts=(1, 2, 4, 8),
+                       repeats=3, seed=0):
+    """串行参考与不同线程数的墙钟时间（毫秒），并核对输出与串行结果逐位一致"""
+    def serial():
+        density = create_nebula_density(resolution=resolution, rng=layer_rng(seed, "density"))[2]
+        starfield = create_starfield(star_resolution, num_stars, rng=layer_rng(seed, "starfield"))
+        return density, starfield
+
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        reference = serial()
+        best = min(best, time.perf_counter() - t0)
+    results = [{"workers": "serial", "total_ms": best * 1000, "identical": True}]
+    for workers in worker_counts:
+        best, best_timings = float("inf"), None
+        for _ in range(repeats):
+            layers, timings = parallel_layers(resolution=resolution, star_resolution=star_resolution,
+                                              num_stars=num_stars, seed=seed, workers=workers)
+            if timings["total"] < best:
+                best, best_timings = timings["total"], timings
+        identical = (np.array_equal(layers["density"], reference[0])
+                     and np.array_equal(layers["starfield"], reference[1]))
+        results.append({"workers": workers, **best_timings, "total_ms": best, "identical": identical})
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_parallel():
+        stages = "  ".join(f"{name} {row[name]:7.1f}" for name in ("layout", "noise", "smooth", "starfield")
+                           if name in row)
+        print(f"{str(row['workers']):>6}  total {row['total_ms']:7.1f} ms  {stages}  identical={row['identical']}")
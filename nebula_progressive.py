@@ -0,0 +1,138 @@
+import time
+import numpy as np
+from nebula_core import create_nebula_density, create_starfield
+from nebula_cache import cached_nebula_image, image_params, layer_rng
+from nebula_composite import composite_nebula
+from nebula_starfield import MAX_STARS, stamp_stars
+
+# -----------------------------------
+# 渐进式多分辨率预览
+# -----------------------------------
+PREVIEW_RESOLUTION = 96  # 预览密度图分辨率
+PREVIEW_SIZE = 128  # 预览星空 / 输出尺寸
+EXPORT_RESOLUTION = 800  # 高清导出的密度图分辨率
+EXPORT_SIZE = 2048
+FIRST_PIXEL_BUDGET_MS = 100
+
+
+def draw_starfield_catalog(seed, star_resolution, num_stars=600, brightness_factor=1.0, dtype=np.float64):
+    """按 render_starfield 的抽样顺序取出 star_resolution 下的星体表
+
+    微弱星的随机数同样被抽取（丢弃），使亮星与全分辨率图层完全一致。
+    """
+    if not 0 <= num_stars <= MAX_STARS:
+        raise ValueError(f"num_stars 必须在 0 到 {MAX_STARS} 之间")
+    rng = layer_rng(seed, "starfield")
+    stars = (rng.integers(0, star_resolution, num_stars), rng.integers(0, star_resolution, num_stars),
+             rng.uniform(0.5, 1.2, num_stars) * brightness_factor, rng.integers(1, 5, num_stars))
+    rng.random((star_resolution, star_resolution), dtype=dtype)
+    bright = (rng.integers(0, star_resolution, 20), rng.integers(0, star_resolution, 20),
+              rng.uniform(1.5, 2.5, 20) * brightness_factor, rng.integers(2, 6, 20))
+    return stars, bright
+
+
+def scaled_starfield(catalog, star_resolution, resolution, seed, brightness_factor=1.0, dtype=np.float64):
+    """把 star_resolution 下的星体表按比例落到 resolution 尺寸的图层上
+
+    星的位置与亮度不变，只缩放坐标与星核半径；微弱星是逐像素的背景颗粒，按目标尺寸重新抽取。
+    """
+    scale = resolution / star_resolution
+    field = np.zeros((resolution, resolution), dtype=dtype)
+    stars, bright = catalog
+
+    def stamp(layer):
+        xs, ys, intensities, sizes = layer
+        xs = np.minimum(((xs + 0.5) * scale).astype(np.intp), resolution - 1)
+        ys = np.minimum(((ys + 0.5) * scale).astype(np.intp), resolution - 1)
+        stamp_stars(field, xs, ys, intensities, np.maximum(1, np.rint(sizes * scale)).astype(np.intp))
+
+    stamp(stars)
+    tiny_stars = layer_rng(seed, "tiny_stars", resolution).random(field.shape, dtype=dtype)
+    tiny_stars *= 0.2 * brightness_factor
+    tiny_stars[tiny_stars <= 0.06] = 0
+    field += tiny_stars
+    stamp(bright)
+    return np.clip(field, 0, 1.0, out=field)
+
+
+def render_level(center, size, colors, seed, resolution, output_size, density_scale=1.0, brightness=0.8,
+                 star_brightness=1.0, num_stars=600, star_resolution=800, noise="gaussian", dtype=np.float64,
+                 psf="cone"):
+    """渲染一个细化级别；密度图使用同一 seed 的 "density" 流，团块与丝状结构的位置与完整分辨率一致
+
+    PSF 星核的星体坐标本身与分辨率无关，直接在 output_size 上渲染即可。
+    """
+    _, _, density = create_nebula_density(center, size, resolution, rng=layer_rng(seed, "density"), noise=noise,
+                                          dtype=dtype)
+    if psf == "cone":
+        catalog = draw_starfield_catalog(seed, star_resolution, num_stars, star_brightness, dtype)
+        starfield = scaled_starfield(catalog, star_resolution, output_size, seed, star_brightness, dtype)
+    else:
+        starfield = create_starfield(output_size, num_stars, star_brightness, layer_rng(seed, "starfield"), dtype,
+                                     psf=psf)
+    density *= density_scale
+    return composite_nebula(density, colors, brightness, starfield, output_size)
+
+
+def iter_progressive(cache, center, size, colors, seed, density_scale=1.0, brightness=0.8, star_brightness=1.0,
+                     num_stars=600, resolution=200, star_resolution=800, noise="gaussian", dtype=np.float64,
+                     arena=None, export=False, backend="numpy", workers=None, timings=None, psf="cone"):
+    """依次产出 (级别名, 图像, 耗时毫秒)：预览 → 完整分辨率 →（可选）高清导出
+
+    完整分辨率已在缓存中时直接产出，不再渲染预览；预览与导出级别始终使用 NumPy 合成器，导出级别同样写入缓存。
+    workers / timings 传给 cached_nebula_image，用于并行生成完整分辨率的图层。
+    """
+    params = dict(density_scale=density_scale, brightness=brightness, star_brightness=star_brightness,
+                  num_stars=num_stars, star_resolution=star_resolution, noise=noise, dtype=dtype, psf=psf)
+    full_params = image_params(center, size, colors, density_scale, brightness, star_brightness, num_stars,
+                               resolution, star_resolution, backend=backend, noise=noise, dtype=dtype,
+                               psf=psf)
+    if not cache.contains("image", full_params, seed):
+        start = time.perf_counter()
+        image = render_level(center, size, colors, seed, PREVIEW_RESOLUTION, PREVIEW_SIZE, **params)
+        yield "preview", image, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    image = cached_nebula_image(cache, center, size, colors, seed, resolution=resolution, backend=backend,
+                                arena=arena, workers=workers, timings=timings, **params)
+    yield "full", image, (time.perf_counter() - start) * 1000
+
+    if export:
+        # 导出级别与 cached_nebula_image 的渲染方式不同（星体表按比例放大），单独存放在 "export" 图层下
+        start = time.perf_counter()
+        export_params = image_params(center, size, colors, density_scale, brightness, star_brightness, num_stars,
+                                     EXPORT_RESOLUTION, star_resolution, EXPORT_SIZE, noise=noise, dtype=dtype,
+                                     psf=psf)
+        image = cache.get_or_create(
+            "export", export_params, seed,
+            lambda: render_level(center, size, colors, seed, EXPORT_RESOLUTION, EXPORT_SIZE, **params))
+        yield "export", image, (time.perf_counter() - start) * 1000
+
+
+def benchmark_first_pixel(seeds=range(10), num_stars=600):
+    """测量冷启动（无缓存）下预览级别的首像素时间与完整分辨率耗时（毫秒）"""
+    from nebula_cache import NebulaRenderCache
+    from nebula_core import ColorPaletteManager
+
+    colors = ColorPaletteManager().get_palette(0)
+    render_level((0.5, 0.5), 0.4, colors, 0, PREVIEW_RESOLUTION, PREVIEW_SIZE)  # 预热导入与核缓存
+    preview, full = [], []
+    for seed in seeds:
+        cache = NebulaRenderCache(max_disk_bytes=0)
+        timings = dict((level, ms) for level, _, ms in
+                       iter_progressive(cache, (0.5, 0.5), 0.4, colors, seed, num_stars=num_stars))
+        preview.append(timings["preview"])
+        full.append(timings["full"])
+    return {
+        "preview_ms_median": float(np.median(preview)),
+        "preview_ms_max": float(np.max(preview)),
+        "full_ms_median": float(np.median(full)),
+        "budget_ms": FIRST_PIXEL_BUDGET_MS,
+    }
+
+
+if __name__ == "__main__":
+    for stars in (600, MAX_STARS):
+        row = benchmark_first_pixel(num_stars=stars)
+        print(f"{stars:>6} stars  first pixel {row['preview_ms_median']:6.1f} ms (max {row['preview_ms_max']:6.1f})  "
+              f"full {row['full_ms_median']:7.1f} ms  budget {row['budget_ms']} ms")
@@ -0,0 +1,204 @@
+import time
+from functools import lru_cache
+import numpy as np
+
+# -----------------------------------
+# 点扩散函数（PSF）星体渲染
+# -----------------------------------
+PSF_PROFILES = ("gaussian", "moffat", "spikes")
+MAX_PSF_STARS = 1_000_000
+SUBPIXEL_STEPS = 4  # 每个像素内的亚像素偏移档数
+PSF_RADIUS = 6  # 核半径（像素），核面积 (2R+1)^2
+GAUSSIAN_SIGMA = 0.8
+MOFFAT_ALPHA = 1.2
+MOFFAT_BETA = 2.5
+SPIKE_WIDTH = 0.35
+SPIKE_STRENGTH = 0.25
+FLUX_FLOOR = 1 / 1024  # 核被截断处的亮度上限
+SPIKE_FLUX = 0.3  # 流量高于此值的星才使用衍射星芒核
+MAGNITUDE_RANGE = (-1.0, 5.0)
+REFERENCE_MAGNITUDE = 0.0  # 流量为 1（恰好饱和）的星等；更亮的星饱和并显得更大
+LUMINOSITY_SLOPE = 0.35  # 星数随星等增长：N(<m) ∝ 10^(slope * m)
+
+
+def psf_profile(profile, dx, dy):
+    """在偏移网格 (dx, dy)（像素）上求 PSF，峰值为 1"""
+    r2 = dx ** 2 + dy ** 2
+    if profile == "gaussian":
+        return np.exp(-r2 / (2 * GAUSSIAN_SIGMA ** 2))
+    core = (1 + r2 / MOFFAT_ALPHA ** 2) ** -MOFFAT_BETA
+    if profile == "moffat":
+        return core
+    if profile == "spikes":
+        # 四条沿坐标轴的衍射星芒，随距离按 1/(1+r) 衰减
+        spikes = (np.exp(-dy ** 2 / (2 * SPIKE_WIDTH ** 2)) + np.exp(-dx ** 2 / (2 * SPIKE_WIDTH ** 2)))
+        return np.maximum(core, SPIKE_STRENGTH * spikes / (1 + np.sqrt(r2)))
+    raise ValueError(f"未知的 PSF: {profile}")
+
+
+@lru_cache(maxsize=None)
+def psf_atlas(profile, radius=PSF_RADIUS, steps=SUBPIXEL_STEPS):
+    """预渲染的核图集，形状 (steps, steps, (2R+1)^2)
+
+    atlas[sy, sx] 是星心位于像素内 (sx/steps, sy/steps) 偏移时的核，每个样本点再用 2x2 超采样抗锯齿。
+    """
+    offsets = np.arange(-radius, radius + 1, dtype=np.float64)
+    shift = np.arange(steps) / steps
+    supersample = np.array([-0.25, 0.25])
+    atlas = np.zeros((steps, steps, 2 * radius + 1, 2 * radius + 1))
+    for sy in range(steps):
+        for sx in range(steps):
+            for oy in supersample:
+                for ox in supersample:
+                    dy = offsets[:, None] - shift[sy] + oy
+                    dx = offsets[None, :] - shift[sx] + ox
+                    atlas[sy, sx] += psf_profile(profile, dx, dy)
+    atlas /= atlas.max()
+    atlas = atlas.reshape(steps, steps, -1)
+    atlas.setflags(write=False)
+    return atlas
+
+
+@lru_cache(maxsize=None)
+def kernel_offsets(radius):
+    offsets = np.arange(-radius, radius + 1)
+    dy, dx = np.meshgrid(offsets, offsets, indexing="ij")
+    return dy.reshape(-1), dx.reshape(-1)
+
+
+@lru_cache(maxsize=None)
+def cropped_atlas(profile, radius, full_radius=PSF_RADIUS, steps=SUBPIXEL_STEPS):
+    """从完整图集中裁出半径为 radius 的中心部分"""
+    size = 2 * full_radius + 1
+    lo, hi = full_radius - radius, full_radius + radius + 1
+    atlas = psf_atlas(profile, full_radius, steps).reshape(steps, steps, size, size)[:, :, lo:hi, lo:hi]
+    atlas = np.ascontiguousarray(atlas).reshape(steps, steps, -1)
+    atlas.setflags(write=False)
+    return atlas
+
+
+@lru_cache(maxsize=None)
+def tail_levels(profile, full_radius=PSF_RADIUS, steps=SUBPIXEL_STEPS):
+    """tail[r] = 裁到半径 r 后被丢弃部分的最大值（r = 0..R，tail[R] = 0）"""
+    size = 2 * full_radius + 1
+    atlas = psf_atlas(profile, full_radius, steps).reshape(steps, steps, size, size)
+    ring = np.maximum(*np.abs(np.mgrid[-full_radius:full_radius + 1, -full_radius:full_radius + 1]))
+    return np.array([atlas[:, :, ring > r].max() if r < full_radius else 0.0 for r in range(full_radius + 1)])
+
+
+def kernel_radii(flux, profile, floor=FLUX_FLOOR):
+    """每颗星所需的最小核半径：截掉的部分低于 floor（远小于 8 位量化的一级）"""
+    tails = tail_levels(profile)
+    # tails 单调不增，取第一个满足 flux * tail[r] < floor 的 r
+    return np.maximum(1, np.searchsorted(-tails, -floor / np.maximum(flux, 1e-12), side="right"))
+
+
+def draw_magnitudes(rng, count, magnitude_range=MAGNITUDE_RANGE, slope=LUMINOSITY_SLOPE):
+    """按幂律光度函数 dN/dm ∝ 10^(slope * m) 反演抽样星等"""
+    m0, m1 = magnitude_range
+    lo, hi = 10 ** (slope * m0), 10 ** (slope * m1)
+    return np.log10(lo + rng.random(count) * (hi - lo)) / slope
+
+
+def magnitude_flux(magnitudes):
+    """星等 -> 相对流量，REFERENCE_MAGNITUDE 对应 1"""
+    return 10 ** (-0.4 * (magnitudes - REFERENCE_MAGNITUDE))
+
+
+def draw_star_population(rng, count, magnitude_range=MAGNITUDE_RANGE, slope=LUMINOSITY_SLOPE):
+    """位置取单位正方形内的浮点坐标，与分辨率无关；返回 (xs, ys, flux)"""
+    xs = rng.random(count)
+    ys = rng.random(count)
+    return xs, ys, magnitude_flux(draw_magnitudes(rng, count, magnitude_range, slope))
+
+
+def blit_psf(field, xs, ys, flux, profile, steps=SUBPIXEL_STEPS):
+    """把星按亚像素偏移选取图集核，以 bincount 一次性加到 field 上；xs/ys 为像素坐标
+
+    每颗星的核半径按流量取到截断误差低于 FLUX_FLOOR 为止，暗星只写 3x3，
+    成本 O(Σ 核面积)。累加在四周留出 PSF_RADIUS 边距的画布上进行，免去逐元素的越界判断。
+    """
+    height, width = field.shape
+    pad = PSF_RADIUS
+    padded_width = width + 2 * pad
+    accum = np.zeros((height + 2 * pad) * padded_width)
+    radii = kernel_radii(flux, profile)
+    for radius in np.unique(radii):
+        group = np.flatnonzero(radii == radius)
+        atlas = cropped_atlas(profile, int(radius))
+        dy, dx = kernel_offsets(int(radius))
+        offsets = dy * padded_width + dx
+        batch = max(4096, accum.size // offsets.size)
+        for start in range(0, len(group), batch):
+            stars = group[start:start + batch]
+            x = xs[stars]
+            y = ys[stars]
+            ix = np.floor(x).astype(np.intp)
+            iy = np.floor(y).astype(np.intp)
+            sx = np.minimum(((x - ix) * steps).astype(np.intp), steps - 1)
+            sy = np.minimum(((y - iy) * steps).astype(np.intp), steps - 1)
+            index = ((iy + pad) * padded_width + (ix + pad))[:, None] + offsets[None, :]
+            values = atlas[sy, sx] * flux[stars, None]
+            accum += np.bincount(index.reshape(-1), values.reshape(-1), minlength=accum.size)
+    accum = accum.reshape(height + 2 * pad, padded_width)[pad:pad + height, pad:pad + width]
+    field += accum.astype(field.dtype, copy=False)
+    return field
+
+
+def render_psf_starfield(resolution=800, num_stars=600, brightness_factor=1.0, rng=None, profile="moffat",
+                         dtype=np.float64):
+    """用 PSF 图集渲染星空层，返回 (starfield, 耗时秒数)
+
+    "spikes" 只用于流量高于 SPIKE_FLUX 的亮星，其余星使用 Moffat 核。
+    """
+    if not 0 <= num_stars <= MAX_PSF_STARS:
+        raise ValueError(f"num_stars 必须在 0 到 {MAX_PSF_STARS} 之间")
+    if profile not in PSF_PROFILES:
+        raise ValueError(f"未知的 PSF: {profile}")
+    rng = np.random.default_rng() if rng is None else rng
+    start = time.perf_counter()
+    xs, ys, flux = draw_star_population(rng, num_stars)
+    xs *= resolution
+    ys *= resolution
+    flux *= brightness_factor
+    field = np.zeros((resolution, resolution), dtype=dtype)
+    if profile == "spikes":
+        bright = flux > SPIKE_FLUX * brightness_factor
+        blit_psf(field, xs[~bright], ys[~bright], flux[~bright], "moffat")
+        blit_psf(field, xs[bright], ys[bright], flux[bright], "spikes")
+    else:
+        blit_psf(field, xs, ys, flux, profile)
+    np.clip(field, 0, 1.0, out=field)
+    return field, time.perf_counter() - start
+
+
+def benchmark_psf(resolution=2048, star_counts=(10_000, 100_000, 1_000_000), profiles=PSF_PROFILES, repeats=3):
+    """各 PSF 在不同星数下的耗时（毫秒）及平均每个核像素写入的耗时（spikes 按 Moffat 半径近似）"""
+    from nebula_starfield import MAX_STARS, render_starfield
+
+    results = []
+    for count in star_counts:
+        for profile in ("cone",) + tuple(profiles):
+            if profile == "cone" and count > MAX_STARS:
+                continue
+            best = float("inf")
+            for _ in range(repeats):
+                rng = np.random.default_rng(0)
+                if profile == "cone":
+                    _, elapsed = render_starfield(resolution, count, rng=rng)
+                else:
+                    _, elapsed = render_psf_starfield(resolution, count, rng=rng, profile=profile)
+                best = min(best, elapsed)
+            row = {"profile": profile, "stars": count, "ms": best * 1000, "ns_per_kernel_pixel": None}
+            if profile != "cone":
+                _, _, flux = draw_star_population(np.random.default_rng(0), count)
+                area = ((2 * kernel_radii(flux, "moffat" if profile == "spikes" else profile) + 1) ** 2).sum()
+                row["ns_per_kernel_pixel"] = best * 1e9 / area
+            results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_psf():
+        per_pixel = f"{row['ns_per_kernel_pixel']:6.2f} ns/kernel px" if row["ns_per_kernel_pixel"] else ""
+        print(f"{row['profile']:>8}  {row['stars']:>8} stars  {row['ms']:9.1f} ms  {per_pixel}")
@@ -0,0 +1,274 @@
+import argparse
+import time
+from collections import defaultdict
+import numpy as np
+from scipy import ndimage
+from nebula_core import (
+    KERNEL_CUTOFF,
+    ColorPaletteManager,
+    axis_window,
+    draw_density_layout,
+    render_density_layout,
+)
+from nebula_cache import layer_rng
+from nebula_composite import NEBULA_ALPHA, STAR_ALPHA, colormap_lut, lut_indices
+from nebula_tiled import (
+    NOISE_BLOCK,
+    NOISE_HALO,
+    SMOOTH_HALO,
+    SMOOTH_SIGMA,
+    expand,
+    render_starfield_tile,
+    tiled_fractal_noise,
+    write_png_stream,
+)
+
+# -----------------------------------
+# 多星云场景合成（空间索引 + 分块求值）
+# -----------------------------------
+SCENE_TILE = 256
+MAX_BODY_EXTENT = 3.0  # 近退化丝状结构的包围盒上限（以 size 为单位）
+PEAK_SAMPLES = 96  # 估计单个星云峰值时的采样网格边长
+NOISE_MODULATION = 2.0  # 共享噪声对星云密度的调制强度（平滑后噪声标准差约 0.12）
+COVERAGE_GAIN = 3.0  # 密度达到 1/3 时星云完全覆盖背景
+STARS_PER_MEGAPIXEL = 940  # 与 800x800 图像默认 600 颗星的密度一致
+
+
+def body_extent(layout):
+    """星云在其局部坐标（中心位于 (0.5, 0.5)）下的包围盒 (x0, x1, y0, y1)"""
+    size = layout["size"]
+    r = KERNEL_CUTOFF * size / 3
+    x0, x1, y0, y1 = 0.5 - r, 0.5 + r, 0.5 - r, 0.5 + r
+    for cx, cy, sigma, _ in layout["clumps"]:
+        r = KERNEL_CUTOFF * sigma
+        x0, x1, y0, y1 = min(x0, cx - r), max(x1, cx + r), min(y0, cy - r), max(y1, cy + r)
+    for u, v, width, _ in layout["filaments"]:
+        r = KERNEL_CUTOFF * width
+        det = 1 - u * v
+        if det > 0.05:
+            dp = r * (1 + abs(u)) / det
+            dq = r * (1 + abs(v)) / det
+        else:
+            dp = dq = MAX_BODY_EXTENT * size
+        x0, x1, y0, y1 = min(x0, 0.5 - dp), max(x1, 0.5 + dp), min(y0, 0.5 - dq), max(y1, 0.5 + dq)
+    limit = MAX_BODY_EXTENT * size
+    return max(x0, 0.5 - limit), min(x1, 0.5 + limit), max(y0, 0.5 - limit), min(y1, 0.5 + limit)
+
+
+class SceneBody:
+    """场景中的一个星云：局部布局、画布上的包围盒、归一化系数与查找表
+
+    布局在以自身中心为 (0.5, 0.5) 的局部坐标下抽取，丝状结构因此与单张图像中的形状一致；
+    画布坐标 = 局部坐标 + offset。
+    """
+
+    def __init__(self, center, size, colors, seed, index, brightness=0.8, density_scale=0.3):
+        self.center = tuple(center)
+        self.size = size
+        self.layout = draw_density_layout((0.5, 0.5), size, layer_rng(seed, "density", index))
+        self.offset = (center[0] - 0.5, center[1] - 0.5)
+        x0, x1, y0, y1 = body_extent(self.layout)
+        self.bbox = (x0 + self.offset[0], x1 + self.offset[0], y0 + self.offset[1], y1 + self.offset[1])
+        xs = np.linspace(x0, x1, PEAK_SAMPLES)
+        ys = np.linspace(y0, y1, PEAK_SAMPLES)
+        self.scale = density_scale * brightness / render_density_layout(self.layout, ys, xs).max()
+        self.lut = colormap_lut(tuple(colors)) * (NEBULA_ALPHA * (1 - STAR_ALPHA))
+
+    def render(self, x_rows, x_cols):
+        """在画布坐标窗口上求值，返回已缩放的密度"""
+        density = render_density_layout(self.layout, x_rows - self.offset[1], x_cols - self.offset[0])
+        density *= self.scale
+        return density
+
+
+class SceneIndex:
+    """均匀网格空间索引：分块 -> 与之相交的星云编号"""
+
+    def __init__(self, bodies, step, tile_size, height, width):
+        self.buckets = defaultdict(list)
+        rows = (height + tile_size - 1) // tile_size
+        cols = (width + tile_size - 1) // tile_size
+        span = step * tile_size
+        for index, body in enumerate(bodies):
+            x0, x1, y0, y1 = body.bbox
+            for ti in range(max(0, int(y0 // span)), min(rows - 1, int(y1 // span)) + 1):
+                for tj in range(max(0, int(x0 // span)), min(cols - 1, int(x1 // span)) + 1):
+                    self.buckets[ti, tj].append(index)
+
+    def query(self, r0, r1, c0, c1, tile_size):
+        """与 [r0, r1) x [c0, c1) 相交的星云编号（升序）
+
+        分块不一定与索引网格对齐（条带自顶部向下切分，高度不是 tile_size 的整数倍时会错开），
+        因此取所覆盖的全部网格单元的并集。
+        """
+        indices = set()
+        for ti in range(r0 // tile_size, (r1 - 1) // tile_size + 1):
+            for tj in range(c0 // tile_size, (c1 - 1) // tile_size + 1):
+                indices.update(self.buckets.get((ti, tj), ()))
+        return sorted(indices)
+
+
+class NebulaScene:
+    """把多个星云合成到一张 width x height 的画布上，共享一层星空
+
+    画布坐标以高度为单位：y ∈ [0, 1]，x ∈ [0, width / height]。每个分块只对空间索引中
+    与之相交的星云求值，每个星云也只在自身包围盒内计算，总成本与星云覆盖的面积成正比，
+    而不是星云数 × 像素数。
+    """
+
+    def __init__(self, bodies, width, height, seed=0, num_stars=None, star_brightness=1.0,
+                 tile_size=SCENE_TILE, spatial_index=True):
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.tile_size = tile_size
+        self.step = 1 / (height - 1)
+        self.x_axis = np.arange(width) * self.step
+        self.y_axis = np.arange(height) * self.step
+        self.bodies = [SceneBody(seed=seed, index=index, **body) for index, body in enumerate(bodies)]
+        self.index = SceneIndex(self.bodies, self.step, tile_size, height, width) if spatial_index else None
+        if num_stars is None:
+            num_stars = int(STARS_PER_MEGAPIXEL * width * height / 1e6)
+        self.star_brightness = star_brightness
+        self.catalog = self.draw_catalog(num_stars, star_brightness)
+        self.noise_blocks = {}
+        self.stats = {"tiles": 0, "empty_tiles": 0, "body_evaluations": 0}
+
+    def draw_catalog(self, num_stars, brightness_factor):
+        rng = layer_rng(self.seed, "starfield")
+        bright = max(1, num_stars // 30)
+        stars = (rng.integers(0, self.width, num_stars), rng.integers(0, self.height, num_stars),
+                 rng.uniform(0.5, 1.2, num_stars) * brightness_factor, rng.integers(1, 5, num_stars))
+        bright = (rng.integers(0, self.width, bright), rng.integers(0, self.height, bright),
+                  rng.uniform(1.5, 2.5, bright) * brightness_factor, rng.integers(2, 6, bright))
+        return stars, bright
+
+    def tile_bodies(self, r0, r1, c0, c1):
+        if self.index is None:
+            return range(len(self.bodies))
+        return self.index.query(r0, r1, c0, c1, self.tile_size)
+
+    def tile_noise(self, r0, r1, c0, c1):
+        """共享噪声层：块播种的分形噪声经平滑后裁剪到分块，接缝处连续
+
+        带 halo 的窗口会跨入相邻噪声块，抽取过的块保存在 noise_blocks 中供相邻分块复用。
+        """
+        # halo 只在画布边缘被截断；用 max(宽, 高) 作为截断边界，对任何分块方式都相同
+        resolution = max(self.width, self.height)
+        er0, er1, ec0, ec1 = expand(r0, r1, c0, c1, SMOOTH_HALO, resolution)
+        noise = ndimage.gaussian_filter(
+            tiled_fractal_noise(self.seed, resolution, er0, er1, ec0, ec1, blocks=self.noise_blocks),
+            sigma=SMOOTH_SIGMA, mode="reflect")
+        return noise[r0 - er0:r1 - er0, c0 - ec0:c1 - ec0]
+
+    def render_tile(self, r0, r1, c0, c1):
+        """返回分块的 uint8 RGB（第 0 行为 y 最小处）"""
+        self.stats["tiles"] += 1
+        rgb = np.zeros((r1 - r0, c1 - c0, 3), dtype=np.float32)
+        x_rows, x_cols = self.y_axis[r0:r1], self.x_axis[c0:c1]
+        modulation = None
+        for index in self.tile_bodies(r0, r1, c0, c1):
+            body = self.bodies[index]
+            if self.index is None:
+                # 无空间剔除的对照路径：每个星云都在整块上求值
+                wr0, wr1, wc0, wc1 = 0, r1 - r0, 0, c1 - c0
+            else:
+                x0, x1, y0, y1 = body.bbox
+                wc0, wc1 = axis_window(x_cols, x0, x1)
+                wr0, wr1 = axis_window(x_rows, y0, y1)
+                if wc0 >= wc1 or wr0 >= wr1:
+                    continue
+            if modulation is None:
+                modulation = self.tile_noise(r0, r1, c0, c1)
+                modulation *= NOISE_MODULATION
+                modulation += 1
+            self.stats["body_evaluations"] += 1
+            density = body.render(x_rows[wr0:wr1], x_cols[wc0:wc1])
+            density *= modulation[wr0:wr1, wc0:wc1]
+            np.clip(density, 0, 1, out=density)
+            # 颜色按覆盖度加权叠加，星云边缘淡出为黑色，重叠处亮度相加
+            coverage = np.minimum(density * COVERAGE_GAIN, 1)
+            rgb[wr0:wr1, wc0:wc1] += body.lut[lut_indices(density)] * coverage[..., None]
+        if modulation is None:
+            self.stats["empty_tiles"] += 1
+        starfield = render_starfield_tile(self.catalog, self.seed, self.star_brightness, r0, r1, c0, c1)
+        rgb += (starfield * (STAR_ALPHA * 255))[..., None]
+        np.clip(rgb, 0, 255, out=rgb)
+        return np.rint(rgb, out=rgb).astype(np.uint8)
+
+    def iter_strips(self):
+        """按图像行序（从画布顶部 y 最大处开始）产出高度为 tile_size 的 RGB 行条带"""
+        for r1 in range(self.height, 0, -self.tile_size):
+            r0 = max(0, r1 - self.tile_size)
+            # 条带自上而下推进，丢弃之后不会再用到的噪声块行
+            lowest = (r1 + SMOOTH_HALO + NOISE_HALO) // NOISE_BLOCK
+            for key in [key for key in self.noise_blocks if key[2] > lowest]:
+                del self.noise_blocks[key]
+            strip = np.empty((r1 - r0, self.width, 3), dtype=np.uint8)
+            for c0 in range(0, self.width, self.tile_size):
+                c1 = min(c0 + self.tile_size, self.width)
+                strip[:, c0:c1] = self.render_tile(r0, r1, c0, c1)
+            yield strip[::-1]
+
+    def render(self):
+        """整幅渲染到内存，origin='lower' 与单张星云一致"""
+        return np.concatenate(list(self.iter_strips()), axis=0)
+
+    def write_png(self, path, level=6):
+        return write_png_stream(path, self.width, self.height, self.iter_strips(), level=level)
+
+
+def random_scene_bodies(num_bodies, width, height, seed=0, palettes=None, size_range=(0.03, 0.15)):
+    """在画布上随机撒布星云，返回 NebulaScene 的 bodies 参数"""
+    palettes = palettes or ColorPaletteManager().get_all_palettes()
+    rng = np.random.default_rng(seed)
+    aspect = width / height
+    return [{
+        "center": (float(rng.uniform(0, aspect)), float(rng.uniform(0, 1))),
+        "size": float(rng.uniform(*size_range)),
+        "colors": palettes[int(rng.integers(len(palettes)))],
+        "brightness": float(rng.uniform(0.6, 1.2)),
+        "density_scale": float(rng.uniform(0.5, 1.0)),
+    } for _ in range(num_bodies)]
+
+
+def benchmark_scene(width=4096, height=2048, body_counts=(25, 100, 400), naive_max_bodies=100):
+    """对比空间索引与逐星云逐分块求值（星云数 × 像素数）的耗时（秒）"""
+    results = []
+    for count in body_counts:
+        bodies = random_scene_bodies(count, width, height)
+        row = {"bodies": count, "width": width, "height": height}
+        for name, indexed in (("indexed", True), ("naive", False)):
+            if not indexed and count > naive_max_bodies:
+                row["naive_s"] = None
+                continue
+            scene = NebulaScene(bodies, width, height, spatial_index=indexed)
+            start = time.perf_counter()
+            for _ in scene.iter_strips():
+                pass
+            row[f"{name}_s"] = time.perf_counter() - start
+            row[f"{name}_evaluations"] = scene.stats["body_evaluations"]
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="多星云全景场景合成")
+    parser.add_argument("path", nargs="?", help="输出 PNG 路径")
+    parser.add_argument("--width", type=int, default=8192)
+    parser.add_argument("--height", type=int, default=4096)
+    parser.add_argument("--bodies", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args()
+    if args.benchmark or not args.path:
+        for row in benchmark_scene():
+            naive = f"{row['naive_s']:7.2f} s" if row["naive_s"] is not None else "      -"
+            print(f"{row['bodies']:>4} bodies  {row['width']}x{row['height']}  "
+                  f"indexed {row['indexed_s']:7.2f} s ({row['indexed_evaluations']} evals)  naive {naive}")
+    else:
+        scene = NebulaScene(random_scene_bodies(args.bodies, args.width, args.height, args.seed),
+                            args.width, args.height, seed=args.seed)
+        start = time.perf_counter()
+        scene.write_png(args.path)
+        print(f"{args.path}: {time.perf_counter() - start:.1f} s, {scene.stats}")
@@ -0,0 +1,275 @@
+import os
+import struct
+import tempfile
+import time
+import zlib
+from contextlib import nullcontext
+import numpy as np
+from scipy import ndimage
+from nebula_core import draw_density_layout, render_density_layout
+from nebula_cache import layer_rng
+from nebula_composite import composite_tile
+from nebula_starfield import stamp_stars
+
+# -----------------------------------
+# 分块 / 外存渲染（海报尺寸）
+# -----------------------------------
+NOISE_BLOCK = 256  # 白噪声按固定块播种，任何分块方式都能复现同一像素的噪声
+NOISE_HALO = 4  # sigma=1 的高斯核半径（scipy 默认 truncate=4）
+SMOOTH_SIGMA = 1.2
+SMOOTH_HALO = int(4 * SMOOTH_SIGMA + 0.5)
+STAR_HALO = 5  # 最大星核半径
+DEFAULT_TILE = 1024
+PNG_STRIP_ROWS = 64
+
+
+def iter_tiles(resolution, tile_size):
+    for r0 in range(0, resolution, tile_size):
+        for c0 in range(0, resolution, tile_size):
+            yield r0, min(r0 + tile_size, resolution), c0, min(c0 + tile_size, resolution)
+
+
+def block_field(seed, layer, salt, r0, r1, c0, c1, draw, blocks=None):
+    """拼出 [r0:r1, c0:c1] 区域的随机场，每个 NOISE_BLOCK 块使用独立的随机流
+
+    blocks 是可选的 {(layer, salt, bi, bj): 块} 字典，相邻窗口（带 halo）共用的块只抽取一次。
+    """
+    out = np.empty((r1 - r0, c1 - c0))
+    for bi in range(r0 // NOISE_BLOCK, (r1 - 1) // NOISE_BLOCK + 1):
+        for bj in range(c0 // NOISE_BLOCK, (c1 - 1) // NOISE_BLOCK + 1):
+            if blocks is None:
+                block = draw(layer_rng(seed, layer, salt, bi, bj), (NOISE_BLOCK, NOISE_BLOCK))
+            else:
+                key = (layer, salt, bi, bj)
+                block = blocks.get(key)
+                if block is None:
+                    block = blocks[key] = draw(layer_rng(seed, layer, salt, bi, bj), (NOISE_BLOCK, NOISE_BLOCK))
+            br, bc = bi * NOISE_BLOCK, bj * NOISE_BLOCK
+            rr0, rr1 = max(r0, br), min(r1, br + NOISE_BLOCK)
+            cc0, cc1 = max(c0, bc), min(c1, bc + NOISE_BLOCK)
+            out[rr0 - r0:rr1 - r0, cc0 - c0:cc1 - c0] = block[rr0 - br:rr1 - br, cc0 - bc:cc1 - bc]
+    return out
+
+
+def expand(r0, r1, c0, c1, halo, resolution):
+    return max(0, r0 - halo), min(resolution, r1 + halo), max(0, c0 - halo), min(resolution, c1 + halo)
+
+
+def tiled_fractal_noise(seed, resolution, r0, r1, c0, c1, octaves=4, persistence=0.5, blocks=None):
+    """generate_fractal_noise 的分块版本：在窗口外扩 NOISE_HALO 后滤波再裁剪，接缝处与整图一致"""
+    er0, er1, ec0, ec1 = expand(r0, r1, c0, c1, NOISE_HALO, resolution)
+    noise = np.zeros((r1 - r0, c1 - c0))
+    frequency = 1
+    amplitude = 1
+    max_amplitude = 0
+    for octave in range(octaves):
+        white = block_field(seed, "noise", octave, er0, er1, ec0, ec1,
+                            lambda rng, shape: rng.normal(0, 1, shape), blocks)
+        filtered = ndimage.gaussian_filter(white, sigma=1/frequency, mode="reflect")
+        noise += filtered[r0 - er0:r1 - er0, c0 - ec0:c1 - ec0] * amplitude
+        max_amplitude += amplitude
+        amplitude *= persistence
+        frequency *= 2
+    return noise / max_amplitude
+
+
+def render_density_tile(layout, seed, resolution, r0, r1, c0, c1):
+    """渲染一个未归一化的密度分块（含噪声与平滑）"""
+    er0, er1, ec0, ec1 = expand(r0, r1, c0, c1, SMOOTH_HALO, resolution)
+    axis = np.linspace(0, 1, resolution)
+    density = render_density_layout(layout, axis[er0:er1], axis[ec0:ec1])
+    density += tiled_fractal_noise(seed, resolution, er0, er1, ec0, ec1) * 0.2
+    density = ndimage.gaussian_filter(density, sigma=SMOOTH_SIGMA, mode="reflect")
+    return density[r0 - er0:r1 - er0, c0 - ec0:c1 - ec0]
+
+
+def draw_star_catalog(seed, resolution, num_stars=600, brightness_factor=1.0):
+    """整图的星体位置与亮度只占 O(num_stars) 内存，先整体抽取，再按分块落笔"""
+    rng = layer_rng(seed, "starfield")
+    stars = (rng.integers(0, resolution, num_stars), rng.integers(0, resolution, num_stars),
+             rng.uniform(0.5, 1.2, num_stars) * brightness_factor, rng.integers(1, 5, num_stars))
+    bright = (rng.integers(0, resolution, 20), rng.integers(0, resolution, 20),
+              rng.uniform(1.5, 2.5, 20) * brightness_factor, rng.integers(2, 6, 20))
+    return stars, bright
+
+
+def stamp_catalog_tile(field, catalog, r0, c0):
+    xs, ys, intensities, sizes = catalog
+    h, w = field.shape
+    near = (xs >= c0 - STAR_HALO) & (xs < c0 + w + STAR_HALO) & (ys >= r0 - STAR_HALO) & (ys < r0 + h + STAR_HALO)
+    stamp_stars(field, xs[near] - c0, ys[near] - r0, intensities[near], sizes[near])
+
+
+def render_starfield_tile(catalog, seed, brightness_factor, r0, r1, c0, c1):
+    """与 render_starfield 相同的叠加顺序：普通星 max、微弱星 +=、亮星 max、clip"""
+    stars, bright = catalog
+    field = np.zeros((r1 - r0, c1 - c0))
+    stamp_catalog_tile(field, stars, r0, c0)
+    tiny_stars = block_field(seed, "tiny_stars", 0, r0, r1, c0, c1,
+                             lambda rng, shape: rng.random(shape)) * 0.2 * brightness_factor
+    tiny_stars *= tiny_stars > 0.06
+    field += tiny_stars
+    stamp_catalog_tile(field, bright, r0, c0)
+    np.clip(field, 0, 1.0, out=field)
+    return field
+
+
+def render_tiled(out_dir, center=(0.5, 0.5), size=0.4, resolution=16384, seed=0, tile_size=DEFAULT_TILE,
+                 num_stars=600, star_brightness=1.0):
+    """逐块生成密度与星空，写入 out_dir 下的 float32 内存映射文件
+
+    第一遍写入未归一化的密度并记录全局最值，第二遍逐块原地归一化；峰值内存只与分块大小有关。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    shape = (resolution, resolution)
+    density_path = os.path.join(out_dir, "density.npy")
+    starfield_path = os.path.join(out_dir, "starfield.npy")
+    density = np.lib.format.open_memmap(density_path, mode="w+", dtype=np.float32, shape=shape)
+    starfield = np.lib.format.open_memmap(starfield_path, mode="w+", dtype=np.float32, shape=shape)
+
+    layout = draw_density_layout(center, size, layer_rng(seed, "density"))
+    catalog = draw_star_catalog(seed, resolution, num_stars, star_brightness)
+    lo, hi = np.inf, -np.inf
+    for r0, r1, c0, c1 in iter_tiles(resolution, tile_size):
+        tile = render_density_tile(layout, seed, resolution, r0, r1, c0, c1)
+        lo, hi = min(lo, tile.min()), max(hi, tile.max())
+        density[r0:r1, c0:c1] = tile
+        starfield[r0:r1, c0:c1] = render_starfield_tile(catalog, seed, star_brightness, r0, r1, c0, c1)
+    for r0, r1, c0, c1 in iter_tiles(resolution, tile_size):
+        tile = density[r0:r1, c0:c1]
+        tile -= lo
+        tile /= hi - lo
+    density.flush()
+    starfield.flush()
+    return {
+        "density": density_path,
+        "starfield": starfield_path,
+        "resolution": resolution,
+        "tile_size": tile_size,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+# -----------------------------------
+# 流式 PNG 输出
+# -----------------------------------
+def png_chunk(f, kind, data):
+    f.write(struct.pack(">I", len(data)))
+    f.write(kind)
+    f.write(data)
+    f.write(struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+
+def write_png_stream(path, width, height, strips, bit_depth=8, channels=3, level=6, sub_filter=False):
+    """按行条带写 PNG；strips 依次产出 (rows, width, channels) 的 uint8/uint16 数组
+
+    path 也可以是已打开的二进制文件对象（如 io.BytesIO），此时不会关闭它。
+    sub_filter=True 时每行使用 PNG 的 Sub 滤波（与左侧像素做差），平滑图层的压缩更快也更小。
+    """
+    bpp = channels * bit_depth // 8
+    color_type = {1: 0, 3: 2, 4: 6}[channels]
+    dtype = np.dtype(">u2") if bit_depth == 16 else np.dtype(np.uint8)
+    compressor = zlib.compressobj(level)
+    with open(path, "wb") if isinstance(path, (str, os.PathLike)) else nullcontext(path) as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        png_chunk(f, b"IHDR", struct.pack(">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0))
+        for strip in strips:
+            rows = strip.reshape(strip.shape[0], -1).astype(dtype, copy=False).view(np.uint8)
+            raw = np.zeros((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)  # 每行首字节为滤波类型
+            raw[:, 1:] = rows
+            if sub_filter:
+                raw[:, 0] = 1
+                np.subtract(rows[:, bpp:], rows[:, :-bpp], out=raw[:, 1 + bpp:])
+            data = compressor.compress(raw.tobytes())
+            if data:
+                png_chunk(f, b"IDAT", data)
+        png_chunk(f, b"IDAT", compressor.flush())
+        png_chunk(f, b"IEND", b"")
+    return path
+
+
+def iter_composite_strips(density, starfield, colors, brightness=0.8, strip_rows=PNG_STRIP_ROWS):
+    """从内存映射图层按行条带合成 RGB；origin='lower'，所以从最后一行开始输出"""
+    resolution = density.shape[0]
+    for top in range(0, resolution, strip_rows):
+        bottom = min(top + strip_rows, resolution)
+        rows = slice(resolution - bottom, resolution - top)
+        yield composite_tile(density[rows][::-1], colors, brightness, starfield[rows][::-1])
+
+
+def export_tiled_png(render, path, colors, brightness=0.8, level=6):
+    density = np.load(render["density"], mmap_mode="r")
+    starfield = np.load(render["starfield"], mmap_mode="r")
+    resolution = render["resolution"]
+    return write_png_stream(path, resolution, resolution,
+                            iter_composite_strips(density, starfield, colors, brightness), level=level)
+
+
+def render_single_shot(center=(0.5, 0.5), size=0.4, resolution=256, seed=0, num_stars=600, star_brightness=1.0):
+    """整幅一次渲染两个图层，作为分块结果的参照
+
+    流程与 create_nebula_density / create_starfield 相同（整图噪声、整图滤波、整图落笔、整体归一化），
+    随机数取自与分块渲染相同的噪声块与星表，所以两者应逐像素一致。只适合小尺寸。
+    """
+    axis = np.linspace(0, 1, resolution)
+    layout = draw_density_layout(center, size, layer_rng(seed, "density"))
+    noise = np.zeros((resolution, resolution))
+    frequency = 1
+    amplitude = 1
+    max_amplitude = 0
+    for octave in range(4):
+        white = block_field(seed, "noise", octave, 0, resolution, 0, resolution,
+                            lambda rng, shape: rng.normal(0, 1, shape))
+        noise += ndimage.gaussian_filter(white, sigma=1/frequency) * amplitude
+        max_amplitude += amplitude
+        amplitude *= 0.5
+        frequency *= 2
+    density = render_density_layout(layout, axis, axis)
+    density += noise / max_amplitude * 0.2
+    density = ndimage.gaussian_filter(density, sigma=SMOOTH_SIGMA)
+    density -= density.min()
+    density /= density.max()
+
+    stars, bright = draw_star_catalog(seed, resolution, num_stars, star_brightness)
+    starfield = np.zeros((resolution, resolution))
+    stamp_stars(starfield, *stars)
+    tiny_stars = block_field(seed, "tiny_stars", 0, 0, resolution, 0, resolution,
+                             lambda rng, shape: rng.random(shape)) * 0.2 * star_brightness
+    tiny_stars *= tiny_stars > 0.06
+    starfield += tiny_stars
+    stamp_stars(starfield, *bright)
+    np.clip(starfield, 0, 1.0, out=starfield)
+    return density.astype(np.float32), starfield.astype(np.float32)
+
+
+def verify_tiled_seams(resolution=256, tile_size=64, seed=0):
+    """小尺寸下比较分块渲染与整幅单次渲染，返回两图层的最大绝对误差"""
+    single = dict(zip(("density", "starfield"), render_single_shot(resolution=resolution, seed=seed)))
+    with tempfile.TemporaryDirectory() as tmp:
+        tiled = render_tiled(tmp, resolution=resolution, seed=seed, tile_size=tile_size)
+        return {layer: float(np.abs(np.load(tiled[layer]) - single[layer]).max())
+                for layer in ("density", "starfield")}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="分块渲染超大尺寸星云并输出 PNG")
+    parser.add_argument("out_dir")
+    parser.add_argument("--resolution", type=int, default=16384)
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_TILE)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--num-stars", type=int, default=600)
+    parser.add_argument("--verify", action="store_true", help="只检查分块渲染与整幅单次渲染是否一致")
+    args = parser.parse_args()
+    if args.verify:
+        print(verify_tiled_seams(seed=args.seed))
+    else:
+        from nebula_core import ColorPaletteManager
+
+        result = render_tiled(args.out_dir, resolution=args.resolution, seed=args.seed,
+                              tile_size=args.tile_size, num_stars=args.num_stars)
+        png = export_tiled_png(result, os.path.join(args.out_dir, "nebula.png"),
+                               ColorPaletteManager().get_palette(0))
+        print(f"{png}  {args.resolution}px  layers {result['elapsed']:.1f} s")
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+from nebula_cache import layer_rng
+from nebula_core import create_nebula_density, create_starfield
+from nebula_memory import ScratchArena
+from nebula_parallel import parallel_layers
+
+
+@pytest.mark.parametrize("dtype, lean", [(np.float64, False), (np.float32, True)])
+@pytest.mark.parametrize("workers", [1, 3, 8])
+def test_parallel_matches_serial(dtype, lean, workers):
+    """并行生成的图层与串行版本逐位一致，与线程数无关（省内存模式下同样如此）"""
+    seed, resolution, star_resolution = 5, 300, 400
+    density = create_nebula_density(resolution=resolution, rng=layer_rng(seed, "density"), dtype=dtype,
+                                     arena=ScratchArena() if lean else None)[2]
+    starfield = create_starfield(star_resolution, 600, rng=layer_rng(seed, "starfield"), dtype=dtype)
+    layers, timings = parallel_layers(resolution=resolution, star_resolution=star_resolution, seed=seed,
+                                      dtype=dtype, workers=workers, arena=ScratchArena() if lean else None)
+    np.testing.assert_array_equal(layers["density"], density)
+    np.testing.assert_array_equal(layers["starfield"], starfield)
+    assert {"layout", "noise", "smooth", "starfield", "total"} <= set(timings)
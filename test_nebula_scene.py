@@ -0,0 +1,14 @@
+import numpy as np
+import pytest
+from nebula_scene import NebulaScene, random_scene_bodies
+
+
+@pytest.mark.parametrize("width, height", [(400, 300), (512, 256)])
+def test_index_matches_naive(width, height):
+    """空间索引与无索引对照路径的渲染结果完全一致（400x300 刻意不是分块大小的整数倍）"""
+    bodies = random_scene_bodies(40, width, height)
+    # 贴近底边的小星云：条带与索引网格错开时最容易被漏掉
+    bodies.append({"center": (0.5, 0.97), "size": 0.03, "colors": bodies[0]["colors"]})
+    indexed = NebulaScene(bodies, width, height).render()
+    naive = NebulaScene(bodies, width, height, spatial_index=False).render()
+    np.testing.assert_array_equal(indexed, naive)
@@ -0,0 +1,14 @@
+import numpy as np
+import pytest
+from nebula_tiled import render_single_shot, render_tiled
+
+
+@pytest.mark.parametrize("tile_size", [64, 100, 256])
+def test_tiled_matches_single_shot(tmp_path, tile_size):
+    """分块渲染（含与噪声块不对齐的分块）与整幅单次渲染逐像素一致，接缝处没有差异"""
+    resolution, seed = 256, 3
+    density, starfield = render_single_shot(resolution=resolution, seed=seed)
+    tiled = render_tiled(tmp_path, resolution=resolution, seed=seed, tile_size=tile_size)
+    # 密度在 float32 内存映射上原地归一化，只允许末位舍入误差
+    np.testing.assert_allclose(np.load(tiled["density"]), density, rtol=0, atol=1e-6)
+    np.testing.assert_array_equal(np.load(tiled["starfield"]), starfield)
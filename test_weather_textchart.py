@@ -0,0 +1,36 @@
+import numpy as np
+from weather_textchart import _legacy_chart, _legacy_labels, text_bar_chart, time_labels
+
+
+def hourly(n, start="2026-01-01T00:00"):
+    stamps = np.datetime64(start, "m") + np.arange(n) * np.timedelta64(60, "m")
+    return stamps, [str(t) for t in stamps]
+
+
+def test_time_labels_match_legacy():
+    stamps, hours = hourly(200)
+    assert list(time_labels(hours)) == _legacy_labels(hours)
+    assert list(time_labels(stamps)) == _legacy_labels(hours)
+
+
+def test_time_labels_with_day_and_bad_values():
+    _, hours = hourly(30, "2026-01-05T22:00")  # 周一
+    labels = time_labels(hours + ["n/a"], with_day=True)
+    assert labels[0] == "Mon 22:00"
+    assert labels[2] == "Tue 00:00"
+    assert labels[-1] == "n/a"
+
+
+def test_text_bar_chart_matches_legacy():
+    rng = np.random.default_rng(0)
+    _, hours = hourly(500)
+    labels = _legacy_labels(hours)
+    temps = np.round(15 + rng.normal(0, 5, len(hours)), 1).astype(np.float32)
+    assert text_bar_chart(temps, labels) == _legacy_chart(temps.tolist(), labels)
+    flat = np.full(len(hours), 12.5, dtype=np.float32)
+    assert text_bar_chart(flat, labels) == _legacy_chart(flat.tolist(), labels)
+
+
+def test_text_bar_chart_nan():
+    lines = text_bar_chart(np.array([1.0, np.nan, 3.0]), ["a", "b", "c"]).split("\n")
+    assert lines == ["a:  1.0°C", "b:  —°C", "c: " + "█" * 20 + " 3.0°C"]
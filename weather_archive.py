@@ -0,0 +1,234 @@
+import datetime
+import glob
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from http_client import get_client
+from weather_cache import grid_center, grid_key
+
+# -----------------------------------
+# 历史天气归档（Open-Meteo archive -> Parquet，按位置 / 月份分区）
+# -----------------------------------
+# 目录布局（hive 分区）：
+#   <root>/location=<lat>_<lon>/month=YYYY-MM/part-0.parquet
+# 时间范围查询先按 month 分区裁剪，只打开涉及的月份文件，再把 time 条件下推到 Parquet 行组统计。
+# 需要 pyarrow（列在 requirements.txt 中；只在用到归档功能时导入）。
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+ARCHIVE_FIELDS = ("temperature_2m", "relative_humidity_2m", "precipitation", "wind_speed_10m")
+DEFAULT_ARCHIVE_DIR = os.environ.get("WEATHER_ARCHIVE_DIR",
+                                     os.path.join(os.path.expanduser("~"), ".weather_archive"))
+CLIMATOLOGY_YEARS = 10
+
+
+def location_key(lat, lon):
+    """位置分区名：取整到模型网格的格点中心，与天气缓存的键一致"""
+    clat, clon = grid_center(grid_key(lat, lon))
+    return f"{clat:.1f}_{clon:.1f}"
+
+
+def last_complete_years(years=CLIMATOLOGY_YEARS, today=None):
+    """最近 years 个完整年份的 (起始日期, 结束日期)"""
+    today = today or datetime.date.today()
+    return datetime.date(today.year - years, 1, 1), datetime.date(today.year - 1, 12, 31)
+
+
+def payload_frame(payload, fields=ARCHIVE_FIELDS):
+    """archive 响应 -> DataFrame（time 为 datetime64[s]，数值列 float32）"""
+    hourly = payload.get("hourly", {})
+    frame = pd.DataFrame({"time": np.array(hourly.get("time", []), dtype="datetime64[s]")})
+    for name in fields:
+        values = hourly.get(name)
+        frame[name] = (np.array(values, dtype=np.float64).astype(np.float32) if values is not None
+                       else np.full(len(frame), np.nan, dtype=np.float32))
+    return frame
+
+
+class WeatherArchive:
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR, fields=ARCHIVE_FIELDS):
+        self.root = root
+        self.fields = tuple(fields)
+        os.makedirs(root, exist_ok=True)
+
+    # ---------- 布局 ----------
+    def location_dir(self, key):
+        return os.path.join(self.root, f"location={key}")
+
+    def months(self, key):
+        """已归档的月份（'YYYY-MM'），升序"""
+        pattern = os.path.join(self.location_dir(key), "month=*", "*.parquet")
+        return sorted({os.path.basename(os.path.dirname(path))[6:] for path in glob.glob(pattern)})
+
+    def locations(self):
+        return sorted(os.path.basename(path)[9:] for path in glob.glob(os.path.join(self.root, "location=*")))
+
+    # ---------- 写入 ----------
+    def write(self, key, frame):
+        """按月份写入分区；与已有分区按 time 合并（同一时刻以新数据为准），重复导入是幂等的。返回写入的月份数
+
+        只覆盖月份中的一段（如从月中开始的请求、部分 fixture）时不会丢掉该月已归档的其余小时。
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if frame.empty:
+            return 0
+        months = frame["time"].dt.strftime("%Y-%m")
+        written = 0
+        for month, part in frame.groupby(months, sort=True):
+            directory = os.path.join(self.location_dir(key), f"month={month}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, "part-0.parquet")
+            if os.path.exists(path):
+                old = pq.read_table(path).to_pandas()
+                part = pd.concat([old, part], ignore_index=True).drop_duplicates("time", keep="last")
+            table = pa.Table.from_pandas(part.sort_values("time"), preserve_index=False)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            pq.write_table(table, tmp_path, compression="zstd")
+            os.replace(tmp_path, path)
+            written += 1
+        return written
+
+    def ingest_payload(self, lat, lon, payload):
+        return self.write(location_key(lat, lon), payload_frame(payload, self.fields))
+
+    def ingest_fixture(self, path, lat=None, lon=None):
+        """从本地 JSON 文件（archive 接口的原始响应）回放导入；坐标缺省时取响应中的 latitude / longitude"""
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        lat = payload["latitude"] if lat is None else lat
+        lon = payload["longitude"] if lon is None else lon
+        return self.ingest_payload(lat, lon, payload)
+
+    def download(self, lat, lon, start, end, url=ARCHIVE_URL, client=None, skip_existing=True):
+        """按年分段请求 archive 接口并写入；skip_existing 时跳过已完整归档的年份。返回请求次数"""
+        client = client or get_client()
+        key = location_key(lat, lon)
+        have = set(self.months(key)) if skip_existing else set()
+        calls = 0
+        for year in range(start.year, end.year + 1):
+            lo, hi = max(start, datetime.date(year, 1, 1)), min(end, datetime.date(year, 12, 31))
+            wanted = {f"{year}-{m:02d}" for m in range(lo.month, hi.month + 1)}
+            if wanted <= have:
+                continue
+            payload = client.get_json(url, {
+                "latitude": lat, "longitude": lon,
+                "start_date": lo.isoformat(), "end_date": hi.isoformat(),
+                "hourly": ",".join(self.fields), "timezone": "auto",
+            })
+            self.write(key, payload_frame(payload, self.fields))
+            calls += 1
+        return calls
+
+    # ---------- 查询 ----------
+    def query(self, key, start=None, end=None, columns=None, months=None):
+        """读取 [start, end) 的逐小时数据
+
+        分区裁剪：只打开 start..end（或显式给出的 months）涉及的月份目录；
+        time 条件随 filter 下推到 Parquet 行组统计。
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        have = self.months(key)
+        if months is not None:
+            wanted = sorted(set(months) & set(have))
+        else:
+            lo = pd.Timestamp(start).strftime("%Y-%m") if start is not None else "0000-00"
+            hi = pd.Timestamp(end).strftime("%Y-%m") if end is not None else "9999-99"
+            wanted = [m for m in have if lo <= m <= hi]
+        columns = ["time", *(columns or self.fields)]
+        if not wanted:
+            # 空结果也保持与 Parquet 一致的列类型，调用方可以照常使用 .dt
+            return pd.DataFrame({name: np.array([], dtype="datetime64[s]" if name == "time" else np.float32)
+                                 for name in columns})
+        paths = [os.path.join(self.location_dir(key), f"month={m}", "part-0.parquet") for m in wanted]
+        dataset = ds.dataset(paths, format="parquet")
+        condition = None
+        if start is not None:
+            condition = ds.field("time") >= pa.scalar(pd.Timestamp(start).to_pydatetime(), pa.timestamp("s"))
+        if end is not None:
+            upper = ds.field("time") < pa.scalar(pd.Timestamp(end).to_pydatetime(), pa.timestamp("s"))
+            condition = upper if condition is None else condition & upper
+        return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+    def day_of_year(self, key, month, day, years=None, field="temperature_2m"):
+        """每年同一日期（月-日）的日均 / 最高 / 最低值，只读取各年该月份的分区"""
+        have = self.months(key)
+        if years is not None:
+            months = [f"{y}-{month:02d}" for y in years]
+        else:
+            months = [m for m in have if m.endswith(f"-{month:02d}")]
+        frame = self.query(key, columns=[field], months=months)
+        if frame.empty:
+            return pd.DataFrame(columns=["mean", "min", "max"], index=pd.Index([], name="year"))
+        times = frame["time"]
+        same_day = frame[(times.dt.month == month) & (times.dt.day == day)]
+        daily = same_day.groupby(same_day["time"].dt.year)[field].agg(["mean", "min", "max"])
+        daily.index.name = "year"
+        return daily
+
+    def monthly_climatology(self, key, field="temperature_2m"):
+        """按日历月份汇总所有年份：平均值、平均日最高 / 最低"""
+        frame = self.query(key, columns=[field])
+        if frame.empty:
+            return pd.DataFrame(columns=["mean", "daily_max", "daily_min"])
+        days = frame.groupby(frame["time"].dt.floor("D"))[field].agg(["mean", "max", "min"])
+        by_month = days.groupby(days.index.month)
+        out = pd.DataFrame({"mean": by_month["mean"].mean(), "daily_max": by_month["max"].mean(),
+                            "daily_min": by_month["min"].mean()})
+        out.index.name = "month"
+        return out
+
+    def clear(self, key=None):
+        shutil.rmtree(self.location_dir(key) if key else self.root, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
+
+
+def benchmark_archive(years=CLIMATOLOGY_YEARS, latency=0.05, repeats=20):
+    """经由桩服务导入 years 年数据，并对比本地查询与逐日请求 archive 接口的耗时"""
+    import tempfile
+    from http_client import HttpClient
+    from weather_stub import stub_server
+
+    lat, lon = 37.5665, 126.978
+    start, end = last_complete_years(years)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp, stub_server(latency) as base:
+        archive = WeatherArchive(tmp)
+        client = HttpClient()
+        url = base + "/v1/archive"
+        t0 = time.perf_counter()
+        calls = archive.download(lat, lon, start, end, url=url, client=client)
+        results.append({"mode": f"ingest {years} years ({calls} requests)", "ms": (time.perf_counter() - t0) * 1000})
+        t0 = time.perf_counter()
+        archive.download(lat, lon, start, end, url=url, client=client)
+        results.append({"mode": "re-ingest (all months present)", "ms": (time.perf_counter() - t0) * 1000})
+
+        key = location_key(lat, lon)
+        today = datetime.date.today()
+        for label, fn in (
+                ("climatology for today's date", lambda: archive.day_of_year(key, today.month, today.day)),
+                ("one week range query", lambda: archive.query(key, f"{end.year}-06-01", f"{end.year}-06-08")),
+                ("monthly climatology (all rows)", lambda: archive.monthly_climatology(key))):
+            t0 = time.perf_counter()
+            for _ in range(repeats):
+                fn()
+            results.append({"mode": label, "ms": (time.perf_counter() - t0) / repeats * 1000})
+
+        # 不落地时，同一日期的 N 年气候值需要 N 次 archive 请求
+        t0 = time.perf_counter()
+        for year in range(start.year, end.year + 1):
+            day = datetime.date(year, today.month, min(today.day, 28)).isoformat()
+            client.get_json(url, {"latitude": lat, "longitude": lon, "start_date": day, "end_date": day,
+                                  "hourly": "temperature_2m"})
+        results.append({"mode": f"climatology via API ({years} requests)", "ms": (time.perf_counter() - t0) * 1000})
+        client.close()
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_archive():
+        print(f"{row['mode']:>40}  {row['ms']:9.1f} ms")
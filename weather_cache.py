@@ -0,0 +1,202 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# -----------------------------------
+# 天气数据缓存（按模型网格取整的坐标 + 整点过期，内存 LRU + 可选 SQLite）
+# -----------------------------------
+GRID_STEP = 0.1  # Open-Meteo 高分辨率模型的网格间距约 0.1°（~11 km），同一格点内的坐标共用一份预报
+MODEL_UPDATE_SECONDS = 3600  # 模型逐小时更新，缓存在下一个整点失效
+MAX_ENTRIES = 4096
+DEFAULT_DB_PATH = os.environ.get("WEATHER_CACHE_DB")  # 未设置时只用内存
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS weather (
+    key TEXT PRIMARY KEY,
+    expires REAL NOT NULL,
+    payload TEXT NOT NULL
+)
+"""
+
+
+def grid_key(lat, lon, variant="", step=GRID_STEP):
+    """坐标取整到网格格点的整数索引；variant 区分不同的请求参数（如预报天数）"""
+    return round(lat / step), round(lon / step) % round(360 / step), variant
+
+
+def grid_center(key, step=GRID_STEP):
+    """格点索引 -> 格点中心坐标（经度归一到 [-180, 180)）"""
+    ilat, ilon, _ = key
+    lon = ilon * step
+    return round(ilat * step, 6), round(lon - 360 if lon >= 180 else lon, 6)
+
+
+def next_update(now, period=MODEL_UPDATE_SECONDS):
+    """now 之后的下一个模型更新时刻（按 period 对齐）"""
+    return (now // period + 1) * period
+
+
+class WeatherCache:
+    """进程内共享的天气缓存；path 给出时再加一层 SQLite，重启或多进程间复用
+
+    get_or_fetch 对同一格点的并发未命中只发出一次请求，其余调用等待其结果。
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, period=MODEL_UPDATE_SECONDS, max_entries=MAX_ENTRIES,
+                 step=GRID_STEP, clock=time.time):
+        self.period = period
+        self.max_entries = max_entries
+        self.step = step
+        self.clock = clock
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(SCHEMA)
+
+    # ---------- 内部 ----------
+    def _store(self, key, expires, payload):
+        self.memory[key] = (expires, payload)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _lookup(self, key, now):
+        entry = self.memory.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self.memory[key]
+            self.expired += 1
+        if self._conn is not None:
+            row = self._conn.execute("SELECT expires, payload FROM weather WHERE key = ?",
+                                     (json.dumps(key),)).fetchone()
+            if row is not None and row[0] > now:
+                payload = json.loads(row[1])
+                self._store(key, row[0], payload)
+                self.disk_hits += 1
+                return payload
+        return None
+
+    # ---------- 接口 ----------
+    def key(self, lat, lon, variant=""):
+        return grid_key(lat, lon, variant, self.step)
+
+    def get(self, lat, lon, variant=""):
+        with self._lock:
+            return self._lookup(self.key(lat, lon, variant), self.clock())
+
+    def put(self, lat, lon, payload, variant=""):
+        key = self.key(lat, lon, variant)
+        expires = next_update(self.clock(), self.period)
+        with self._lock:
+            self._store(key, expires, payload)
+            if self._conn is not None:
+                self._conn.execute("INSERT OR REPLACE INTO weather (key, expires, payload) VALUES (?, ?, ?)",
+                                   (json.dumps(key), expires, json.dumps(payload)))
+        return payload
+
+    def get_or_fetch(self, lat, lon, fetch, variant=""):
+        """命中则直接返回，否则以格点中心坐标调用 fetch(lat, lon)；返回 None 的结果不缓存"""
+        key = self.key(lat, lon, variant)
+        while True:
+            with self._lock:
+                payload = self._lookup(key, self.clock())
+                if payload is not None:
+                    return payload
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    self.misses += 1
+                    done = self._inflight[key] = threading.Event()
+                    break
+            waiter.wait()
+            # 另一调用已取回（或失败）；再查一次缓存，失败时由本调用重新请求
+        try:
+            payload = fetch(*grid_center(key, self.step))
+            if payload is not None:
+                self.put(lat, lon, payload, variant)
+            return payload
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            done.set()
+
+    def purge_expired(self):
+        now = self.clock()
+        with self._lock:
+            for key in [k for k, (expires, _) in self.memory.items() if expires <= now]:
+                del self.memory[key]
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM weather WHERE expires <= ?", (now,))
+
+    def clear(self):
+        with self._lock:
+            self.memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM weather")
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        disk_items = (self._conn.execute("SELECT COUNT(*) FROM weather").fetchone()[0]
+                      if self._conn is not None else 0)
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_items": len(self.memory),
+            "disk_items": disk_items,
+        }
+
+
+def benchmark_cache(lookups=2000, cities=8, jitter=0.03, latency=0.05, seed=0):
+    """模拟多个会话反复查询热门城市附近的坐标：无缓存与有缓存时的上游请求数及总耗时"""
+    import numpy as np
+    from weather_fetch import fetch_weather_concurrent
+    from weather_stub import stub_server
+
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform([-60, -180], [60, 180], (cities, 2))
+    queries = centers[rng.integers(0, cities, lookups)] + rng.uniform(-jitter, jitter, (lookups, 2))
+
+    results = []
+    with stub_server(latency) as base:
+        url = base + "/v1/forecast"
+
+        def fetch(lat, lon):
+            return fetch_weather_concurrent({"q": {"lat": lat, "lon": lon}}, url=url, max_workers=1)["q"]
+
+        sample = queries[:max(1, lookups // 50)]  # 无缓存时只跑一小部分再按比例外推
+        start = time.perf_counter()
+        for lat, lon in sample:
+            fetch(lat, lon)
+        per_call = (time.perf_counter() - start) / len(sample)
+        results.append({"mode": "uncached", "upstream": lookups, "ms": per_call * lookups * 1000})
+
+        cache = WeatherCache(path=None)
+        start = time.perf_counter()
+        for lat, lon in queries:
+            cache.get_or_fetch(lat, lon, fetch)
+        results.append({"mode": "cached", "upstream": cache.misses, "ms": (time.perf_counter() - start) * 1000,
+                        "hit_rate": cache.stats()["hit_rate"]})
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_cache():
+        extra = f"  hit rate {row['hit_rate']:.1%}" if "hit_rate" in row else "  (extrapolated)"
+        print(f"{row['mode']:>9}  upstream requests {row['upstream']:>5}  {row['ms']:9.1f} ms{extra}")
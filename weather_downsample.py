@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# -----------------------------------
+# 图表降采样（LTTB / min-max），按像素宽度限定点数，结果按窗口缓存
+# -----------------------------------
+# 折线图每个像素列最多只能画出一个点，多出来的点只增加序列化体积与浏览器渲染时间。
+# LTTB（Largest-Triangle-Three-Buckets）保留视觉形状，适合平滑曲线；
+# min-max 每个桶保留最低 / 最高点，尖峰不会被抹掉，适合降水等突变序列。
+DEFAULT_WIDTH_PX = 900  # 主栏图表的大致像素宽度
+POINTS_PER_PX = 1.0
+MIN_POINTS = 16
+CACHE_ENTRIES = 64
+METHODS = ("lttb", "minmax")
+
+
+def point_budget(width_px=DEFAULT_WIDTH_PX, points_per_px=POINTS_PER_PX):
+    """图表宽度对应的点数预算"""
+    return max(MIN_POINTS, int(width_px * points_per_px))
+
+
+def _as_float(x):
+    """时间轴转成可做面积运算的 float64（datetime64 按整数刻度）"""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.view(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def minmax_indices(values, budget):
+    """每个桶保留最低点与最高点，另加首尾点，总数不超过 budget（桶数 = (budget - 2) // 2）；返回升序下标"""
+    n = len(values)
+    if n <= budget:
+        return np.arange(n)
+    y = np.asarray(values, dtype=np.float64)
+    width = -(-n // max(1, (budget - 2) // 2))
+    buckets = -(-n // width)
+    pad = buckets * width - n
+    # NaN 与补齐位置在求最低时当作 +inf、求最高时当作 -inf，不会被选中（整桶都是 NaN 时选桶首）
+    low = np.concatenate([np.where(np.isnan(y), np.inf, y), np.full(pad, np.inf)]).reshape(buckets, width)
+    high = np.concatenate([np.where(np.isnan(y), -np.inf, y), np.full(pad, -np.inf)]).reshape(buckets, width)
+    offsets = np.arange(buckets) * width
+    picks = np.concatenate([[0, n - 1], offsets + low.argmin(axis=1), offsets + high.argmax(axis=1)])
+    return np.unique(np.minimum(picks, n - 1))
+
+
+def lttb_indices(x, values, budget):
+    """Largest-Triangle-Three-Buckets：首尾点之外每个桶选出与前一选中点、后一桶均值所成三角形面积最大的点
+
+    NaN 点不参与选择；桶均值由前缀和一次算出，逐桶循环内只剩一次向量化的面积计算。
+    """
+    n = len(values)
+    if n <= budget:
+        return np.arange(n)
+    y = np.asarray(values, dtype=np.float64)
+    finite = np.flatnonzero(np.isfinite(y))
+    if len(finite) <= budget:
+        return finite
+    xs, ys = _as_float(x)[finite], y[finite]
+    m = len(finite)
+    # 中间 m-2 个点均分为 budget-2 个桶：桶 i 覆盖 [edges[i], edges[i+1])
+    edges = (np.linspace(1, m - 1, budget - 1)).astype(np.int64)
+    cx = np.concatenate([[0.0], np.cumsum(xs)])
+    cy = np.concatenate([[0.0], np.cumsum(ys)])
+    # 每个桶的“下一桶均值”；最后一个桶的下一桶是终点本身
+    lo, hi = edges[1:], np.append(edges[2:], m)
+    counts = np.maximum(hi - lo, 1)
+    next_x = (cx[hi] - cx[lo]) / counts
+    next_y = (cy[hi] - cy[lo]) / counts
+    next_x[-1], next_y[-1] = xs[-1], ys[-1]
+
+    picks = np.empty(budget, dtype=np.int64)
+    picks[0], picks[-1] = 0, m - 1
+    a = 0
+    for i in range(budget - 2):
+        s, e = edges[i], max(edges[i + 1], edges[i] + 1)
+        area = np.abs((xs[a] - next_x[i]) * (ys[s:e] - ys[a]) - (xs[a] - xs[s:e]) * (next_y[i] - ys[a]))
+        a = s + int(area.argmax())
+        picks[i + 1] = a
+    return finite[np.unique(picks)]
+
+
+def downsample(times, values, budget=None, method="lttb"):
+    """返回 (times, values) 的降采样视图；点数不超过预算时原样返回"""
+    budget = budget or point_budget()
+    if len(values) <= budget:
+        return times, values
+    if method == "minmax":
+        picks = minmax_indices(values, budget)
+    elif method == "lttb":
+        picks = lttb_indices(times, values, budget)
+    else:
+        raise ValueError(f"未知的降采样方法: {method}（可选 {', '.join(METHODS)}）")
+    return np.asarray(times)[picks], np.asarray(values)[picks]
+
+
+def window_bounds(times, start=None, end=None):
+    """[start, end] 在升序时间数组中的切片下标"""
+    times = np.asarray(times)
+    i = 0 if start is None else int(np.searchsorted(times, np.datetime64(start, "s"), side="left"))
+    j = len(times) if end is None else int(np.searchsorted(times, np.datetime64(end, "s"), side="right"))
+    return i, j
+
+
+class DownsampleCache:
+    """降采样结果的 LRU 缓存，键为 (序列键, 窗口起止, 点数预算, 方法)
+
+    未命中时才调用 load(start, end) 取窗口内的原始数据（可以只读取相关的 Parquet 分区），
+    命中时完全不触碰原始序列。序列键应包含能标识数据版本的信息（如最新时间戳），数据更新后自然失效。
+    """
+
+    def __init__(self, max_entries=CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.points_in = 0
+        self.points_out = 0
+        self._lock = threading.Lock()
+
+    def get(self, series_key, load, start=None, end=None, budget=None, method="lttb"):
+        """返回窗口内降采样后的 (times, values)"""
+        budget = budget or point_budget()
+        key = (series_key, str(start), str(end), budget, method)
+        with self._lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        times, values = load(start, end)
+        entry = downsample(np.asarray(times), np.asarray(values), budget, method)
+        with self._lock:
+            self.points_in += len(values)
+            self.points_out += len(entry[1])
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self.memory.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0,
+                    "entries": len(self.memory), "points_in": self.points_in, "points_out": self.points_out}
+
+
+def benchmark_downsample(lengths=(24, 384, 8760, 87600), budget=None, repeats=20, seed=0):
+    """各长度逐小时序列的降采样耗时（毫秒）与 Plotly 图表 JSON 体积（KB）"""
+    import plotly.graph_objects as go
+
+    budget = budget or point_budget()
+    rng = np.random.default_rng(seed)
+    results = []
+    for n in lengths:
+        times = np.datetime64("2015-01-01T00:00", "s") + np.arange(n) * np.timedelta64(3600, "s")
+        hours = np.arange(n)
+        values = (12 + 10 * np.sin(2 * np.pi * hours / 8766) + 5 * np.sin(2 * np.pi * hours / 24)
+                  + rng.normal(0, 1.5, n).cumsum() * 0.05).astype(np.float32)
+        row = {"points": n, "raw_kb": len(go.Figure(go.Scatter(x=times, y=values)).to_json()) / 1024}
+        for method in METHODS:
+            start = time.perf_counter()
+            for _ in range(repeats):
+                t, v = downsample(times, values, budget, method)
+            row[f"{method}_ms"] = (time.perf_counter() - start) / repeats * 1000
+            row[f"{method}_kb"] = len(go.Figure(go.Scatter(x=t, y=v)).to_json()) / 1024
+        cache = DownsampleCache()
+        load = lambda s, e: (times, values)  # noqa: E731
+        cache.get("bench", load, budget=budget)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            cache.get("bench", load, budget=budget)
+        row["cached_ms"] = (time.perf_counter() - start) / repeats * 1000
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_downsample():
+        print(f"{row['points']:>6} pts  raw {row['raw_kb']:8.1f} KB  "
+              f"lttb {row['lttb_ms']:6.2f} ms / {row['lttb_kb']:6.1f} KB  "
+              f"minmax {row['minmax_ms']:6.2f} ms / {row['minmax_kb']:6.1f} KB  cached {row['cached_ms']:.4f} ms")
@@ -0,0 +1,116 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import requests
+from http_client import get_client
+
+# -----------------------------------
+# 多地点天气批量获取
+# -----------------------------------
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+CURRENT_FIELDS = "temperature_2m,relative_humidity_2m,apparent_temperature,weather_code,wind_speed_10m,wind_direction_10m"
+HOURLY_FIELDS = "temperature_2m,relative_humidity_2m,weather_code,wind_speed_10m"
+MAX_BATCH_LOCATIONS = 100  # 单次请求携带的坐标数上限，超出则分多次
+MAX_WORKERS = 8
+
+
+def forecast_params(lats, lons, forecast_days=1):
+    """单个或多个坐标的预报请求参数；多个坐标以逗号拼接，一次往返取回全部"""
+    join = lambda values: ",".join(f"{v:.4f}" for v in values)  # noqa: E731
+    return {
+        "latitude": join(lats),
+        "longitude": join(lons),
+        "current": CURRENT_FIELDS,
+        "hourly": HOURLY_FIELDS,
+        "timezone": "auto",
+        "forecast_days": forecast_days,
+    }
+
+
+def fetch_weather_batch(locations, forecast_days=1, url=FORECAST_URL, client=None):
+    """locations 为 {名称: {"lat", "lon", ...}}；用逗号分隔的坐标列表一次请求取回全部地点
+
+    返回 {名称: 响应 JSON}，顺序与 locations 相同。请求失败时抛出 requests 的异常。
+    """
+    client = client or get_client()
+    names = list(locations)
+    results = {}
+    for start in range(0, len(names), MAX_BATCH_LOCATIONS):
+        chunk = names[start:start + MAX_BATCH_LOCATIONS]
+        params = forecast_params([locations[n]["lat"] for n in chunk], [locations[n]["lon"] for n in chunk],
+                                 forecast_days)
+        data = client.get_json(url, params)
+        # 单个坐标时接口返回对象，多个时返回列表
+        results.update(zip(chunk, data if isinstance(data, list) else [data]))
+    return results
+
+
+def fetch_weather_concurrent(locations, forecast_days=1, url=FORECAST_URL, client=None, max_workers=MAX_WORKERS):
+    """每个地点单独请求，由有界线程池并发发出（共用客户端的连接池）；失败的地点值为 None"""
+    client = client or get_client()
+
+    def fetch(info):
+        try:
+            return client.get_json(url, forecast_params([info["lat"]], [info["lon"]], forecast_days))
+        except (requests.RequestException, ValueError):
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, max(1, len(locations)))) as pool:
+        return dict(zip(locations, pool.map(fetch, locations.values())))
+
+
+def fetch_all_weather(locations, forecast_days=1, url=FORECAST_URL, client=None):
+    """先尝试一次批量请求，失败时退回到并发的逐地点请求"""
+    try:
+        return fetch_weather_batch(locations, forecast_days, url, client)
+    except (requests.RequestException, ValueError):
+        return fetch_weather_concurrent(locations, forecast_days, url, client)
+
+
+def comparison_table(results, locations, describe=None):
+    """把各地点当前天气整理成对比表（数值列保持数值类型，缺失为 NaN）"""
+    rows = []
+    for name, data in results.items():
+        current = (data or {}).get("current", {})
+        code = current.get("weather_code")
+        rows.append({
+            "City": name,
+            "Country": locations[name].get("country", ""),
+            "Conditions": describe(int(code)) if describe and code is not None else code,
+            "Temp (°C)": current.get("temperature_2m"),
+            "Feels like (°C)": current.get("apparent_temperature"),
+            "Humidity (%)": current.get("relative_humidity_2m"),
+            "Wind (km/h)": current.get("wind_speed_10m"),
+        })
+    return pd.DataFrame(rows)
+
+
+def benchmark_fetch(city_counts=(1, 4, 8, 32), latency=0.15):
+    """逐个串行 / 并发 / 批量三种方式的墙钟时间（毫秒），对本地桩服务计时，latency 模拟往返延迟"""
+    from weather_stub import stub_server
+
+    def serial(locations, url):
+        return {name: fetch_weather_concurrent({name: info}, url=url, max_workers=1)[name]
+                for name, info in locations.items()}
+
+    results = []
+    with stub_server(latency) as base:
+        url = base + "/v1/forecast"
+        for count in city_counts:
+            locations = {f"city{i}": {"lat": -60 + 120 * i / count, "lon": -170 + 340 * i / count}
+                         for i in range(count)}
+            row = {"cities": count}
+            for mode, fn in (("serial", serial), ("concurrent", fetch_weather_concurrent),
+                             ("batch", fetch_weather_batch)):
+                start = time.perf_counter()
+                fetched = fn(locations, url=url)
+                row[mode] = (time.perf_counter() - start) * 1000
+                assert all(fetched.values())
+            results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_fetch():
+        print(f"{row['cities']:>3} cities  serial {row['serial']:8.1f} ms  concurrent {row['concurrent']:8.1f} ms"
+              f"  batch {row['batch']:8.1f} ms")
@@ -0,0 +1,220 @@
+import csv
+import difflib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# -----------------------------------
+# 离线地名索引（SQLite FTS5，前缀 / 模糊联想，未命中时回源地理编码并写回）
+# -----------------------------------
+SEED_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weather_gazetteer_cities.csv")
+DEFAULT_DB_PATH = os.environ.get("WEATHER_GAZETTEER_DB", ":memory:")
+SUGGEST_LIMIT = 8
+FUZZY_CUTOFF = 0.75
+FUZZY_MIN_LENGTH = 4  # 更短的输入只做前缀联想，模糊匹配在这里几乎全是噪声
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    country TEXT NOT NULL,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    population INTEGER NOT NULL DEFAULT 0,
+    source TEXT NOT NULL,
+    UNIQUE (name_key, country)
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias_key TEXT PRIMARY KEY,
+    place_id INTEGER NOT NULL REFERENCES places(id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS places_fts USING fts5(
+    name, content='places', content_rowid='id', prefix='2 3', tokenize="unicode61 remove_diacritics 2"
+);
+"""
+
+
+def name_key(name):
+    """大小写、重音与多余空白都不敏感的查找键：'  São  Paulo ' -> 'sao paulo'"""
+    text = unicodedata.normalize("NFKD", name.casefold())
+    return " ".join("".join(c for c in text if not unicodedata.combining(c)).split())
+
+
+def fts_query(text):
+    """把输入转成 FTS5 查询：每个词按短语引用，最后一个词做前缀匹配"""
+    words = name_key(text).replace('"', " ").split()
+    if not words:
+        return None
+    return " ".join(f'"{w}"' for w in words) + "*"
+
+
+class Gazetteer:
+    """地名 -> 坐标的本地索引
+
+    精确查找走内存字典（键为 name_key，同名取人口最多者），联想走 FTS5 前缀索引，
+    再用 difflib 补充拼写相近的结果。其他进程写入后通过 PRAGMA data_version 感知并重新加载。
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, seed_csv=SEED_CSV):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._index = {}
+        self._keys = []
+        self._data_version = None
+        if seed_csv and not self._conn.execute("SELECT 1 FROM places LIMIT 1").fetchone():
+            self.load_csv(seed_csv)
+        self._reload()
+
+    # ---------- 内部缓存 ----------
+    def _reload(self):
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return
+            index = {}
+            rows = self._conn.execute("SELECT id, name, name_key, country, lat, lon FROM places "
+                                      "ORDER BY population ASC")
+            by_id = {}
+            for pid, name, key, country, lat, lon in rows:
+                # 人口升序遍历，同名时人口多的覆盖人口少的
+                index[key] = by_id[pid] = {"id": pid, "name": name, "country": country, "lat": lat, "lon": lon}
+            for alias, pid in self._conn.execute("SELECT alias_key, place_id FROM aliases"):
+                index.setdefault(alias, by_id[pid])
+            self._index = index
+            self._keys = list(index)
+            self._data_version = version
+
+    def _insert(self, name, country, lat, lon, population, source):
+        key = name_key(name)
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO places (name, name_key, country, lat, lon, population, source) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", (name, key, country, lat, lon, population, source))
+        if cursor.rowcount:
+            self._conn.execute("INSERT INTO places_fts (rowid, name) VALUES (?, ?)", (cursor.lastrowid, name))
+            return cursor.lastrowid
+        return self._conn.execute("SELECT id FROM places WHERE name_key = ? AND country = ?",
+                                  (key, country)).fetchone()[0]
+
+    # ---------- 写入 ----------
+    def load_csv(self, path):
+        """批量导入 name,country,lat,lon,population 格式的 CSV，返回导入行数"""
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for row in rows:
+                    self._insert(row["name"], row["country"], float(row["lat"]), float(row["lon"]),
+                                 int(row.get("population") or 0), "seed")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._data_version = None
+        return len(rows)
+
+    def add(self, place, alias=None, source="geocoder"):
+        """写入一个地点（{name, country, lat, lon}），alias 为用户实际输入的名称"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                pid = self._insert(place["name"], place.get("country", "Unknown"), place["lat"], place["lon"],
+                                   int(place.get("population") or 0), source)
+                if alias and name_key(alias) != name_key(place["name"]):
+                    self._conn.execute("INSERT OR REPLACE INTO aliases (alias_key, place_id) VALUES (?, ?)",
+                                       (name_key(alias), pid))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._data_version = None
+        return {"id": pid, "name": place["name"], "country": place.get("country", "Unknown"),
+                "lat": place["lat"], "lon": place["lon"]}
+
+    # ---------- 查询 ----------
+    def lookup(self, name):
+        """精确查找（忽略大小写与重音），未收录返回 None"""
+        self._reload()
+        return self._index.get(name_key(name))
+
+    def suggest(self, text, limit=SUGGEST_LIMIT):
+        """输入联想：先按前缀（人口降序），不足 limit 时补充拼写相近的地名"""
+        query = fts_query(text)
+        if query is None:
+            return []
+        self._reload()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.id, p.name, p.country, p.lat, p.lon FROM places_fts JOIN places p ON p.id = places_fts.rowid "
+                "WHERE places_fts MATCH ? ORDER BY p.population DESC LIMIT ?", (query, limit)).fetchall()
+        results = [{"id": pid, "name": name, "country": country, "lat": lat, "lon": lon}
+                   for pid, name, country, lat, lon in rows]
+        if len(results) < limit and len(name_key(text)) >= FUZZY_MIN_LENGTH:
+            seen = {place["id"] for place in results}
+            for key in difflib.get_close_matches(name_key(text), self._keys, limit, FUZZY_CUTOFF):
+                place = self._index[key]
+                if place["id"] not in seen and len(results) < limit:
+                    seen.add(place["id"])
+                    results.append(place)
+        return results
+
+    def resolve(self, name, geocode=None):
+        """先查本地索引；未命中时调用 geocode(name)（返回 {lat, lon, name, country} 或 None）并写回"""
+        place = self.lookup(name)
+        with self._lock:
+            if place is not None:
+                self.hits += 1
+                return place
+            self.misses += 1
+        if geocode is None:
+            return None
+        place = geocode(name)
+        return self.add(place, alias=name) if place else None
+
+    def stats(self):
+        with self._lock:
+            places = self._conn.execute("SELECT COUNT(*) FROM places").fetchone()[0]
+            aliases = self._conn.execute("SELECT COUNT(*) FROM aliases").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "places": places, "aliases": aliases}
+
+
+def benchmark_gazetteer(repeats=2000, latency=0.05):
+    """本地精确查找 / 联想的单次耗时（微秒），对比经由桩服务的网络地理编码"""
+    from http_client import HttpClient
+    from weather_stub import stub_server
+
+    gazetteer = Gazetteer(":memory:")
+    names = list(gazetteer._keys)
+    results = []
+    for label, fn, args in (("lookup hit", gazetteer.lookup, names),
+                            ("lookup miss", gazetteer.lookup, ["atlantis", "gondor", "xanadu"]),
+                            ("suggest prefix", gazetteer.suggest, ["se", "new", "san f", "ba"]),
+                            ("suggest fuzzy", gazetteer.suggest, ["tokio", "londn", "sidney"])):
+        start = time.perf_counter()
+        for i in range(repeats):
+            fn(args[i % len(args)])
+        results.append({"mode": label, "us": (time.perf_counter() - start) / repeats * 1e6})
+
+    with stub_server(latency) as base:
+        client = HttpClient()
+        count = 10
+        start = time.perf_counter()
+        for _ in range(count):
+            client.get_json(base + "/v1/search", {"name": "Seoul", "count": 1, "language": "en", "format": "json"})
+        results.append({"mode": "network geocode", "us": (time.perf_counter() - start) / count * 1e6})
+        client.close()
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_gazetteer():
+        print(f"{row['mode']:>16}  {row['us']:10.1f} us")
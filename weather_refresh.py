@@ -0,0 +1,305 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from weather_cache import MODEL_UPDATE_SECONDS, grid_center, next_update
+from weather_fetch import MAX_BATCH_LOCATIONS, fetch_all_weather
+
+# -----------------------------------
+# 后台刷新（stale-while-revalidate）：热门城市与最近查询的位置在模型更新后自动刷新
+# -----------------------------------
+# 读取时有新鲜数据直接返回；已过期但有上次成功的数据时立即返回旧数据并排队刷新；
+# 从未取到过的位置才同步请求。刷新按模型更新周期整点后 REFRESH_DELAY_SECONDS 批量进行，
+# 一次请求携带多个坐标（fetch_all_weather），失败的位置保留旧数据，下一轮或下次读取时重试。
+REFRESH_DELAY_SECONDS = 120  # 模型整点更新后数据发布有延迟，稍后再刷新
+MAX_RECENT = 32
+RECENT_TTL_SECONDS = 6 * 3600  # 超过这个时间没人查询的位置不再后台刷新
+
+
+def _current_time(payload):
+    """payload 中当前天气的观测时间（ISO 字符串可直接比较先后）；没有时为空串"""
+    return (payload.get("current") or {}).get("time") or ""
+
+
+class WeatherRefresher:
+    """持有一个工作线程与一个调度线程；适合由 st.cache_resource 创建并在所有会话间共享
+
+    pinned 为 {名称: {"lat", "lon", ...}}，始终保持刷新；其他经 get 查询过的位置作为最近位置，
+    按 LRU 最多保留 max_recent 个。
+    """
+
+    def __init__(self, cache, pinned=None, forecast_days=1, client=None, max_recent=MAX_RECENT,
+                 recent_ttl=RECENT_TTL_SECONDS, delay=REFRESH_DELAY_SECONDS, clock=time.time):
+        self.cache = cache
+        self.forecast_days = forecast_days
+        self.variant = forecast_days  # 与应用写入缓存时使用的 variant 一致
+        self.client = client
+        self.max_recent = max_recent
+        self.recent_ttl = recent_ttl
+        self.delay = delay
+        self.clock = clock
+        self.pinned = {}
+        for info in (pinned or {}).values():
+            self.pinned[cache.key(info["lat"], info["lon"], self.variant)] = (info["lat"], info["lon"])
+        self.recent = OrderedDict()  # 键 -> 最后查询时间
+        self.last_good = {}  # 键 -> (取回时间, payload)
+        self.queue = deque()
+        self.queued = set()
+        self.inflight = set()
+        self.served_fresh = 0
+        self.served_stale = 0
+        self.cold_fetches = 0
+        self.refreshed = 0
+        self.failures = 0
+        self.batches = 0
+        self.refresh_ms_total = 0.0
+        self.last_refresh_ms = 0.0
+        self.last_cycle = None
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._threads = []
+
+    # ---------- 生命周期 ----------
+    def start(self):
+        """启动工作线程与调度线程，并立即为固定位置预热；重复调用无副作用"""
+        if self._threads:
+            return self
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._work, name="weather-refresh", daemon=True),
+                         threading.Thread(target=self._schedule, name="weather-schedule", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        self.enqueue(self.pinned)
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def next_refresh(self, now=None):
+        """now 之后下一次计划刷新的时刻：模型更新整点 + delay"""
+        now = self.clock() if now is None else now
+        return next_update(now - self.delay, self.cache.period) + self.delay
+
+    # ---------- 读取 ----------
+    def get(self, lat, lon):
+        """有新鲜数据直接返回；过期则返回上次成功的数据并排队刷新；从未取到过时同步请求"""
+        key = self.cache.key(lat, lon, self.variant)
+        now = self.clock()
+        self._touch(key, lat, lon, now)
+        payload = self.cache.get(lat, lon, self.variant)
+        with self._cond:
+            if payload is not None:
+                self.served_fresh += 1
+                # 缓存也会被工作线程以外写入（批量对比、共享的 SQLite 层），比已记下的更新时替换
+                entry = self.last_good.get(key)
+                if entry is None or _current_time(payload) > _current_time(entry[1]):
+                    self.last_good[key] = (now, payload)
+                return payload
+            stale = self.last_good.get(key)
+            if stale is not None:
+                self.served_stale += 1
+        if stale is not None:
+            self.enqueue([key])
+            return stale[1]
+        with self._cond:
+            self.cold_fetches += 1
+        payload = self.cache.get_or_fetch(lat, lon, self._fetch_one, self.variant)
+        if payload is not None:
+            with self._cond:
+                self.last_good[key] = (self.clock(), payload)
+        return payload
+
+    def latest(self, lat, lon):
+        """上次成功取回的数据（可能已过期），不触发任何请求"""
+        key = self.cache.key(lat, lon, self.variant)
+        with self._cond:
+            entry = self.last_good.get(key)
+        return entry[1] if entry else None
+
+    def age(self, lat, lon):
+        """该位置数据距取回的秒数；没有数据时为 None"""
+        key = self.cache.key(lat, lon, self.variant)
+        with self._cond:
+            entry = self.last_good.get(key)
+        return self.clock() - entry[0] if entry else None
+
+    # ---------- 队列 ----------
+    def enqueue(self, keys):
+        """把位置加入刷新队列（已在队列或正在刷新的跳过），返回新加入的个数"""
+        added = 0
+        with self._cond:
+            for key in keys:
+                if key not in self.queued and key not in self.inflight:
+                    self.queue.append(key)
+                    self.queued.add(key)
+                    added += 1
+            if added:
+                self._cond.notify_all()
+        return added
+
+    def refresh_all(self):
+        """把所有固定位置与仍在有效期内的最近位置加入队列"""
+        with self._cond:
+            self._prune(self.clock())
+            keys = [*self.pinned, *(k for k in self.recent if k not in self.pinned)]
+        return self.enqueue(keys)
+
+    def wait_idle(self, timeout=None):
+        """等待队列清空且没有进行中的刷新，返回是否在超时前完成"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self.queue and not self.inflight, timeout)
+
+    # ---------- 内部 ----------
+    def _fetch_one(self, lat, lon):
+        # 与后台批量刷新同一条路径，只是只带一个坐标
+        return fetch_all_weather({0: {"lat": lat, "lon": lon}}, self.forecast_days, client=self.client).get(0)
+
+    def _touch(self, key, lat, lon, now):
+        if key in self.pinned:
+            return
+        with self._cond:
+            self.recent[key] = now
+            self.recent.move_to_end(key)
+            self._prune(now)
+
+    def _prune(self, now):
+        while self.recent and (len(self.recent) > self.max_recent
+                               or now - next(iter(self.recent.values())) > self.recent_ttl):
+            key, _ = self.recent.popitem(last=False)
+            self.last_good.pop(key, None)
+
+    def _schedule(self):
+        while not self._stop.is_set():
+            now = self.clock()
+            if self._stop.wait(max(0.0, self.next_refresh(now) - now)):
+                break
+            self.last_cycle = self.clock()
+            self.refresh_all()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self.queue or self._stop.is_set())
+                if self._stop.is_set():
+                    return
+                batch = [self.queue.popleft() for _ in range(min(len(self.queue), MAX_BATCH_LOCATIONS))]
+                self.queued.difference_update(batch)
+                self.inflight.update(batch)
+            start = time.perf_counter()
+            try:
+                locations = {}
+                for key in batch:
+                    lat, lon = grid_center(key, self.cache.step)
+                    locations[key] = {"lat": lat, "lon": lon}
+                results = fetch_all_weather(locations, self.forecast_days, client=self.client)
+            except Exception:
+                results = {}
+            elapsed = (time.perf_counter() - start) * 1000
+            fetched_at = self.clock()
+            ok = 0
+            for key in batch:
+                payload = results.get(key)
+                if payload is not None:
+                    self.cache.put(*grid_center(key, self.cache.step), payload, self.variant)
+                    ok += 1
+                with self._cond:
+                    if payload is not None and (key in self.pinned or key in self.recent):
+                        self.last_good[key] = (fetched_at, payload)
+            with self._cond:
+                self.refreshed += ok
+                self.failures += len(batch) - ok
+                self.batches += 1
+                self.last_refresh_ms = elapsed
+                self.refresh_ms_total += elapsed
+                self.inflight.difference_update(batch)
+                self._cond.notify_all()
+
+    # ---------- 指标 ----------
+    def stats(self):
+        now = self.clock()
+        with self._cond:
+            ages = [now - fetched for fetched, _ in self.last_good.values()]
+            stale = sum(1 for fetched, _ in self.last_good.values()
+                        if next_update(fetched, self.cache.period) <= now)
+            return {
+                "pinned": len(self.pinned),
+                "recent": len(self.recent),
+                "queue_depth": len(self.queue),
+                "inflight": len(self.inflight),
+                "served_fresh": self.served_fresh,
+                "served_stale": self.served_stale,
+                "cold_fetches": self.cold_fetches,
+                "refreshed": self.refreshed,
+                "failures": self.failures,
+                "batches": self.batches,
+                "last_refresh_ms": self.last_refresh_ms,
+                "avg_refresh_ms": self.refresh_ms_total / self.batches if self.batches else 0.0,
+                "max_age_s": max(ages) if ages else 0.0,
+                "mean_age_s": sum(ages) / len(ages) if ages else 0.0,
+                "stale_locations": stale,
+                "next_refresh": self.next_refresh(now),
+            }
+
+
+def benchmark_refresh(cities=8, latency=0.15, repeats=200):
+    """整点过期后用户读取的等待时间：同步回源 vs 后台刷新（先返回旧数据），以及一次批量刷新的耗时"""
+    from http_client import HttpClient
+    from weather_cache import WeatherCache
+    from weather_stub import stub_server
+
+    class Clock:
+        now = 1_000_000.0
+
+        def __call__(self):
+            return self.now
+
+    locations = {f"city{i}": {"lat": -50 + 100 * i / cities, "lon": -170 + 340 * i / cities} for i in range(cities)}
+    results = []
+    with stub_server(latency) as base:
+        client = HttpClient(rewrite={"https://api.open-meteo.com": base})
+
+        # 无后台刷新：每个位置过期后的第一次读取都要等一次完整往返
+        clock = Clock()
+        cache = WeatherCache(path=None, clock=clock)
+        fetch = lambda lat, lon: fetch_all_weather({0: {"lat": lat, "lon": lon}}, client=client)[0]  # noqa: E731
+        for info in locations.values():
+            cache.get_or_fetch(info["lat"], info["lon"], fetch)
+        clock.now += MODEL_UPDATE_SECONDS
+        start = time.perf_counter()
+        for info in locations.values():
+            cache.get_or_fetch(info["lat"], info["lon"], fetch)
+        results.append({"mode": "expired read, synchronous refetch",
+                        "ms": (time.perf_counter() - start) / cities * 1000})
+
+        # 后台刷新：预热后过期，读取立即返回旧数据，刷新在工作线程中批量完成
+        clock = Clock()
+        cache = WeatherCache(path=None, clock=clock)
+        refresher = WeatherRefresher(cache, locations, client=client, clock=clock).start()
+        refresher.wait_idle(30)
+        results.append({"mode": f"warm-up batch ({cities} locations)", "ms": refresher.last_refresh_ms})
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for info in locations.values():
+                refresher.get(info["lat"], info["lon"])
+        results.append({"mode": "fresh read", "ms": (time.perf_counter() - start) / (repeats * cities) * 1000})
+        clock.now += MODEL_UPDATE_SECONDS
+        start = time.perf_counter()
+        for info in locations.values():
+            refresher.get(info["lat"], info["lon"])
+        results.append({"mode": "expired read, stale-while-revalidate",
+                        "ms": (time.perf_counter() - start) / cities * 1000})
+        refresher.wait_idle(30)
+        stats = refresher.stats()
+        results.append({"mode": f"background refresh ({stats['batches'] - 1} batch)", "ms": stats["last_refresh_ms"]})
+        refresher.stop()
+        client.close()
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_refresh():
+        print(f"{row['mode']:>40}  {row['ms']:9.3f} ms")
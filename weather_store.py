@@ -0,0 +1,139 @@
+import time
+import numpy as np
+import pandas as pd
+
+# -----------------------------------
+# 多日逐小时预报的列式存储（float32，按时间戳索引）
+# -----------------------------------
+FORECAST_DAYS = 7  # Open-Meteo 支持 1–16 天
+MAX_FORECAST_DAYS = 16
+HOURLY_FIELDS = ("temperature_2m", "relative_humidity_2m", "weather_code", "wind_speed_10m")
+
+# 每个位置的内存占用（16 天 = 384 小时，4 个字段）：
+#   时间戳 int64         384 x 8      = 3 KB
+#   数值 float32 (4, N)  4 x 384 x 4  = 6 KB
+# 合计约 9 KB；同样数据保存为 JSON 解析出的 Python 列表约 77 KB（每个 float 对象 24 B + 列表指针，
+# 时间字符串每个约 65 B）。
+
+
+class ForecastStore:
+    """一个位置的逐小时预报：times 为 datetime64[m] 数组，values 为 (字段数, 小时数) 的 float32 矩阵
+
+    解析只在构造时做一次；窗口、逐日聚合与统计都是数组切片 / 归约，不再逐行经过 Python。
+    """
+
+    def __init__(self, times, values, fields=HOURLY_FIELDS, current=None, now=None):
+        self.times = times
+        self.values = values
+        self.fields = tuple(fields)
+        self.current = current or {}
+        self.now = now if now is not None else (times[0] if len(times) else None)
+        self._rows = {name: i for i, name in enumerate(self.fields)}
+
+    @classmethod
+    def from_payload(cls, payload, fields=HOURLY_FIELDS):
+        """由 Open-Meteo 响应构造；缺失的字段与 null 值记为 NaN"""
+        hourly = payload.get("hourly", {})
+        times = np.array(hourly.get("time", []), dtype="datetime64[m]")
+        values = np.full((len(fields), len(times)), np.nan, dtype=np.float32)
+        for row, name in enumerate(fields):
+            if name in hourly:
+                # None -> NaN 由 float 转换完成，一次性写入整行
+                values[row] = np.array(hourly[name], dtype=np.float64)
+        current = payload.get("current", {})
+        now = np.datetime64(current["time"], "m") if "time" in current else None
+        return cls(times, values, fields, current, now)
+
+    # ---------- 基本信息 ----------
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def nbytes(self):
+        return self.times.nbytes + self.values.nbytes
+
+    def column(self, name):
+        return self.values[self._rows[name]]
+
+    def index_at(self, when=None):
+        """when（默认当前时刻）所在小时的下标"""
+        when = self.now if when is None else np.datetime64(when, "m")
+        if when is None:
+            return 0
+        return max(0, int(np.searchsorted(self.times, when, side="right")) - 1)
+
+    # ---------- 窗口 ----------
+    def window(self, start=None, hours=24):
+        """从 start（默认当前小时）起 hours 小时的视图，返回 (times, {字段: 数组})，不复制数据"""
+        i = self.index_at(start)
+        j = min(len(self.times), i + hours)
+        return self.times[i:j], {name: self.values[row, i:j] for name, row in self._rows.items()}
+
+    def frame(self, start=None, hours=24):
+        """窗口的 DataFrame，按时间索引；数值列保持 float32"""
+        times, columns = self.window(start, hours)
+        return pd.DataFrame(columns, index=pd.DatetimeIndex(times, name="time"), copy=False)
+
+    def stats(self, name, start=None, hours=24):
+        _, columns = self.window(start, hours)
+        values = columns[name]
+        if not np.isfinite(values).any():
+            return {"min": np.nan, "max": np.nan, "mean": np.nan}
+        return {"min": float(np.nanmin(values)), "max": float(np.nanmax(values)), "mean": float(np.nanmean(values))}
+
+    # ---------- 逐日聚合 ----------
+    def daily(self, fields=("temperature_2m", "relative_humidity_2m", "wind_speed_10m")):
+        """按本地日期聚合每个字段的 min / max / mean（忽略 NaN），返回以日期为索引的 DataFrame
+
+        列名为 <字段>_min / <字段>_max / <字段>_mean。
+        """
+        if not len(self.times):
+            return pd.DataFrame()
+        days = self.times.astype("datetime64[D]")
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        rows = [self._rows[name] for name in fields]
+        block = self.values[rows]
+        finite = np.isfinite(block)
+        counts = np.add.reduceat(finite, starts, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.add.reduceat(np.where(finite, block, 0), starts, axis=1) / counts
+        low = np.fmin.reduceat(block, starts, axis=1)
+        high = np.fmax.reduceat(block, starts, axis=1)
+        # (字段, 统计量, 天) -> (天, 字段 x 统计量)，一次构造 DataFrame
+        table = np.stack([low, high, mean.astype(np.float32)], axis=1).reshape(-1, len(starts)).T
+        columns = [f"{name}_{stat}" for name in fields for stat in ("min", "max", "mean")]
+        return pd.DataFrame(table, index=pd.DatetimeIndex(days[starts], name="date"), columns=columns)
+
+
+def benchmark_store(days=(1, 7, 16), repeats=200):
+    """解析、24 小时窗口与逐日聚合的耗时（微秒），以及与 JSON 列表相比的内存占用"""
+    import sys
+    from weather_stub import fake_location
+
+    results = []
+    for count in days:
+        payload = fake_location(37.5665, 126.978, ["temperature_2m"], HOURLY_FIELDS, count)
+        hourly = payload["hourly"]
+        list_bytes = sys.getsizeof(hourly["time"]) + sum(sys.getsizeof(t) for t in hourly["time"])
+        list_bytes += sum(sys.getsizeof(hourly[f]) + sum(sys.getsizeof(v) for v in hourly[f]) for f in HOURLY_FIELDS)
+
+        store = ForecastStore.from_payload(payload)
+        timings = {}
+        for label, fn in (("parse", lambda: ForecastStore.from_payload(payload)),
+                          ("window", lambda: store.window(hours=24)),
+                          ("daily", store.daily),
+                          ("stats", lambda: store.stats("temperature_2m"))):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                fn()
+            timings[label] = (time.perf_counter() - start) / repeats * 1e6
+        results.append({"days": count, "hours": len(store), "store_bytes": store.nbytes, "list_bytes": list_bytes,
+                        **timings})
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_store():
+        print(f"{row['days']:>2} days ({row['hours']:>3} h)  store {row['store_bytes'] / 1024:5.1f} KB  "
+              f"lists {row['list_bytes'] / 1024:6.1f} KB  parse {row['parse']:7.1f} us  window {row['window']:5.1f} us"
+              f"  daily {row['daily']:6.1f} us  stats {row['stats']:5.1f} us")
@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+
+# -----------------------------------
+# 本地 Open-Meteo（预报 / 历史 / 地理编码）与 MET 桩服务（基准测试 / 离线调试用）
+# -----------------------------------
+# 返回与真实接口结构相同、按坐标确定的伪数据；latency 模拟一次往返的服务端耗时，
+# failures 让前若干个请求返回 503，用于验证重试。
+STUB_CITIES = {
+    "Seoul": (37.5665, 126.978, "South Korea"),
+    "Tokyo": (35.6895, 139.6917, "Japan"),
+    "London": (51.5074, -0.1278, "United Kingdom"),
+}
+
+
+def split_floats(text):
+    return [float(v) for v in text.split(",")]
+
+
+def fake_location(lat, lon, current_fields, hourly_fields, days):
+    """按坐标生成确定性的单个位置响应（current + hourly）"""
+    rng = np.random.default_rng([int(abs(lat) * 1e4), int(abs(lon) * 1e4)])
+    hours = 24 * days
+    base = 25 - abs(lat) * 0.4
+    t = np.arange(hours)
+    series = {
+        "temperature_2m": base + 6 * np.sin((t - 9) * np.pi / 12) + rng.normal(0, 0.8, hours),
+        "relative_humidity_2m": np.clip(60 + 20 * np.cos(t * np.pi / 12) + rng.normal(0, 5, hours), 5, 100),
+        "apparent_temperature": base - 1 + 6 * np.sin((t - 9) * np.pi / 12),
+        "weather_code": rng.choice([0, 1, 2, 3, 45, 61, 80], hours),
+        "wind_speed_10m": np.abs(rng.normal(12, 5, hours)),
+        "wind_direction_10m": rng.uniform(0, 360, hours),
+    }
+    start = np.datetime64("2025-11-04T00:00")
+    times = (start + t.astype("timedelta64[h]")).astype(str)
+    hourly = {"time": [s[:16] for s in times]}
+    hourly.update({f: np.round(series[f], 1).tolist() for f in hourly_fields if f in series})
+    current = {"time": hourly["time"][0], "interval": 900}
+    current.update({f: round(float(series[f][0]), 1) for f in current_fields if f in series})
+    return {
+        "latitude": round(lat * 10) / 10, "longitude": round(lon * 10) / 10,
+        "timezone": "GMT", "utc_offset_seconds": 0,
+        "current": current, "hourly": hourly,
+    }
+
+
+def fake_archive(lat, lon, start_date, end_date, hourly_fields):
+    """按坐标与日期生成确定性的逐小时历史数据：季节 + 日变化 + 噪声"""
+    start = np.datetime64(start_date, "h")
+    end = np.datetime64(end_date, "D") + np.timedelta64(1, "D")
+    times = np.arange(start, end, np.timedelta64(1, "h"))
+    rng = np.random.default_rng([int(abs(lat) * 1e4), int(abs(lon) * 1e4), int(start.astype(np.int64))])
+    day_of_year = (times - times.astype("datetime64[Y]")).astype("timedelta64[h]").astype(np.int64) / 24
+    hour = times.astype(np.int64) % 24
+    season = -np.sign(lat or 1) * 10 * np.cos(2 * np.pi * (day_of_year - 15) / 365.25)
+    temperature = 25 - abs(lat) * 0.4 + season + 5 * np.sin((hour - 9) * np.pi / 12) + rng.normal(0, 1.5, len(times))
+    series = {
+        "temperature_2m": temperature,
+        "relative_humidity_2m": np.clip(65 + 15 * np.cos(hour * np.pi / 12) + rng.normal(0, 8, len(times)), 5, 100),
+        "weather_code": rng.choice([0, 1, 2, 3, 45, 61, 80], len(times)),
+        "wind_speed_10m": np.abs(rng.normal(12, 5, len(times))),
+        "precipitation": np.maximum(rng.normal(-1, 1, len(times)), 0),
+    }
+    hourly = {"time": np.datetime_as_string(times, unit="m").tolist()}
+    hourly.update({f: np.round(series[f], 1).tolist() for f in hourly_fields if f in series})
+    return {"latitude": round(lat * 10) / 10, "longitude": round(lon * 10) / 10, "timezone": "GMT",
+            "utc_offset_seconds": 0, "hourly": hourly}
+
+
+def fake_met_object(object_id):
+    return {
+        "objectID": object_id, "title": f"Object {object_id}", "artistDisplayName": "Unknown",
+        "objectDate": "1890", "department": "European Paintings", "primaryImageSmall": "",
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive，连接池的复用才能体现出来
+    disable_nagle_algorithm = True  # 头部与正文分两次写出，keep-alive 下否则会撞上 40 ms 的延迟确认
+    latency = 0.0
+    failures = 0
+    requests_served = 0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        time.sleep(self.latency)
+        type(self).requests_served += 1
+        if type(self).requests_served <= self.failures:
+            return self.reply(503, {"error": True, "reason": "stub failure"})
+        if url.path == "/v1/forecast":
+            lats, lons = split_floats(query["latitude"]), split_floats(query["longitude"])
+            if len(lats) != len(lons):
+                return self.reply(400, {"error": True, "reason": "latitude and longitude must have the same length"})
+            current = query.get("current", "").split(",")
+            hourly = query.get("hourly", "").split(",")
+            days = int(query.get("forecast_days", 1))
+            body = [fake_location(lat, lon, current, hourly, days) for lat, lon in zip(lats, lons)]
+            return self.reply(200, body[0] if len(body) == 1 else body)
+        if url.path == "/v1/archive":
+            return self.reply(200, fake_archive(float(query["latitude"]), float(query["longitude"]),
+                                                query["start_date"], query["end_date"],
+                                                query.get("hourly", "").split(",")))
+        if url.path == "/v1/search":
+            name = query.get("name", "").lower()
+            results = [{"id": i, "name": city, "latitude": lat, "longitude": lon, "country": country}
+                       for i, (city, (lat, lon, country)) in enumerate(STUB_CITIES.items())
+                       if city.lower().startswith(name)][:int(query.get("count", 10))]
+            return self.reply(200, {"results": results} if results else {"generationtime_ms": 0.1})
+        if url.path == "/public/collection/v1/search":
+            ids = list(range(1000, 1000 + 8 * len(query.get("q", ""))))
+            return self.reply(200, {"total": len(ids), "objectIDs": ids})
+        if url.path.startswith("/public/collection/v1/objects/"):
+            return self.reply(200, fake_met_object(int(url.path.rsplit("/", 1)[1])))
+        return self.reply(404, {"error": True, "reason": "not found"})
+
+    def reply(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def stub_server(latency=0.0, failures=0):
+    """在后台线程启动桩服务，产出其根地址（如 http://127.0.0.1:PORT）"""
+    handler = type("Handler", (StubHandler,), {"latency": latency, "failures": failures, "requests_served": 0})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,138 @@
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# -----------------------------------
+# 文本条形图与时间标签（整列向量化，行数到数千也只做几次数组运算）
+# -----------------------------------
+BAR_WIDTH = 20
+BAR_CHAR = "█"
+# 所有可能长度的条形预先生成一次，按长度下标取用
+BARS = np.array([BAR_CHAR * i for i in range(BAR_WIDTH + 1)], dtype=object)
+CLOCK_LABELS = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)], dtype=object)
+
+
+def bar_lengths(values, width=BAR_WIDTH):
+    """按最小 / 最大值线性缩放到 0..width 的整数长度；全部相等时取中间值，NaN 记为 0"""
+    values = np.asarray(values, dtype=np.float64)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.zeros(len(values), dtype=np.int64)
+    low, high = values[finite].min(), values[finite].max()
+    if high == low:
+        return np.where(finite, width // 2, 0)
+    with np.errstate(invalid="ignore"):
+        scaled = (values - low) / (high - low) * width
+    # 与逐行版本相同按 int() 截断
+    return np.where(finite, scaled, 0).astype(np.int64)
+
+
+def time_labels(times, with_day=False):
+    """ISO 字符串或 datetime64 数组 -> 'HH:MM'（with_day 时前缀星期，如 'Mon 05:00'）
+
+    一次 pd.to_datetime 批量解析；标签按一天内的分钟数查表，星期只对不同的日期各格式化一次。
+    无法解析的值原样保留。
+    """
+    if isinstance(times, np.ndarray) and np.issubdtype(times.dtype, np.datetime64):
+        stamps = times.astype("datetime64[m]")  # 列式存储里已经是 datetime64，不必再解析
+    else:
+        stamps = pd.to_datetime(pd.Index(times), errors="coerce", format="ISO8601").to_numpy(dtype="datetime64[m]")
+    bad = np.isnat(stamps)
+    days = stamps.astype("datetime64[D]")
+    minutes = np.where(bad, 0, (stamps - days).astype(np.int64))
+    labels = CLOCK_LABELS[minutes]
+    if with_day:
+        unique_days, inverse = np.unique(days, return_inverse=True)
+        names = np.array([f"{pd.Timestamp(d):%a} " if not np.isnat(d) else "" for d in unique_days], dtype=object)
+        labels = names[inverse.ravel()] + labels
+    if bad.any():
+        labels[bad] = np.asarray(times, dtype=object)[bad]
+    return labels
+
+
+def value_text(values, fmt="{:.1f}"):
+    """数值 -> 文本；接口数据只有一位小数，不同取值很少，只对唯一值调用一次格式化，NaN 记为 '—'"""
+    values = np.asarray(values)
+    unique, inverse = np.unique(values, return_inverse=True)
+    text = np.array([fmt.format(v) if np.isfinite(v) else "—" for v in unique], dtype=object)
+    return text[inverse.ravel()]
+
+
+def text_bar_chart(values, labels, width=BAR_WIDTH, unit="°C"):
+    """文本条形图：每行 '<标签>: <条形> <数值><单位>'，条形与数值文本都按整列生成"""
+    bars = BARS if width == BAR_WIDTH else np.array([BAR_CHAR * i for i in range(width + 1)], dtype=object)
+    lines = (np.asarray(labels, dtype=object) + ": " + bars[bar_lengths(values, width)] + " "
+             + value_text(values) + unit)
+    return "\n".join(lines)
+
+
+# ---------- 逐行版本（仅供基准对比） ----------
+def _legacy_chart(temperatures, times):
+    max_temp = max(temperatures)
+    min_temp = min(temperatures)
+    chart_lines = []
+    for i, (temp, time_str) in enumerate(zip(temperatures, times)):
+        bar_length = int((temp - min_temp) / (max_temp - min_temp) * 20) if max_temp != min_temp else 10
+        bar = "█" * bar_length
+        chart_lines.append(f"{time_str}: {bar} {temp:.1f}°C")
+    return "\n".join(chart_lines)
+
+
+def _legacy_labels(hours):
+    labels = []
+    for hour in hours:
+        try:
+            labels.append(datetime.fromisoformat(hour.replace('Z', '+00:00')).strftime('%H:%M'))
+        except ValueError:
+            labels.append(hour)
+    return labels
+
+
+def _legacy_table(labels, temperatures, humidity, wind_speed):
+    return pd.DataFrame({
+        'Time': labels,
+        'Temp (°C)': [f"{temp:.1f}" for temp in temperatures],
+        'Humidity (%)': [f"{hum:.0f}" for hum in humidity],
+        'Wind (km/h)': [f"{wind:.1f}" for wind in wind_speed],
+    })
+
+
+def benchmark_textchart(rows=(12, 168, 2000, 10000), repeats=20, seed=0):
+    """逐行版本与向量化版本的耗时（毫秒）：时间标签、文本图表、表格构造"""
+    rng = np.random.default_rng(seed)
+    results = []
+    for n in rows:
+        stamps = np.datetime64("2026-01-01T00:00", "m") + np.arange(n) * np.timedelta64(60, "m")
+        hours = [str(t) for t in stamps]  # 接口返回的 ISO 字符串
+        # 与接口一致保留一位小数
+        temps = np.round(15 + 8 * np.sin(np.arange(n) / 24 * 2 * np.pi) + rng.normal(0, 1, n), 1).astype(np.float32)
+        humidity = np.round(rng.uniform(30, 90, n)).astype(np.float32)
+        wind = np.round(rng.uniform(0, 30, n), 1).astype(np.float32)
+        temp_list, hum_list, wind_list = temps.tolist(), humidity.tolist(), wind.tolist()
+        labels = _legacy_labels(hours)
+
+        cases = (
+            ("labels", lambda: _legacy_labels(hours), lambda: time_labels(hours)),
+            ("chart", lambda: _legacy_chart(temp_list, labels), lambda: text_bar_chart(temps, labels)),
+            # 新路径：数值列保持 float32，格式交给 column_config / Styler 在显示层处理
+            ("table", lambda: _legacy_table(hours, temp_list, hum_list, wind_list),
+             lambda: pd.DataFrame({"time": stamps, "temperature_2m": temps, "relative_humidity_2m": humidity,
+                                   "wind_speed_10m": wind}, copy=False)),
+        )
+        row = {"rows": n}
+        for label, legacy, vectorized in cases:
+            for mode, fn in (("legacy", legacy), ("vectorized", vectorized)):
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    fn()
+                row[f"{label}_{mode}"] = (time.perf_counter() - start) / repeats * 1000
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    for row in benchmark_textchart():
+        print(f"{row['rows']:>6} rows  "
+              + "  ".join(f"{label} {row[f'{label}_legacy']:7.2f} -> {row[f'{label}_vectorized']:6.2f} ms"
+                          for label in ("labels", "chart", "table")))